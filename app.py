@@ -1,6 +1,12 @@
 import gradio as gr
 import os
+import asyncio
 import sys
+import re
+import time
+import uuid
+from contextlib import asynccontextmanager
+from http.cookies import SimpleCookie
 import matplotlib
 matplotlib.use('Agg') # Non-interactive backend for server environments
 import matplotlib.pyplot as plt
@@ -22,7 +28,9 @@ logger.add(LOG_FILE, rotation="1 MB", format="{time:HH:mm:ss} | {level} | {messa
 
 # --- 2. IMPORT AGENT ---
 try:
-    from project.main_agent import MainAgent
+    from project.session_manager import SessionManager
+    from project.core.metrics import registry as metrics_registry, plot_seconds
+    from project.core.admission import admission_scheduler
     from project.config import Config
     
     # Validation logic
@@ -33,8 +41,20 @@ try:
     except Exception as e:
         logger.warning(f"Config validation warning: {e}")
 
-    # Initialize Global Agent Wrapper
-    agent_instance = MainAgent()
+    # Pre-warm pooled Gemini clients so the first turn skips the handshake
+    if not Config.MOCK_MODE and Config.GEMINI_API_KEYS():
+        from project.core.client_pool import client_pool
+        client_pool.warm(Config.GEMINI_API_KEYS(), probe=True, model=Config.MODEL_NAME)
+        logger.info(f"Gemini client pool: {client_pool.get_stats()}")
+
+    # Per-session agents sharing one set of Planner/Worker/Evaluator
+    session_manager = SessionManager(
+        max_sessions=Config.SESSION_MAX,
+        ttl_seconds=Config.SESSION_TTL,
+        memory_dir=Config.SESSION_MEMORY_DIR,
+    )
+    stream_responses = Config.STREAM_RESPONSES
+    gradio_concurrency = Config.GRADIO_CONCURRENCY
 
 except ImportError as e:
     logger.error(f"Failed to import project modules: {e}")
@@ -46,10 +66,62 @@ except ImportError as e:
                 "plan": {"action": "error", "risk_level": "LOW", "emotion": "Error", "distress_score": 0},
                 "safety_status": "SAFE"
             }
-    agent_instance = MockAgent()
+
+        async def handle_message_async(self, msg):
+            return self.handle_message(msg)
+
+        async def stream_message_async(self, msg):
+            yield {"type": "final", "result": self.handle_message(msg)}
+
+        def admission_priority(self, msg):
+            return None
+
+    class MockAdmission:
+        @asynccontextmanager
+        async def admit(self, priority=None):
+            yield
+
+    class MockSessionManager:
+        @asynccontextmanager
+        async def session(self, session_id, user_id=None):
+            yield MockAgent()
+    session_manager = MockSessionManager()
+    admission_scheduler = MockAdmission()
+    stream_responses = False
+    gradio_concurrency = 1
+    metrics_registry = None
+    plot_seconds = None
 
 # --- 3. HELPER FUNCTIONS ---
 
+# Random per-browser id that keys long-term memory across visits (set by the server middleware below)
+USER_ID_COOKIE = "sereneshield_uid"
+USER_ID_COOKIE_MAX_AGE = 365 * 24 * 3600
+_USER_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+def get_user_id(request):
+    """Stable user id for long-term memory: the login name, else the browser's id cookie.
+
+    Returns None when there is neither; the session manager then keys the
+    memory on the Gradio session instead.
+    """
+    if request is None:
+        return None
+    username = getattr(request, "username", None)
+    if username:
+        return f"login-{username}"
+    cookies = getattr(request, "cookies", None)
+    if not cookies:
+        headers = getattr(request, "headers", None) or {}
+        parsed = SimpleCookie()
+        try:
+            parsed.load(headers.get("cookie", ""))
+        except Exception:
+            return None
+        cookies = {key: morsel.value for key, morsel in parsed.items()}
+    user_id = cookies.get(USER_ID_COOKIE, "")
+    return user_id if _USER_ID_RE.match(user_id) else None
+
 def get_empty_state():
     """Returns initial state for a new user session."""
     return {
@@ -62,6 +134,7 @@ def get_empty_state():
 
 def generate_plot(user_state):
     """Generates a matplotlib chart of distress levels based on user state."""
+    started = time.perf_counter()
     # Handle None state if called prematurely
     if user_state is None:
         user_state = get_empty_state()
@@ -116,6 +189,8 @@ def generate_plot(user_state):
     buf.seek(0)
     plt.close()
     
+    if plot_seconds is not None:
+        plot_seconds.observe(time.perf_counter() - started)
     return Image.open(buf)
 
 def generate_stats_html(user_state):
@@ -166,21 +241,50 @@ def get_live_logs():
             return "Loading logs..."
     return "Initializing system logs..."
 
-def response_generator(message, history, user_state):
+def get_response_prefix(plan):
+    """Visual indicator prepended to the bot message for the given plan."""
+    if plan.get('risk_level', 'LOW') == "HIGH":
+        return "🚨 **CRISIS INTERVENTION ACTIVE**\n\n"
+    if plan.get('action') == "enforce_boundary":
+        return "🛡️ **Boundary Enforced:** "
+    return ""
+
+async def response_generator(message, history, user_state, request: gr.Request = None):
     """
-    Generator function for ChatInterface.
-    Uses gr.State (user_state) to keep data separate for every user.
+    Async generator function for ChatInterface.
+    Uses gr.State (user_state) to keep data separate for every user, and the
+    Gradio session hash to pick that user's agent (memory) from the session manager;
+    long-term memory follows the user across visits (see get_user_id).
+    Awaiting the agent keeps the event loop free while Gemini is working,
+    so a waiting turn does not pin a worker thread.
     """
+    session_id = getattr(request, "session_hash", None)
+    user_id = get_user_id(request)
     if user_state is None:
         user_state = get_empty_state()
 
     if not message:
-        yield "", user_state, generate_plot(user_state), generate_stats_html(user_state)
+        yield "", user_state, await asyncio.to_thread(generate_plot, user_state), generate_stats_html(user_state)
         return
         
     try:
-        # Run the agent
-        result_dict = agent_instance.handle_message(message)
+        # Run the agent (one turn at a time per session)
+        async with session_manager.session(session_id, user_id) as agent:
+            # Crisis turns are admitted ahead of small talk when the pipeline is saturated
+            async with admission_scheduler.admit(agent.admission_priority(message)):
+                if stream_responses:
+                    # Stream the draft into the chat bubble; the final verdict below replaces it
+                    result_dict = None
+                    prefix = ""
+                    async for event in agent.stream_message_async(message):
+                        if event["type"] == "plan":
+                            prefix = get_response_prefix(event["plan"])
+                        elif event["type"] == "draft":
+                            yield prefix + event["text"], user_state, gr.update(), gr.update()
+                        elif event["type"] == "final":
+                            result_dict = event["result"]
+                else:
+                    result_dict = await agent.handle_message_async(message)
         response_text = result_dict.get("response", "Error: No response text found.")
         
         # Extract metadata
@@ -208,20 +312,15 @@ def response_generator(message, history, user_state):
         logger.info(f"User input processed. Risk: {risk} | Action: {action}")
 
         # Add visual indicators to the text
-        prefix = ""
-        if risk == "HIGH":
-            prefix = "🚨 **CRISIS INTERVENTION ACTIVE**\n\n"
-        elif action == "enforce_boundary":
-            prefix = "🛡️ **Boundary Enforced:** "
-        
-        final_response = prefix + response_text
+        final_response = get_response_prefix(plan) + response_text
         
-        # Yield result
-        yield final_response, user_state, generate_plot(user_state), generate_stats_html(user_state)
+        # Yield result (plot rendering is CPU-bound, keep it off the event loop)
+        plot = await asyncio.to_thread(generate_plot, user_state)
+        yield final_response, user_state, plot, generate_stats_html(user_state)
 
     except Exception as e:
         logger.error(f"Runtime Error: {e}")
-        yield f"System Error: {str(e)}", user_state, generate_plot(user_state), generate_stats_html(user_state)
+        yield f"System Error: {str(e)}", user_state, await asyncio.to_thread(generate_plot, user_state), generate_stats_html(user_state)
 
 # --- 4. UI LAYOUT ---
 
@@ -464,12 +563,36 @@ with gr.Blocks(title="SereneShield AI") as demo:
     timer = gr.Timer(value=2)
     timer.tick(get_live_logs, None, logs_display)
 
-# --- 5. LAUNCH ---
+# --- 5. SERVER ---
+# Built at import time so any ASGI runner (e.g. `uvicorn app:app`) serves /metrics and the
+# user-id cookie, not only `python app.py`
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+
+app = FastAPI()
+
+if metrics_registry is not None:
+    # Prometheus metrics next to the Gradio UI
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def metrics_endpoint():
+        return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.middleware("http")
+async def assign_user_id(request, call_next):
+    # Give each browser a stable id so long-term memory carries over between visits
+    response = await call_next(request)
+    if not _USER_ID_RE.match(request.cookies.get(USER_ID_COOKIE, "")):
+        response.set_cookie(USER_ID_COOKIE, uuid.uuid4().hex, max_age=USER_ID_COOKIE_MAX_AGE,
+                            httponly=True, samesite="lax")
+    return response
+
+app = gr.mount_gradio_app(app, demo.queue(default_concurrency_limit=gradio_concurrency), path="/")
+
+# --- 6. LAUNCH ---
 if __name__ == "__main__":
     is_spaces = "SPACE_ID" in os.environ
     
     print("--- SereneShield Launching ---")
-    if is_spaces:
-        demo.queue().launch(server_name="0.0.0.0", server_port=7860)
-    else:
-        demo.queue().launch(server_name="127.0.0.1", server_port=7860, share=False)
+    server_name = "0.0.0.0" if is_spaces else "127.0.0.1"
+    uvicorn.run(app, host=server_name, port=7860)
@@ -0,0 +1,111 @@
+"""
+Timing, allocation and comparison helpers for the microbenchmarks.
+
+Timing follows ``timeit``: the loop count is calibrated so one repeat takes
+at least ``min_time`` seconds, GC is disabled while timing, and the best and
+median of several repeats are reported per call. Allocation figures come
+from one extra, separately traced run with ``tracemalloc`` so tracing never
+distorts the timings.
+"""
+import gc
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Optional
+
+
+def _time_loops(fn: Callable[[], Any], loops: int) -> float:
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        return time.perf_counter() - start
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def calibrate(fn: Callable[[], Any], min_time: float) -> int:
+    """Smallest power-of-ten loop count whose run takes at least ``min_time``."""
+    loops = 1
+    while True:
+        if _time_loops(fn, loops) >= min_time or loops >= 10 ** 7:
+            return loops
+        loops *= 10
+
+
+def measure_allocations(fn: Callable[[], Any], loops: int) -> Dict[str, float]:
+    """Allocated blocks and bytes per call, plus peak traced memory, over ``loops`` calls."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        for _ in range(loops):
+            fn()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    diff = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in diff)
+    size = sum(stat.size_diff for stat in diff)
+    return {
+        "retained_blocks_per_call": round(blocks / loops, 3),
+        "retained_bytes_per_call": round(size / loops, 1),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def run_benchmark(fn: Callable[[], Any],
+                  setup: Optional[Callable[[], Any]] = None,
+                  repeats: int = 5,
+                  min_time: float = 0.2) -> Dict[str, Any]:
+    """Time ``fn`` and measure its allocations; ``setup`` runs before every repeat."""
+    if setup:
+        setup()
+    fn()  # warm up caches and lazy imports
+    loops = calibrate(fn, min_time)
+
+    per_call = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        per_call.append(_time_loops(fn, loops) / loops)
+
+    if setup:
+        setup()
+    alloc_loops = max(1, min(loops, 1000))
+    result = {
+        "loops": loops,
+        "repeats": repeats,
+        "best_us": round(min(per_call) * 1e6, 3),
+        "median_us": round(statistics.median(per_call) * 1e6, 3),
+        "stdev_us": round(statistics.stdev(per_call) * 1e6, 3) if len(per_call) > 1 else 0.0,
+    }
+    result.update(measure_allocations(fn, alloc_loops))
+    return result
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], threshold: float = 0.1) -> Dict[str, Any]:
+    """Per-benchmark change in median time; changes above ``threshold`` are regressions."""
+    rows = {}
+    regressions = []
+    for name, new_result in new.get("results", {}).items():
+        base_result = base.get("results", {}).get(name)
+        if not base_result or "median_us" not in base_result or "median_us" not in new_result:
+            continue
+        change = (new_result["median_us"] - base_result["median_us"]) / base_result["median_us"]
+        rows[name] = {
+            "base_us": base_result["median_us"],
+            "new_us": new_result["median_us"],
+            "change": round(change, 4),
+            "blocks_change": round(new_result.get("retained_blocks_per_call", 0)
+                                   - base_result.get("retained_blocks_per_call", 0), 3),
+        }
+        if change > threshold:
+            regressions.append(name)
+    return {"threshold": threshold, "benchmarks": rows, "regressions": regressions}
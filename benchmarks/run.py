@@ -0,0 +1,311 @@
+"""
+Microbenchmarks for the local hot paths that run on every turn.
+
+    python benchmarks/run.py --out bench_base.json
+    python benchmarks/run.py --out bench_new.json
+    python benchmarks/run.py --compare bench_base.json bench_new.json
+
+Runs offline in MOCK mode with fixed, seeded fixtures at several sizes.
+Results are JSON (per-call best/median/stdev in microseconds plus
+allocation figures) so two runs can be diffed; ``--compare`` exits with
+status 1 when any median slows down by more than ``--threshold``.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("MOCK_MODE", "true")
+# Importing app creates the SessionManager's memory directory; keep it out of the working tree
+_SESSION_DIR = os.path.join(tempfile.gettempdir(), f"bench_sessions_{os.getpid()}")
+os.environ.setdefault("SESSION_MEMORY_DIR", _SESSION_DIR)
+
+from benchmarks.harness import run_benchmark, compare
+
+SIZES = {"small": 80, "medium": 800, "large": 8000, "xlarge": 64000}
+
+_WORDS = ("i feel anxious today and my chest is tight work has been a lot lately "
+          "thank you for listening can we try something to calm down please").split()
+
+
+def make_text(chars: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words: List[str] = []
+    length = 0
+    while length < chars:
+        word = rng.choice(_WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:chars]
+
+
+Case = Tuple[Callable[[], Any], Optional[Callable[[], Any]]]
+
+
+def bench_check_jailbreak(size: int) -> Case:
+    from project.agents.planner import Planner
+    planner = Planner()
+    text = make_text(size, seed=1)
+    return (lambda: planner._check_jailbreak(text)), None
+
+
+def bench_contains_medical_advice(size: int) -> Case:
+    from project.agents.evaluator import Evaluator
+    evaluator = Evaluator()
+    text = make_text(size, seed=2)
+    return (lambda: evaluator._contains_medical_advice(text)), None
+
+
+# Rule-by-rule scan the safety checks used before the compiled scanner, kept as a baseline
+_LEGACY_RULES = {
+    "jailbreak": [r"ignore.*instruction", r"you are now a", r"act as a", r"simulate", r"do not refuse",
+                  r"developer mode"],
+    "crisis": [r"suicid", r"kill (myself|me)", r"end (it all|my life)", r"self[- ]harm", r"hurt(ing)? myself",
+               r"don'?t want to (be here|live)", r"want to die", r"no reason to live"],
+    "medical_advice": [r"\bdiagnos(e|is)\b", r"\bmedication\b", r"\bprescri(be|ption)\b",
+                       r"\btherap(y|ist)\b.*\b(recommend|suggest)", r"\bguarantee\b", r"\bcure\b",
+                       r"as a doctor", r"i am a doctor"],
+}
+
+
+def _legacy_scan(user_input: str, draft: str) -> tuple:
+    import re
+    user_lower = user_input.lower()
+    jailbreak = any(re.search(p, user_lower) for p in _LEGACY_RULES["jailbreak"])
+    crisis = any(re.search(p, user_lower) for p in _LEGACY_RULES["crisis"])
+    draft_lower = draft.lower()
+    refusal = "cannot" in draft_lower or "not a doctor" in draft_lower
+    medical = not refusal and any(re.search(p, draft_lower) for p in _LEGACY_RULES["medical_advice"])
+    harmful = any(k in draft_lower for k in ["self-harm", "hurt yourself", "do it"])
+    return jailbreak, crisis, medical, harmful
+
+
+def _scan_fixture(size: int) -> Tuple[str, str]:
+    # Clean sentences (every rule scans to the end) with one violation near the end of the draft
+    def sentences(seed: int) -> str:
+        words = make_text(size, seed=seed).split(" ")
+        return ". ".join(" ".join(words[i:i + 12]) for i in range(0, len(words), 12))
+    return sentences(3), sentences(4)[:-40] + ". i recommend this medication."
+
+
+def bench_safety_scan_legacy(size: int) -> Case:
+    user_input, draft = _scan_fixture(size)
+    return (lambda: _legacy_scan(user_input, draft)), None
+
+
+def bench_safety_scan_compiled(size: int) -> Case:
+    from project.core.safety_scan import safety_scanner
+
+    user_input, draft = _scan_fixture(size)
+
+    def fn():
+        return (safety_scanner.matches(user_input, "jailbreak"),
+                safety_scanner.matches(user_input, "crisis"),
+                safety_scanner.matches(draft, "medical_advice"),
+                safety_scanner.matches(draft, "harmful_content"))
+
+    return fn, None
+
+
+def bench_safety_scan_normalize(size: int) -> Case:
+    from project.core.safety_scan import normalize
+    # Worst case: every word needs folding (look-alikes, leetspeak, spacing)
+    text = make_text(size, seed=5).replace("a", "\u0430").replace("e", "3").replace(" ", "  ")
+    return (lambda: normalize(text)), None
+
+
+def bench_safety_screen(size: int) -> Case:
+    import numpy  # noqa: F401 -- the screen is optional; report a skip without it
+    from project.config import Config
+    from project.agents.safety_screen import SafetyScreen
+    screen = SafetyScreen.load(Config.SAFETY_SCREEN_EXEMPLARS_PATH)
+    text = make_text(size, seed=6)
+    return (lambda: screen.score(text)), None
+
+
+def bench_logger_log(size: int) -> Case:
+    from project.core.observability import Logger
+    log = Logger(log_to_file=False)
+    data = {f"field_{i}": make_text(20, seed=i) for i in range(max(1, size // 40))}
+    sink = io.StringIO()
+
+    def fn():
+        with contextlib.redirect_stdout(sink):
+            log.log("Bench", "benchmark event", data=data)
+
+    def setup():
+        log.clear()
+        sink.seek(0)
+        sink.truncate()
+
+    return fn, setup
+
+
+def bench_history_string(size: int) -> Case:
+    from project.memory.session_memory import SessionMemory
+    memory = SessionMemory(max_history=8)
+    for i in range(16):
+        memory.add_message("user" if i % 2 == 0 else "assistant", make_text(size, seed=i))
+    return (lambda: memory.get_history_string()), None
+
+
+def bench_session_turn(size: int) -> Case:
+    # One turn's worth of history work: store the message, then render the context
+    from project.memory.session_memory import SessionMemory
+    memory = SessionMemory(max_history=8)
+    texts = [make_text(size, seed=i) for i in range(16)]
+    counter = iter(range(10 ** 9))
+
+    def fn():
+        i = next(counter)
+        memory.add_message("user" if i % 2 == 0 else "assistant", texts[i % 16])
+        return memory.get_history_string()
+
+    return fn, None
+
+
+def bench_update_preference(size: int) -> Case:
+    from project.memory.long_term_memory import LongTermMemory
+    directory = tempfile.mkdtemp(prefix="bench_ltm_")
+    ltm = LongTermMemory(os.path.join(directory, "ltm.json"))
+
+    def teardown():
+        # Close the journal first so the flusher has nothing left to write into the removed directory
+        ltm.destroy()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    _cleanup.append(teardown)
+    for i in range(max(1, size // 16)):
+        ltm.update_preference(f"pref_{i}", "liked")
+    counter = iter(range(10 ** 9))
+    return (lambda: ltm.update_preference("preferred_technique", f"box_breathing_{next(counter) % 7}")), None
+
+
+def _app():
+    # Importing app builds the Gradio UI (but does not launch it)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    return app
+
+
+def bench_generate_plot(size: int) -> Case:
+    app = _app()
+    state = app.get_empty_state()
+    state["distress_history"] = [random.Random(i).randint(1, 10) for i in range(size // 80)]
+    return (lambda: app.generate_plot(state)), None
+
+
+def bench_stats_html(size: int) -> Case:
+    app = _app()
+    state = app.get_empty_state()
+    state.update({"current_risk": "MEDIUM", "last_emotion": "anxious", "msg_count": size, "max_distress": 7})
+    return (lambda: app.generate_stats_html(state)), None
+
+
+BENCHMARKS: Dict[str, Tuple[Callable[[int], Case], List[str]]] = {
+    "planner.check_jailbreak": (bench_check_jailbreak, ["small", "medium", "large"]),
+    "evaluator.contains_medical_advice": (bench_contains_medical_advice, ["small", "medium", "large"]),
+    "safety_scan.legacy": (bench_safety_scan_legacy, ["small", "large", "xlarge"]),
+    "safety_scan.compiled": (bench_safety_scan_compiled, ["small", "large", "xlarge"]),
+    "safety_scan.normalize_obfuscated": (bench_safety_scan_normalize, ["small", "large"]),
+    "safety_screen.score": (bench_safety_screen, ["small", "medium", "large"]),
+    "logger.log": (bench_logger_log, ["small", "medium", "large"]),
+    "session_memory.get_history_string": (bench_history_string, ["small", "medium", "large"]),
+    "session_memory.turn": (bench_session_turn, ["small", "medium", "large"]),
+    "long_term_memory.update_preference": (bench_update_preference, ["small", "medium", "large"]),
+    "app.generate_plot": (bench_generate_plot, ["small", "large"]),
+    "app.generate_stats_html": (bench_stats_html, ["small"]),
+}
+
+# Teardowns registered by the case being run; called once it finishes
+_cleanup: List[Callable[[], Any]] = []
+
+
+def _teardown():
+    while _cleanup:
+        _cleanup.pop()()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run(selected: Optional[str], repeats: int, min_time: float) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for name, (factory, sizes) in BENCHMARKS.items():
+        if selected and selected not in name:
+            continue
+        for size_name in sizes:
+            key = f"{name}[{size_name}]"
+            try:
+                fn, setup = factory(SIZES[size_name])
+                # Keep pipeline log lines out of the timing output
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results[key] = run_benchmark(fn, setup, repeats=repeats, min_time=min_time)
+            except ImportError as e:
+                results[key] = {"skipped": f"missing dependency: {e}"}
+            finally:
+                _teardown()
+            print(f"{key:<50} {results[key].get('median_us', '-'):>12} us", file=sys.stderr)
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeats": repeats,
+            "min_time": min_time,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", help="write results JSON here (default: stdout)")
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timed repeat")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="diff two result files")
+    parser.add_argument("--threshold", type=float, default=0.1, help="regression threshold for --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.compare[1], encoding="utf-8") as f:
+            new = json.load(f)
+        diff = compare(base, new, args.threshold)
+        print(json.dumps(diff, indent=2))
+        sys.exit(1 if diff["regressions"] else 0)
+
+    try:
+        report = run(args.filter, args.repeats, args.min_time)
+    finally:
+        _teardown()
+        if os.environ["SESSION_MEMORY_DIR"] == _SESSION_DIR:
+            shutil.rmtree(_SESSION_DIR, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,90 @@
 """
 Evaluator Agent: Safety and quality assurance gatekeeper.
 """
-import re
-from typing import Dict
+from typing import Dict, Optional, Tuple
 from project.core.context_engineering import EVALUATOR_PROMPT
 from project.core.a2a_protocol import EvaluatorOutput
 from project.core.observability import logger
 from project.core.gemini_client import GeminiClient
+from project.core.verdict_cache import VerdictCache, prompt_version
+from project.core.metrics import guard_seconds
+from project.core.safety_scan import safety_scanner, input_features, RuleMatch
+from project.agents.safety_screen import SafetyScreen, APPROVE, AUDIT
+from project.config import Config
+
+# Safety-scanner rule sets enforced on drafts, in order, and the violation each one reports
+HARD_RULE_SETS = {
+    "medical_advice": "Medical advice detected",
+    "harmful_content": "Harmful content detected",
+}
+
+HARD_RULE_FEEDBACK = {
+    "Medical advice detected": "Contains medical advice or diagnosis language.",
+    "Harmful content detected": "Potentially harmful content detected.",
+}
+
+
+class StreamGuard:
+    """Applies the Evaluator's regex hard rules to a growing streamed draft.
+
+    Each ``feed`` only rescans from the start of the line that was being
+    scanned last time (patterns and the sentences used for negation never
+    span a newline), so the cost per chunk stays proportional to the chunk
+    rather than to the whole draft. A negatable match only counts once its
+    sentence has ended, or at ``finish``, since a refusal cue ("cannot")
+    may come after it.
+    """
+
+    def __init__(self, evaluator: "Evaluator"):
+        self.evaluator = evaluator
+        self.text = ""
+        self.violation: Optional[str] = None
+        self._line_start = 0
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """Append a chunk and return the violated rule, if any."""
+        self.text += chunk
+        if self.violation:
+            return self.violation
+
+        with guard_seconds.time(guard="stream_guard"):
+            self._scan(partial=True)
+        return self.violation
+
+    def finish(self) -> Optional[str]:
+        """The stream has ended: settle matches still waiting for their sentence to end."""
+        if not self.violation:
+            with guard_seconds.time(guard="stream_guard"):
+                self._scan(partial=False)
+        return self.violation
+
+    def _scan(self, partial: bool):
+        match = safety_scanner.first_violation(self.text[self._line_start:], HARD_RULE_SETS, partial)
+        if match is not None:
+            self.violation = HARD_RULE_SETS[match.rule_set]
+
+        last_newline = self.text.rfind("\n")
+        if last_newline >= self._line_start:
+            self._line_start = last_newline + 1
+
 
 class Evaluator:
     def __init__(self):
-        self.client = GeminiClient(EVALUATOR_PROMPT)
+        self.client = GeminiClient(EVALUATOR_PROMPT, agent_name="Evaluator")
         self.mock_mode = False
+
+        # Enhanced Safety filters live in core/safety_rules.json (shared safety scanner)
+
+        self.verdict_cache = VerdictCache(Config.VERDICT_CACHE_SIZE, Config.VERDICT_CACHE_TTL) \
+            if Config.VERDICT_CACHE_ENABLED else None
         
-        # Enhanced Safety filters
-        self.banned_phrases = [
-            r"\bdiagnos(e|is)\b", 
-            r"\bmedication\b", 
-            r"\bprescri(be|ption)\b",
-            r"\btherap(y|ist)\b.*\b(recommend|suggest)", 
-            r"\bguarantee\b", 
-            r"\bcure\b",
-            r"as a doctor", # preventing roleplay leak
-            r"i am a doctor"
-        ]
-        
-    # NOTE: Added user_input to arguments
-    def evaluate(self, worker_output: Dict, user_input: str) -> Dict:
-        draft = worker_output.get("draft_response", "")
-        tools_used = worker_output.get("tools_used", [])
+        # Optional local pre-screen that approves clearly safe LOW-risk drafts without the LLM
+        self.safety_screen = SafetyScreen.load(Config.SAFETY_SCREEN_EXEMPLARS_PATH, Config.SAFETY_SCREEN_MARGIN,
+                                               Config.SAFETY_SCREEN_AUDIT_RATE) \
+            if Config.SAFETY_SCREEN_ENABLED else None
         
+    def _precheck(self, draft: str) -> Optional[Dict]:
+        """Mock mode and regex hard rules; returns a verdict or None to continue."""
         logger.log("Evaluator", "Starting safety evaluation", 
                    data={"draft_length": len(draft)})
         
@@ -38,28 +93,81 @@ class Evaluator:
             return self._mock_evaluate(draft)
         
         # 1. Regex Safety Checks (Hard Rules)
-        if self._contains_medical_advice(draft):
-            logger.log("Evaluator", "REJECTED: Medical advice detected")
+        match = self.hard_rule_match(draft)
+        if match is not None:
+            violation = HARD_RULE_SETS[match.rule_set]
+            logger.log("Evaluator", f"REJECTED: {violation}",
+                       data={"rule": match.rule, "span": [match.start, match.end]})
             return EvaluatorOutput(
                 status="REJECTED",
-                feedback="Contains medical advice or diagnosis language.",
+                feedback=HARD_RULE_FEEDBACK[violation],
                 final_response=self._get_fallback_response()
             ).to_dict()
-        
-        if self._contains_harmful_content(draft):
-            logger.log("Evaluator", "REJECTED: Harmful content detected")
-            return EvaluatorOutput(
-                status="REJECTED",
-                feedback="Potentially harmful content detected.",
-                final_response=self._get_fallback_response()
-            ).to_dict()
-        
+
+        return None
+
+    def hard_rule_match(self, text: str) -> Optional[RuleMatch]:
+        """The first hard rule the text breaks, with its span, or None."""
+        with guard_seconds.time(guard="hard_rules"):
+            return safety_scanner.first_violation(text, HARD_RULE_SETS)
+
+    def hard_rule_violation(self, text: str) -> Optional[str]:
+        """Name of the regex hard rule the text breaks, or None."""
+        match = self.hard_rule_match(text)
+        return HARD_RULE_SETS[match.rule_set] if match is not None else None
+
+    def stream_guard(self) -> "StreamGuard":
+        """Create a guard that applies the hard rules to a streamed draft."""
+        return StreamGuard(self)
+
+    def _build_prompt(self, draft: str, user_input: str) -> str:
         # 2. LLM Contextual Check (Smart Rules)
         # We inject the prompt template manually here to pass both input and response
-        prompt = EVALUATOR_PROMPT.replace("{user_input}", user_input).replace("{agent_response}", draft)
-        
-        evaluation = self.client.generate_json(prompt)
-        
+        return EVALUATOR_PROMPT.replace("{user_input}", user_input).replace("{agent_response}", draft)
+
+    def _verdict_key(self, draft: str, risk_level: Optional[str], features: Tuple[bool, bool]) -> Optional[str]:
+        if self.verdict_cache is None:
+            return None
+        version = prompt_version(EVALUATOR_PROMPT, safety_scanner.version, Config.MODEL_NAME)
+        return self.verdict_cache.make_key(version, draft, risk_level, features)
+
+    def _cached_verdict(self, key: Optional[str], draft: str) -> Optional[Dict]:
+        if key is None:
+            return None
+        evaluation = self.verdict_cache.get(key)
+        if evaluation is None:
+            return None
+        logger.log("Evaluator", "Verdict cache hit", data={"status": evaluation.get("status")})
+        return self._finalize(evaluation, draft)
+
+    def _store_verdict(self, key: Optional[str], evaluation: Optional[Dict]):
+        # Only real LLM verdicts are cached, never the failure fallback
+        if key is not None and evaluation and evaluation.get("status") in ("APPROVED", "REJECTED"):
+            self.verdict_cache.put(key, evaluation)
+
+    def get_cache_stats(self) -> Dict:
+        return self.verdict_cache.get_stats() if self.verdict_cache is not None else {}
+
+    def _screen(self, draft: str, risk_level: Optional[str], features: Tuple[bool, bool]) -> Optional[str]:
+        """Local pre-screen decision, or None when the screen is off."""
+        if self.safety_screen is None:
+            return None
+        with guard_seconds.time(guard="safety_screen"):
+            return self.safety_screen.decide(draft, risk_level, risk_signal=any(features))
+
+    def _screened_verdict(self, draft: str) -> Dict:
+        logger.log("Evaluator", "APPROVED by local safety screen; skipping LLM evaluation")
+        return EvaluatorOutput(status="APPROVED", feedback="Local safety screen passed.",
+                               final_response=draft).to_dict()
+
+    def _record_audit(self, decision: Optional[str], evaluation: Optional[Dict]):
+        if decision == AUDIT:
+            self.safety_screen.record_audit((evaluation or {}).get("status"))
+
+    def get_screen_stats(self) -> Dict:
+        return self.safety_screen.get_stats() if self.safety_screen is not None else {}
+
+    def _finalize(self, evaluation: Optional[Dict], draft: str) -> Dict:
         if not evaluation:
             logger.log("Evaluator", "Evaluation failed, defaulting to APPROVED if regex passed")
             return EvaluatorOutput(
@@ -82,23 +190,61 @@ class Evaluator:
             feedback=evaluation.get("feedback", "Safety check failed."),
             final_response=final_response
         ).to_dict()
+
+    # NOTE: Added user_input to arguments
+    def evaluate(self, worker_output: Dict, user_input: str, risk_level: Optional[str] = None) -> Dict:
+        """Judge a draft; ``risk_level`` is the plan's and lets the local screen approve LOW-risk turns."""
+        draft = worker_output.get("draft_response", "")
+        
+        verdict = self._precheck(draft)
+        if verdict is not None:
+            return verdict
+        
+        features = input_features(user_input)
+        key = self._verdict_key(draft, risk_level, features)
+        cached = self._cached_verdict(key, draft)
+        if cached is not None:
+            return cached
+        
+        decision = self._screen(draft, risk_level, features)
+        if decision == APPROVE:
+            return self._screened_verdict(draft)
+        
+        evaluation = self.client.generate_json(self._build_prompt(draft, user_input))
+        self._record_audit(decision, evaluation)
+        self._store_verdict(key, evaluation)
+        return self._finalize(evaluation, draft)
+
+    async def evaluate_async(self, worker_output: Dict, user_input: str, risk_level: Optional[str] = None) -> Dict:
+        """Async variant of ``evaluate``."""
+        draft = worker_output.get("draft_response", "")
+        
+        verdict = self._precheck(draft)
+        if verdict is not None:
+            return verdict
+        
+        features = input_features(user_input)
+        key = self._verdict_key(draft, risk_level, features)
+        cached = self._cached_verdict(key, draft)
+        if cached is not None:
+            return cached
+        
+        decision = self._screen(draft, risk_level, features)
+        if decision == APPROVE:
+            return self._screened_verdict(draft)
+        
+        evaluation = await self.client.generate_json_async(self._build_prompt(draft, user_input))
+        self._record_audit(decision, evaluation)
+        self._store_verdict(key, evaluation)
+        return self._finalize(evaluation, draft)
     
     def _contains_medical_advice(self, text: str) -> bool:
-        text_lower = text.lower()
-        # Exception: "I cannot diagnose" is safe, but "I diagnose" is bad.
-        # This basic regex catches the word "diagnose", so we need to be careful.
-        # Improvement: If the sentence starts with negation, ignore.
-        # For now, strict mode:
-        for pattern in self.banned_phrases:
-            if re.search(pattern, text_lower):
-                # Allow refusal context like "I cannot provide a diagnosis"
-                if "cannot" in text_lower or "not a doctor" in text_lower:
-                    continue 
-                return True
-        return False
+        # "I cannot diagnose" is safe, but "I diagnose" is bad: the scanner skips
+        # matches whose sentence carries a refusal cue ("cannot", "not a doctor")
+        return safety_scanner.matches(text, "medical_advice")
     
     def _contains_harmful_content(self, text: str) -> bool:
-        return any(keyword in text.lower() for keyword in ["self-harm", "hurt yourself", "do it"])
+        return safety_scanner.matches(text, "harmful_content")
     
     def _get_fallback_response(self) -> str:
         return """
@@ -0,0 +1,97 @@
+"""
+Fused Agent: plans, drafts and self-checks a turn in a single Gemini call.
+
+Used by ``MainAgent`` when ``PIPELINE_MODE=fused``. The agent only produces
+a candidate turn; ``MainAgent`` still runs the local guards around it and
+falls back to the three-stage pipeline when the turn is risky or flagged.
+"""
+from typing import Dict, Optional, Tuple
+from project.core.context_engineering import FUSED_PROMPT
+from project.core.a2a_protocol import PlannerOutput, WorkerOutput, EvaluatorOutput
+from project.tools.tools import Tools, TECHNIQUES
+from project.core.observability import logger
+from project.core.gemini_client import GeminiClient
+
+PLAN_FIELDS = ["emotion", "risk_level", "distress_score", "action", "instruction", "technique_suggestion"]
+
+
+class FusedAgent:
+    def __init__(self):
+        self.client = GeminiClient(FUSED_PROMPT, agent_name="Fused")
+        # Support data is static, so it is rendered once
+        helpline = Tools.get_helpline("Global")
+        techniques = "\n".join(f"[{key}] " + Tools.format_technique_steps(t) for key, t in TECHNIQUES.items())
+        self.support_data = f"""
+        Grounding techniques:
+        {techniques}
+
+        Available Resources:
+        - {helpline['name']}: {helpline['number']} ({helpline['hours']})
+        - Website: {helpline['website']}
+        """
+
+    def _build_prompt(self, user_input: str, history_str: str, memory_str: str) -> str:
+        return f"""
+        LONG-TERM USER CONTEXT:
+        {memory_str}
+
+        CONVERSATION HISTORY:
+        {history_str}
+
+        SUPPORT DATA:
+        {self.support_data}
+
+        CURRENT USER INPUT:
+        {user_input}
+
+        Remember: Output ONLY valid JSON. distress_score must be an integer 1-10.
+        """
+
+    def _finalize(self, response_data: Optional[Dict]) -> Optional[Tuple[Dict, Dict, Dict]]:
+        """Split the fused reply into (plan, worker output, self-check verdict), or None if unusable."""
+        if not response_data or not response_data.get("draft_response"):
+            logger.log("Fused", "Missing or incomplete fused response")
+            return None
+        if any(field not in response_data for field in PLAN_FIELDS):
+            logger.log("Fused", "Fused response lacks plan fields")
+            return None
+
+        plan = PlannerOutput(
+            emotion=response_data["emotion"],
+            risk_level=response_data["risk_level"],
+            distress_score=response_data["distress_score"],
+            action=response_data["action"],
+            instruction=response_data["instruction"],
+            technique_suggestion=response_data.get("technique_suggestion") or "none",
+            needs_validation=response_data.get("needs_validation", True),
+            save_preference=response_data.get("save_preference")
+        ).to_dict()
+
+        draft = response_data["draft_response"]
+        technique = plan["technique_suggestion"]
+        tools_used = [technique] if plan["action"] == "provide_grounding" and technique != "none" else []
+        worker_res = WorkerOutput(
+            draft_response=draft,
+            tools_used=tools_used,
+            technique_applied=technique if plan["action"] == "provide_grounding" else None
+        ).to_dict()
+
+        self_check = response_data.get("self_check") or {}
+        eval_res = EvaluatorOutput(
+            status=self_check.get("status", "REJECTED"),
+            feedback=self_check.get("feedback") or "Fused self-check passed.",
+            final_response=draft
+        ).to_dict()
+
+        logger.log("Fused", "Fused turn complete",
+                   data={"action": plan["action"], "risk_level": plan["risk_level"], "self_check": eval_res["status"]})
+        return plan, worker_res, eval_res
+
+    def run(self, user_input: str, history_str: str, memory_str: str = "") -> Optional[Tuple[Dict, Dict, Dict]]:
+        prompt = self._build_prompt(user_input, history_str, memory_str)
+        return self._finalize(self.client.generate_json(prompt))
+
+    async def run_async(self, user_input: str, history_str: str, memory_str: str = "") -> Optional[Tuple[Dict, Dict, Dict]]:
+        """Async variant of ``run``."""
+        prompt = self._build_prompt(user_input, history_str, memory_str)
+        return self._finalize(await self.client.generate_json_async(prompt))
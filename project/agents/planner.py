@@ -8,29 +8,83 @@ from project.core.context_engineering import PLANNER_PROMPT
 from project.core.a2a_protocol import PlannerOutput
 from project.core.observability import logger
 from project.core.gemini_client import GeminiClient
+from project.core.key_scheduler import estimate_tokens
+from project.core.metrics import context_tokens
+from project.agents.triage import TriageClassifier
+from project.core.safety_scan import is_crisis, is_jailbreak
+from project.config import Config
+
+# Cheap keyword triage used to guess a plan before the LLM Planner answers
+# (crisis language is a rule set of the shared safety scanner)
+GROUNDING_KEYWORDS = {
+    "box_breathing": [r"panic", r"can'?t breathe", r"breath", r"heart (is )?racing"],
+    "54321_grounding": [r"overwhelm", r"ground", r"spiral", r"dissociat"],
+    "body_scan": [r"tense", r"tension", r"can'?t sleep", r"body"],
+}
+RESOURCE_KEYWORDS = [r"helpline", r"hotline", r"therapist near", r"resources?", r"who can i (call|talk)"]
+
 
 class Planner:
     def __init__(self):
-        self.client = GeminiClient(PLANNER_PROMPT)
+        self.client = GeminiClient(PLANNER_PROMPT, agent_name="Planner")
         self.mock_mode = False 
+        self.triage = TriageClassifier.load(Config.TRIAGE_MODEL_PATH, Config.TRIAGE_THRESHOLD) \
+            if Config.TRIAGE_ENABLED else None
         
     def _check_jailbreak(self, text: str) -> bool:
-        """Heuristic check for common jailbreak patterns."""
-        patterns = [
-            r"ignore.*instruction",
-            r"you are now a",
-            r"act as a",
-            r"simulate",
-            r"do not refuse",
-            r"developer mode"
-        ]
-        text_lower = text.lower()
-        return any(re.search(p, text_lower) for p in patterns)
-
-    def plan(self, user_input: str, history_str: str, memory_str: str = "") -> Dict:
-        logger.log("Planner", "Analyzing user input...", 
-                   data={"input_length": len(user_input)})
-        
+        """Heuristic check for common jailbreak patterns (see core/safety_rules.json)."""
+        return is_jailbreak(text)
+
+    def _check_crisis(self, text: str) -> bool:
+        """Keyword check for self-harm / suicide language."""
+        return is_crisis(text)
+
+    def provisional_plan(self, user_input: str, last_plan: Optional[Dict] = None) -> Optional[Dict]:
+        """Guess the plan locally so the Worker can start drafting speculatively.
+
+        Returns None when speculation is pointless (jailbreaks and mock mode
+        are already decided locally by ``plan``).
+        """
+        if self._check_jailbreak(user_input) or (hasattr(self, 'mock_mode') and self.mock_mode):
+            return None
+
+        text_lower = user_input.lower()
+        if self._check_crisis(user_input):
+            return PlannerOutput(
+                emotion="crisis", risk_level="HIGH", distress_score=10,
+                action="emergency_protocol",
+                instruction="User may be in crisis. Provide emergency resources and a safety disclaimer.",
+                technique_suggestion="none", needs_validation=True
+            ).to_dict()
+
+        for technique, patterns in GROUNDING_KEYWORDS.items():
+            if any(re.search(p, text_lower) for p in patterns):
+                return PlannerOutput(
+                    emotion="anxiety", risk_level="LOW", distress_score=6,
+                    action="provide_grounding",
+                    instruction="Acknowledge their feelings and guide them through a grounding technique.",
+                    technique_suggestion=technique, needs_validation=True
+                ).to_dict()
+
+        if any(re.search(p, text_lower) for p in RESOURCE_KEYWORDS):
+            return PlannerOutput(
+                emotion="seeking_help", risk_level="LOW", distress_score=4,
+                action="provide_resources",
+                instruction="Share trusted mental health resources.",
+                technique_suggestion="none", needs_validation=True
+            ).to_dict()
+
+        if last_plan and last_plan.get("action") not in (None, "enforce_boundary"):
+            return dict(last_plan)
+
+        return PlannerOutput(
+            emotion="neutral", risk_level="LOW", distress_score=2,
+            action="chat", instruction="Respond supportively.",
+            technique_suggestion="none", needs_validation=True
+        ).to_dict()
+
+    def _precheck(self, user_input: str, history_str: str = "") -> Optional[Dict]:
+        """Local rules that decide the plan without an LLM call."""
         # 1. HARD RULE: Jailbreak Pre-check
         if self._check_jailbreak(user_input):
             logger.log("Planner", "⚠️ POTENTIAL JAILBREAK DETECTED")
@@ -48,9 +102,24 @@ class Planner:
         # Mock mode
         if hasattr(self, 'mock_mode') and self.mock_mode:
             return self._mock_plan(user_input)
-        
+
+        # 2. Triage fast path: confident low-risk turns skip the LLM Planner.
+        # Crisis language in the input or recent history always escalates.
+        if self.triage is not None:
+            risk_signal = self._check_crisis(user_input) or self._check_crisis(history_str)
+            fast_plan = self.triage.plan(user_input, risk_signal=risk_signal)
+            if fast_plan is not None:
+                logger.log("Planner", "Triage fast path", data=fast_plan)
+                return fast_plan
+
+        return None
+
+    def get_triage_stats(self) -> Dict:
+        return self.triage.get_stats() if self.triage is not None else {}
+
+    def _build_prompt(self, user_input: str, history_str: str, memory_str: str) -> str:
         # Prepare prompt with LONG TERM MEMORY
-        prompt = f"""
+        return f"""
         Analyze this conversation and provide a structured plan.
         
         LONG-TERM USER CONTEXT:
@@ -66,9 +135,8 @@ class Planner:
         1. Output ONLY valid JSON.
         2. distress_score must be an integer 1-10 (1=Calm, 10=Crisis).
         """
-        
-        response_data = self.client.generate_json(prompt)
-        
+
+    def _finalize(self, response_data: Optional[Dict]) -> Dict:
         if not response_data:
             logger.log("Planner", "Failed to get valid response, using fallback")
             return PlannerOutput(
@@ -93,6 +161,42 @@ class Planner:
         
         logger.log("Planner", "Analysis complete", data=response_data)
         return response_data
+
+    def _prompt(self, user_input: str, history_str: str, memory_str: str,
+                tokens: Optional[Dict[str, int]]) -> str:
+        """Build the prompt to send and count it (with the system instruction) into ``tokens``."""
+        prompt = self._build_prompt(user_input, history_str, memory_str)
+        sent = estimate_tokens(PLANNER_PROMPT) + estimate_tokens(prompt)
+        context_tokens.observe(sent, part="planner_prompt")
+        if tokens is not None:
+            tokens["planner_prompt"] = sent
+        return prompt
+
+    def plan(self, user_input: str, history_str: str, memory_str: str = "",
+             tokens: Optional[Dict[str, int]] = None) -> Dict:
+        """Plan the reply. When the LLM is asked, its prompt size goes into ``tokens["planner_prompt"]``."""
+        logger.log("Planner", "Analyzing user input...", 
+                   data={"input_length": len(user_input)})
+        
+        local_plan = self._precheck(user_input, history_str)
+        if local_plan is not None:
+            return local_plan
+        
+        prompt = self._prompt(user_input, history_str, memory_str, tokens)
+        return self._finalize(self.client.generate_json(prompt))
+
+    async def plan_async(self, user_input: str, history_str: str, memory_str: str = "",
+                         tokens: Optional[Dict[str, int]] = None) -> Dict:
+        """Async variant of ``plan``."""
+        logger.log("Planner", "Analyzing user input...", 
+                   data={"input_length": len(user_input)})
+        
+        local_plan = self._precheck(user_input, history_str)
+        if local_plan is not None:
+            return local_plan
+        
+        prompt = self._prompt(user_input, history_str, memory_str, tokens)
+        return self._finalize(await self.client.generate_json_async(prompt))
     
     def _mock_plan(self, user_input: str) -> Dict:
         """Mock planning logic."""
@@ -0,0 +1,163 @@
+"""
+Local semantic safety pre-screen: a CPU-only gate in front of the LLM Evaluator.
+
+Drafts are turned into L2-normalised hashed character 3-5-gram vectors and
+compared, with one NumPy matrix product, against labelled safe and unsafe
+exemplar drafts. A draft whose nearest safe exemplars are clearly closer
+than its nearest unsafe ones is approved locally, but only on LOW-risk
+turns with no crisis or medical-request signal in the user's message;
+everything else escalates to the LLM Evaluator. A configurable share of
+auto-approved drafts is still sent to the LLM as an audit, and the LLM's
+disagreements are counted so drift in the exemplars shows up in the stats.
+
+Exemplars live in a JSON file: ``{"safe": [...], "unsafe": [...]}``.
+"""
+import json
+import os
+import random
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # the pre-screen is optional
+    np = None
+
+from project.core.observability import logger
+from project.core.metrics import safety_screen_total, safety_screen_disagreements_total
+
+# Decisions returned by ``SafetyScreen.decide``
+APPROVE = "auto_approved"
+AUDIT = "audited"
+ESCALATE = "escalated"
+
+NGRAM_SIZES = (3, 4, 5)
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _ngram_hashes(text: str) -> "np.ndarray":
+    """64-bit hashes of every character n-gram, computed as whole-array NumPy ops.
+
+    A fixed polynomial hash plus the murmur3 finaliser is used instead of
+    ``hash()`` so vectors are stable across processes.
+    """
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    parts = []
+    for n in NGRAM_SIZES:
+        count = len(codes) - n + 1
+        if count <= 0:
+            continue
+        h = np.full(count, n, dtype=np.uint64)
+        for j in range(n):
+            h = h * np.uint64(0x100000001B3) + codes[j:j + count]
+        parts.append(h)
+    if not parts:
+        return np.zeros(0, dtype=np.uint64)
+    h = np.concatenate(parts)
+    h ^= h >> np.uint64(33)
+    h *= np.uint64(0xFF51AFD7ED558CCD)
+    h ^= h >> np.uint64(33)
+    return h
+
+
+def ngram_vector(text: str, dim: int) -> "np.ndarray":
+    """L2-normalised hashed character n-gram counts as a dense float32 vector."""
+    padded = f" {_SPACE_RE.sub(' ', text.lower()).strip()} "
+    indices = (_ngram_hashes(padded) % np.uint64(dim)).astype(np.int64)
+    vector = np.bincount(indices, minlength=dim).astype(np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class SafetyScreen:
+    """Nearest-exemplar cosine screen over hashed character n-grams."""
+
+    def __init__(self, safe: List[str], unsafe: List[str], dim: int = 2 ** 12,
+                 margin: float = 0.1, audit_rate: float = 0.05, top_k: int = 3):
+        self.dim = dim
+        self.margin = margin
+        self.audit_rate = audit_rate
+        self.top_k = top_k
+        self.safe = np.vstack([ngram_vector(t, dim) for t in safe])
+        self.unsafe = np.vstack([ngram_vector(t, dim) for t in unsafe])
+
+        self._rng = random.Random()
+        self._lock = threading.Lock()
+        self._counts = {APPROVE: 0, AUDIT: 0, ESCALATE: 0}
+        self._audits_judged = 0
+        self._disagreements = 0
+
+    @classmethod
+    def load(cls, path: str, margin: float = 0.1, audit_rate: float = 0.05) -> Optional["SafetyScreen"]:
+        """Build the screen from an exemplar file, or return None if NumPy or the file is missing."""
+        if np is None:
+            logger.log("SafetyScreen", "NumPy not installed; safety pre-screen disabled", level="WARNING")
+            return None
+        if not os.path.exists(path):
+            logger.log("SafetyScreen", f"No exemplars at {path}; safety pre-screen disabled")
+            return None
+
+        with open(path, "r", encoding="utf-8") as f:
+            exemplars = json.load(f)
+        safe, unsafe = exemplars.get("safe", []), exemplars.get("unsafe", [])
+        if not safe or not unsafe:
+            logger.log("SafetyScreen", f"{path} needs both safe and unsafe exemplars; safety pre-screen disabled",
+                       level="WARNING")
+            return None
+
+        screen = cls(safe, unsafe, margin=margin, audit_rate=audit_rate)
+        logger.log("SafetyScreen", f"Loaded {len(safe)} safe and {len(unsafe)} unsafe exemplars from {path}")
+        return screen
+
+    def _nearest(self, exemplars: "np.ndarray", vector: "np.ndarray") -> float:
+        sims = exemplars @ vector
+        k = min(self.top_k, len(sims))
+        return float(np.partition(sims, len(sims) - k)[-k:].mean())
+
+    def score(self, draft: str) -> Tuple[float, float]:
+        """Mean cosine similarity to the ``top_k`` nearest safe and unsafe exemplars."""
+        vector = ngram_vector(draft, self.dim)
+        return self._nearest(self.safe, vector), self._nearest(self.unsafe, vector)
+
+    def decide(self, draft: str, risk_level: Optional[str], risk_signal: bool = False) -> str:
+        """``APPROVE``, ``AUDIT`` (approvable, but sampled for the LLM) or ``ESCALATE``."""
+        decision = ESCALATE
+        if risk_level == "LOW" and not risk_signal and draft.strip():
+            safe, unsafe = self.score(draft)
+            if safe - unsafe >= self.margin:
+                decision = AUDIT if self._rng.random() < self.audit_rate else APPROVE
+
+        with self._lock:
+            self._counts[decision] += 1
+        safety_screen_total.inc(decision=decision)
+        return decision
+
+    def record_audit(self, status: Optional[str]):
+        """Compare the LLM's verdict on an audited draft with the local approval."""
+        if status not in ("APPROVED", "REJECTED"):
+            return  # the LLM call failed; nothing to compare
+        disagreed = status != "APPROVED"
+        with self._lock:
+            self._audits_judged += 1
+            self._disagreements += disagreed
+        if disagreed:
+            safety_screen_disagreements_total.inc()
+            logger.log("SafetyScreen", "Audit disagreement: LLM rejected a draft the screen approved",
+                       level="WARNING")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            screened = sum(self._counts.values())
+            return {
+                "screened": screened,
+                "auto_approved": self._counts[APPROVE],
+                "audited": self._counts[AUDIT],
+                "escalated": self._counts[ESCALATE],
+                # Share of drafts that reached the screen and skipped the LLM Evaluator
+                "calls_avoided_ratio": round(self._counts[APPROVE] / screened, 4) if screened else 0.0,
+                "audit_disagreements": self._disagreements,
+                "audit_disagreement_rate": round(self._disagreements / self._audits_judged, 4)
+                if self._audits_judged else 0.0,
+            }
@@ -0,0 +1,63 @@
+"""
+Summarizer Agent: Folds older conversation turns into a rolling summary.
+
+Runs in the background (see ``project/memory/context_builder.py``), never
+on the request path. In mock mode, or when Gemini gives no answer, a local
+extractive summary of the user's messages is used instead.
+"""
+import re
+from typing import List
+from project.core.context_engineering import SUMMARY_PROMPT
+from project.core.observability import logger
+from project.core.gemini_client import GeminiClient
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+
+class Summarizer:
+    def __init__(self):
+        self.client = GeminiClient(SUMMARY_PROMPT, agent_name="Summarizer")
+        self.mock_mode = False
+
+    def _build_prompt(self, previous: str, lines: List[str], max_tokens: int) -> str:
+        conversation = "\n".join(lines)
+        return f"""
+        SUMMARY SO FAR:
+        {previous or "(none)"}
+        
+        NEW MESSAGES TO FOLD IN:
+        {conversation}
+        
+        Write the updated summary in at most {max(20, max_tokens * 3 // 4)} words.
+        """
+
+    def _local_summary(self, previous: str, lines: List[str], max_tokens: int) -> str:
+        """First sentence of each user message, keeping the newest within ~4 chars/token."""
+        notes = [_SENTENCE_END_RE.split(line[len("USER: "):], 1)[0]
+                 for line in lines if line.startswith("USER: ")]
+        text = " ".join(([previous] if previous else []) + [f"The user said: {n}" for n in notes if n])
+        limit = max_tokens * 4 - 3
+        if len(text) <= limit + 3:
+            return text
+        tail = text[-limit:]
+        return "..." + tail[tail.find(" ") + 1:]  # drop the oldest notes, from a word boundary
+
+    def _finalize(self, summary, previous: str, lines: List[str], max_tokens: int) -> str:
+        if not summary:
+            logger.log("Summarizer", "No summary from Gemini, using local summary")
+            return self._local_summary(previous, lines, max_tokens)
+        return summary.strip()
+
+    def summarize(self, previous: str, lines: List[str], max_tokens: int) -> str:
+        """Fold ``lines`` ("ROLE: text") into ``previous`` within about ``max_tokens``."""
+        if hasattr(self, 'mock_mode') and self.mock_mode:
+            return self._local_summary(previous, lines, max_tokens)
+        summary = self.client.generate_response(self._build_prompt(previous, lines, max_tokens))
+        return self._finalize(summary, previous, lines, max_tokens)
+
+    async def summarize_async(self, previous: str, lines: List[str], max_tokens: int) -> str:
+        """Async variant of ``summarize``."""
+        if hasattr(self, 'mock_mode') and self.mock_mode:
+            return self._local_summary(previous, lines, max_tokens)
+        summary = await self.client.generate_response_async(self._build_prompt(previous, lines, max_tokens))
+        return self._finalize(summary, previous, lines, max_tokens)
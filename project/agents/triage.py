@@ -0,0 +1,195 @@
+"""
+Local triage classifier: a CPU-only fast path in front of the LLM Planner.
+
+Text is turned into hashed word uni/bi-gram and character tri-gram counts,
+and one multinomial Naive Bayes head per plan field (emotion, risk_level,
+distress_score, action, technique_suggestion) scores it with a single
+sparse NumPy gather. When every head is confident and no risk signal is
+present the classifier returns a ``PlannerOutput`` directly; otherwise the
+turn escalates to the LLM Planner.
+
+Models are trained by ``scripts/train_triage.py`` from Planner-labelled
+turns and stored as a single ``.npz`` file.
+"""
+import os
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional, Tuple, Any
+
+try:
+    import numpy as np
+except ImportError:  # the fast path is optional
+    np = None
+
+from project.core.a2a_protocol import PlannerOutput
+from project.core.observability import logger
+
+HEADS = ["emotion", "risk_level", "distress_score", "action", "technique_suggestion"]
+
+# Worker instructions for each action the fast path may choose
+ACTION_INSTRUCTIONS = {
+    "chat": "Respond supportively and validate their feelings.",
+    "provide_grounding": "Acknowledge their feelings and guide them through the suggested grounding technique.",
+    "provide_resources": "Share trusted mental health resources.",
+}
+
+# Turns that mention likes/dislikes must reach the LLM so preferences get saved
+PREFERENCE_SIGNAL = re.compile(r"\b(i (really )?(like|love|prefer|hate|dislike)|works for me|doesn'?t work)\b")
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+def hashed_features(text: str, dim: int) -> Tuple[List[int], List[float]]:
+    """Sparse hashed n-gram counts as (indices, counts).
+
+    crc32 is used instead of ``hash()`` so features are stable across processes.
+    """
+    text = text.lower()
+    words = _TOKEN_RE.findall(text)
+    grams = words + [a + " " + b for a, b in zip(words, words[1:])]
+    padded = f" {' '.join(words)} "
+    grams += ["#" + padded[i:i + 3] for i in range(len(padded) - 2)]
+
+    counts: Dict[int, float] = {}
+    for gram in grams:
+        index = zlib.crc32(gram.encode("utf-8")) % dim
+        counts[index] = counts.get(index, 0.0) + 1.0
+    return list(counts.keys()), list(counts.values())
+
+
+class TriageClassifier:
+    """Multi-head hashed-n-gram Naive Bayes over Planner fields."""
+
+    def __init__(self, dim: int, heads: Dict[str, Dict[str, Any]], threshold: float = 0.85):
+        self.dim = dim
+        # head -> {"classes": ndarray[str], "log_prior": (C,), "log_likelihood": (C, dim)}
+        self.heads = heads
+        self.threshold = threshold
+
+        self._lock = threading.Lock()
+        self._fast_path = 0
+        self._escalated = 0
+
+    # ---- persistence ----
+
+    @classmethod
+    def load(cls, path: str, threshold: float = 0.85) -> Optional["TriageClassifier"]:
+        """Load a trained model, or return None if NumPy or the file is missing."""
+        if np is None:
+            logger.log("Triage", "NumPy not installed; triage fast path disabled", level="WARNING")
+            return None
+        if not os.path.exists(path):
+            logger.log("Triage", f"No triage model at {path}; triage fast path disabled")
+            return None
+
+        data = np.load(path, allow_pickle=False)
+        heads = {}
+        for head in HEADS:
+            heads[head] = {
+                "classes": data[f"{head}__classes"],
+                "log_prior": data[f"{head}__log_prior"],
+                "log_likelihood": data[f"{head}__log_likelihood"],
+            }
+        model = cls(int(data["dim"]), heads, threshold)
+        logger.log("Triage", f"Loaded triage model from {path}")
+        return model
+
+    def save(self, path: str):
+        arrays = {"dim": np.array(self.dim)}
+        for head, params in self.heads.items():
+            arrays[f"{head}__classes"] = params["classes"]
+            arrays[f"{head}__log_prior"] = params["log_prior"]
+            arrays[f"{head}__log_likelihood"] = params["log_likelihood"]
+        np.savez_compressed(path, **arrays)
+
+    # ---- training ----
+
+    @classmethod
+    def train(cls, texts: List[str], labels: List[Dict[str, Any]], dim: int = 2 ** 15,
+              alpha: float = 0.5, threshold: float = 0.85) -> "TriageClassifier":
+        """Fit one multinomial NB head per Planner field from labelled turns."""
+        rows = [hashed_features(t, dim) for t in texts]
+        heads = {}
+        for head in HEADS:
+            values = [str(label.get(head, "none")) for label in labels]
+            classes = sorted(set(values))
+            class_index = {c: i for i, c in enumerate(classes)}
+
+            feature_counts = np.zeros((len(classes), dim), dtype=np.float64)
+            class_counts = np.zeros(len(classes), dtype=np.float64)
+            for (indices, counts), value in zip(rows, values):
+                c = class_index[value]
+                class_counts[c] += 1
+                np.add.at(feature_counts[c], indices, counts)
+
+            smoothed = feature_counts + alpha
+            heads[head] = {
+                "classes": np.array(classes),
+                "log_prior": np.log(class_counts / class_counts.sum()),
+                "log_likelihood": (np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))).astype(np.float32),
+            }
+        return cls(dim, heads, threshold)
+
+    # ---- inference ----
+
+    def predict(self, text: str) -> Dict[str, Tuple[str, float]]:
+        """Most likely value and its posterior probability for every head."""
+        indices, counts = hashed_features(text, self.dim)
+        idx = np.asarray(indices, dtype=np.int64)
+        cnt = np.asarray(counts, dtype=np.float32)
+
+        result = {}
+        for head, params in self.heads.items():
+            joint = params["log_prior"] + params["log_likelihood"][:, idx] @ cnt
+            joint = joint - joint.max()
+            probs = np.exp(joint)
+            probs /= probs.sum()
+            best = int(probs.argmax())
+            result[head] = (str(params["classes"][best]), float(probs[best]))
+        return result
+
+    def plan(self, user_input: str, risk_signal: bool = False) -> Optional[Dict]:
+        """A confident low-risk ``PlannerOutput`` dict, or None to escalate to the LLM."""
+        if risk_signal or PREFERENCE_SIGNAL.search(user_input.lower()):
+            return self._escalate()
+
+        prediction = self.predict(user_input)
+        if any(confidence < self.threshold for _, confidence in prediction.values()):
+            return self._escalate()
+
+        action = prediction["action"][0]
+        risk = prediction["risk_level"][0]
+        try:
+            distress = int(prediction["distress_score"][0])
+        except ValueError:
+            return self._escalate()
+        if risk != "LOW" or action not in ACTION_INSTRUCTIONS or distress >= 8:
+            return self._escalate()
+
+        with self._lock:
+            self._fast_path += 1
+        return PlannerOutput(
+            emotion=prediction["emotion"][0],
+            risk_level=risk,
+            distress_score=distress,
+            action=action,
+            instruction=ACTION_INSTRUCTIONS[action],
+            technique_suggestion=prediction["technique_suggestion"][0] if action == "provide_grounding" else "none",
+            needs_validation=True,
+            save_preference=None
+        ).to_dict()
+
+    def _escalate(self) -> None:
+        with self._lock:
+            self._escalated += 1
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._fast_path + self._escalated
+            return {
+                "fast_path": self._fast_path,
+                "escalated": self._escalated,
+                "fast_path_ratio": round(self._fast_path / total, 4) if total else 0.0,
+            }
@@ -1,31 +1,50 @@
 """
 Worker Agent: Executes the plan and generates safe, supportive responses.
 """
-from typing import Dict
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Iterator, AsyncIterator
 # FIX: Use absolute imports
 from project.core.context_engineering import WORKER_PROMPT
 from project.core.a2a_protocol import WorkerOutput
 from project.tools.tools import Tools
 from project.core.observability import logger
 from project.core.gemini_client import GeminiClient
+from project.core.circuit_breaker import StreamInterruptedError
+from project.core.key_scheduler import estimate_tokens
+from project.core.metrics import (
+    worker_guard_aborts_total, worker_guard_saved_tokens_total, worker_guard_saved_seconds_total
+)
+from project.config import Config
+
+# Starting guess for a full draft's length, until completed drafts refine it
+_TYPICAL_DRAFT_TOKENS = 300
+
+# Builds a fresh stream guard (``Evaluator.stream_guard``) for each generation: ``feed`` each
+# chunk, then ``finish`` once the stream is complete
+GuardFactory = Callable[[], Any]
+
+REGENERATION_NOTE = """
+        NOTE: Your previous draft was stopped because it contained {violation}.
+        Write a new response that does not diagnose, name or recommend medication,
+        prescribe, promise a cure, or speak as a doctor.
+        """
 
 class Worker:
     def __init__(self):
-        self.client = GeminiClient(WORKER_PROMPT)
+        self.client = GeminiClient(WORKER_PROMPT, agent_name="Worker")
         self.mock_mode = False
         
-    def work(self, planner_output: Dict) -> Dict:
+        # Guarded generations cancelled early, and what that saved (estimates)
+        self.guard_stats = {"drafts": 0, "aborts": 0, "regenerations": 0, "interrupted": 0,
+                            "tokens_saved": 0, "saved_ms": 0.0}
+        self._typical_tokens = float(_TYPICAL_DRAFT_TOKENS)
+        
+    def _build_prompt(self, planner_output: Dict) -> Tuple[str, List[str]]:
+        """Gather tool context for the plan and build the Worker prompt."""
         instruction = planner_output.get("instruction", "")
         action = planner_output.get("action", "")
         technique_suggestion = planner_output.get("technique_suggestion", "none")
         
-        logger.log("Worker", "Executing plan", 
-                  data={"action": action, "technique": technique_suggestion})
-        
-        # Mock mode
-        if hasattr(self, 'mock_mode') and self.mock_mode:
-            return self._mock_work(planner_output)
-        
         # Gather context data
         context_data = ""
         tools_used = []
@@ -64,10 +83,12 @@ class Worker:
         
         Generate a safe, supportive response following your guidelines.
         """
-        
-        # Generate response
-        draft = self.client.generate_response(prompt)
-        
+        return prompt, tools_used
+
+    def _finalize(self, planner_output: Dict, draft: Optional[str], tools_used: List[str]) -> Dict:
+        action = planner_output.get("action", "")
+        technique_suggestion = planner_output.get("technique_suggestion", "none")
+
         if not draft:
             # Fallback response
             draft = "I apologize, but I'm having trouble generating a response. Please try again, or contact a mental health professional if you need immediate support."
@@ -77,6 +98,222 @@ class Worker:
             tools_used=tools_used,
             technique_applied=technique_suggestion if action == "provide_grounding" else None
         ).to_dict()
+
+    def _log_start(self, planner_output: Dict):
+        logger.log("Worker", "Executing plan", 
+                  data={"action": planner_output.get("action", ""),
+                        "technique": planner_output.get("technique_suggestion", "none")})
+
+    def _settle_attempt(self, guard, started: float, first_chunk: Optional[Tuple[float, int]]) -> bool:
+        """Account for one guarded generation; returns True if the guard cut it short."""
+        generated = estimate_tokens(guard.text) if guard.text else 0
+        self.guard_stats["drafts"] += 1
+        if not guard.violation:
+            if generated:
+                self._typical_tokens += 0.2 * (generated - self._typical_tokens)
+            return False
+        
+        # Savings are estimated: the typical draft length minus what was generated,
+        # at the rate chunks were arriving (measured after the first one, so the
+        # time to first token does not count as generation time)
+        now = time.perf_counter()
+        if first_chunk and now > first_chunk[0] and generated > first_chunk[1]:
+            rate = (generated - first_chunk[1]) / (now - first_chunk[0])
+        else:
+            rate = generated / (now - started) if now > started else 0.0
+        tokens_saved = max(0, int(min(self._typical_tokens, Config.MAX_OUTPUT_TOKENS)) - generated)
+        saved_s = tokens_saved / rate if rate > 0 else 0.0
+        
+        self.guard_stats["aborts"] += 1
+        self.guard_stats["tokens_saved"] += tokens_saved
+        self.guard_stats["saved_ms"] += saved_s * 1000
+        worker_guard_aborts_total.inc(rule=guard.violation)
+        worker_guard_saved_tokens_total.inc(tokens_saved)
+        worker_guard_saved_seconds_total.inc(saved_s)
+        logger.log("Worker", f"Stream guard aborted draft: {guard.violation}",
+                   data={"generated_tokens": generated, "tokens_saved": tokens_saved,
+                         "saved_ms": round(saved_s * 1000, 1)})
+        return True
+
+    def _redraft_event(self, error: StreamInterruptedError) -> Dict:
+        """Note a draft stream that died midway; the caller redrafts with a plain call."""
+        self.guard_stats["interrupted"] += 1
+        logger.log("Worker", f"Draft stream interrupted, redrafting without streaming: {error}", level="WARNING")
+        return {"type": "restart", "violation": None}
+
+    def _guarded_events(self, planner_output: Dict, guard_factory: GuardFactory) -> Iterator[Dict]:
+        """Stream the draft through a guard, cancelling and regenerating on a violation.
+
+        Yields the same events as ``work_stream_async`` plus a
+        ``{"type": "restart", "violation": ...}`` event before each fresh draft.
+        If every draft trips the guard, the last partial draft is returned so
+        the Evaluator's hard rules reject it without an LLM call. A stream
+        that fails midway is redrafted with one unstreamed call (``violation``
+        is None on its restart event) rather than returned truncated.
+        """
+        base_prompt, tools_used = self._build_prompt(planner_output)
+        prompt = base_prompt
+        regenerations = max(0, Config.WORKER_GUARD_REGENERATIONS)
+        for attempt in range(regenerations + 1):
+            guard = guard_factory()
+            started, first_chunk = time.perf_counter(), None
+            stream = self.client.stream_response(prompt)
+            interrupted = None
+            try:
+                for text in stream:
+                    if guard.feed(text):
+                        break
+                    if first_chunk is None:
+                        first_chunk = (time.perf_counter(), estimate_tokens(guard.text))
+                    yield {"type": "chunk", "text": text}
+                else:
+                    # The draft is complete: a match still waiting for its sentence to end is settled now
+                    guard.finish()
+            except StreamInterruptedError as e:
+                interrupted = e
+            finally:
+                # Cancels the upstream generation if the guard stopped reading early
+                stream.close()
+            
+            if interrupted is not None:
+                yield self._redraft_event(interrupted)
+                draft = self.client.generate_response(prompt)
+                if draft:
+                    yield {"type": "chunk", "text": draft}
+                yield {"type": "done", "output": self._finalize(planner_output, draft, tools_used)}
+                return
+            
+            if not self._settle_attempt(guard, started, first_chunk) or attempt == regenerations:
+                break
+            self.guard_stats["regenerations"] += 1
+            prompt = base_prompt + REGENERATION_NOTE.format(violation=guard.violation.lower())
+            yield {"type": "restart", "violation": guard.violation}
+        
+        yield {"type": "done", "output": self._finalize(planner_output, guard.text.strip(), tools_used)}
+
+    async def _guarded_events_async(self, planner_output: Dict, guard_factory: GuardFactory) -> AsyncIterator[Dict]:
+        """Async variant of ``_guarded_events``."""
+        base_prompt, tools_used = self._build_prompt(planner_output)
+        prompt = base_prompt
+        regenerations = max(0, Config.WORKER_GUARD_REGENERATIONS)
+        for attempt in range(regenerations + 1):
+            guard = guard_factory()
+            started, first_chunk = time.perf_counter(), None
+            stream = self.client.stream_response_async(prompt)
+            interrupted = None
+            try:
+                async for text in stream:
+                    if guard.feed(text):
+                        break
+                    if first_chunk is None:
+                        first_chunk = (time.perf_counter(), estimate_tokens(guard.text))
+                    yield {"type": "chunk", "text": text}
+                else:
+                    # The draft is complete: a match still waiting for its sentence to end is settled now
+                    guard.finish()
+            except StreamInterruptedError as e:
+                interrupted = e
+            finally:
+                await stream.aclose()
+            
+            if interrupted is not None:
+                yield self._redraft_event(interrupted)
+                draft = await self.client.generate_response_async(prompt)
+                if draft:
+                    yield {"type": "chunk", "text": draft}
+                yield {"type": "done", "output": self._finalize(planner_output, draft, tools_used)}
+                return
+            
+            if not self._settle_attempt(guard, started, first_chunk) or attempt == regenerations:
+                break
+            self.guard_stats["regenerations"] += 1
+            prompt = base_prompt + REGENERATION_NOTE.format(violation=guard.violation.lower())
+            yield {"type": "restart", "violation": guard.violation}
+        
+        yield {"type": "done", "output": self._finalize(planner_output, guard.text.strip(), tools_used)}
+
+    def get_guard_stats(self) -> Dict[str, Any]:
+        """Early-abort counts and estimated tokens and time saved."""
+        stats = dict(self.guard_stats)
+        stats["abort_rate"] = round(stats["aborts"] / stats["drafts"], 4) if stats["drafts"] else 0.0
+        stats["saved_ms"] = round(stats["saved_ms"], 1)
+        return stats
+
+    def work(self, planner_output: Dict, guard_factory: Optional[GuardFactory] = None) -> Dict:
+        """Draft a response; with ``guard_factory`` the draft is streamed and guarded."""
+        self._log_start(planner_output)
+        
+        # Mock mode
+        if hasattr(self, 'mock_mode') and self.mock_mode:
+            return self._mock_work(planner_output)
+        
+        if guard_factory is not None:
+            for event in self._guarded_events(planner_output, guard_factory):
+                if event["type"] == "done":
+                    return event["output"]
+        
+        prompt, tools_used = self._build_prompt(planner_output)
+        draft = self.client.generate_response(prompt)
+        return self._finalize(planner_output, draft, tools_used)
+
+    async def work_async(self, planner_output: Dict, guard_factory: Optional[GuardFactory] = None) -> Dict:
+        """Async variant of ``work``."""
+        self._log_start(planner_output)
+        
+        if hasattr(self, 'mock_mode') and self.mock_mode:
+            return self._mock_work(planner_output)
+        
+        if guard_factory is not None:
+            async for event in self._guarded_events_async(planner_output, guard_factory):
+                if event["type"] == "done":
+                    return event["output"]
+        
+        prompt, tools_used = self._build_prompt(planner_output)
+        draft = await self.client.generate_response_async(prompt)
+        return self._finalize(planner_output, draft, tools_used)
+    
+    async def work_stream_async(self, planner_output: Dict,
+                                guard_factory: Optional[GuardFactory] = None) -> AsyncIterator[Dict]:
+        """Stream the draft as it is generated.
+
+        Yields ``{"type": "chunk", "text": ...}`` events followed by a single
+        ``{"type": "done", "output": WorkerOutput dict}`` event. With
+        ``guard_factory``, a draft that breaks a hard rule is cancelled
+        upstream and may be followed by a ``restart`` event and a new draft.
+        A stream that fails midway is also followed by a ``restart`` event and
+        a draft from one unstreamed call, so a truncated draft is never final.
+        """
+        self._log_start(planner_output)
+        
+        if hasattr(self, 'mock_mode') and self.mock_mode:
+            output = self._mock_work(planner_output)
+            yield {"type": "chunk", "text": output["draft_response"]}
+            yield {"type": "done", "output": output}
+            return
+        
+        if guard_factory is not None:
+            events = self._guarded_events_async(planner_output, guard_factory)
+            try:
+                async for event in events:
+                    yield event
+            finally:
+                await events.aclose()
+            return
+        
+        prompt, tools_used = self._build_prompt(planner_output)
+        parts: List[str] = []
+        try:
+            async for text in self.client.stream_response_async(prompt):
+                parts.append(text)
+                yield {"type": "chunk", "text": text}
+            draft = "".join(parts).strip()
+        except StreamInterruptedError as e:
+            yield self._redraft_event(e)
+            draft = await self.client.generate_response_async(prompt)
+            if draft:
+                yield {"type": "chunk", "text": draft}
+        
+        yield {"type": "done", "output": self._finalize(planner_output, draft, tools_used)}
     
     def _mock_work(self, planner_output: Dict) -> Dict:
         """Mock worker for testing - NOW RESPECTS TECHNIQUE SUGGESTION"""
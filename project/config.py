@@ -2,10 +2,12 @@
 # file: config.py
 # -----------------------------
 import os
-import random
-from dotenv import load_dotenv
+from dotenv import load_dotenv, dotenv_values, find_dotenv
 from typing import List, Optional
 
+# Keys set in the process environment win over .env, here and on every hot reload
+_KEYS_FROM_ENVIRON = "GEMINI_API_KEYS" in os.environ
+
 # Load environment variables from .env (if present)
 load_dotenv()
 
@@ -18,6 +20,8 @@ class Config:
     - MOCK_MODE: if set to a truthy value ("1", "true", "True") then the
       client runs in mock mode and requests are not sent to Gemini.
     - MODEL_NAME: configurable model name (defaults to gemini-2.0-flash)
+    - CASSETTE_MODE: "record" saves every Gemini call to CASSETTE_PATH,
+      "replay" answers calls from that file without network or keys.
     """
 
     # Basic runtime flags
@@ -26,12 +30,122 @@ class Config:
     # Model name (kept configurable)
     MODEL_NAME: str = os.getenv("MODEL_NAME", "")
 
+    # Stream the Worker's draft into the chat as it is generated
+    STREAM_RESPONSES: bool = os.getenv("STREAM_RESPONSES", "True").lower() in ("1", "true", "yes")
+
+    # Start the Worker on a locally guessed plan while the LLM Planner runs
+    SPECULATIVE_WORKER: bool = os.getenv("SPECULATIVE_WORKER", "False").lower() in ("1", "true", "yes")
+
+    # "staged" runs Planner -> Worker -> Evaluator; "fused" answers in one call
+    PIPELINE_MODE: str = os.getenv("PIPELINE_MODE", "staged").lower()
+
     # Generation configuration
     TEMPERATURE: float = float(os.getenv("TEMPERATURE", "0.1"))
     MAX_OUTPUT_TOKENS: int = int(os.getenv("MAX_OUTPUT_TOKENS", "2048"))
 
+    # Opt-in response cache for deterministic agents (never the Worker by default)
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "False").lower() in ("1", "true", "yes")
+    LLM_CACHE_AGENTS: List[str] = [
+        a.strip().lower() for a in os.getenv("LLM_CACHE_AGENTS", "planner,evaluator").split(",") if a.strip()
+    ]
+    LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+    LLM_CACHE_TTL: float = float(os.getenv("LLM_CACHE_TTL", "86400"))
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+    LLM_CACHE_MEMORY_ENTRIES: int = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "1024"))
+
+    # Coalesce concurrent identical Gemini calls into one upstream request
+    SINGLE_FLIGHT: bool = os.getenv("SINGLE_FLIGHT", "True").lower() in ("1", "true", "yes")
+
+    # Hedged requests: duplicate slow calls on another key once they pass the agent's running p90
+    HEDGE_ENABLED: bool = os.getenv("HEDGE_ENABLED", "False").lower() in ("1", "true", "yes")
+    HEDGE_PERCENTILE: float = float(os.getenv("HEDGE_PERCENTILE", "0.9"))
+    HEDGE_MIN_SAMPLES: int = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+    HEDGE_MIN_DELAY: float = float(os.getenv("HEDGE_MIN_DELAY", "0.3"))
+    HEDGE_MAX_RATE: float = float(os.getenv("HEDGE_MAX_RATE", "0.1"))
+    # Blocking calls that may hedge at once (two threads each); further calls run unhedged on their own thread
+    HEDGE_SYNC_CALLS: int = int(os.getenv("HEDGE_SYNC_CALLS", "16"))
+
+    # Circuit breaker around the Gemini upstream and retry backoff cap (seconds)
+    BREAKER_FAILURE_RATE: float = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+    BREAKER_MIN_CALLS: int = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+    BREAKER_WINDOW: int = int(os.getenv("BREAKER_WINDOW", "20"))
+    BREAKER_OPEN_SECONDS: float = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+    GEMINI_BACKOFF_CAP: float = float(os.getenv("GEMINI_BACKOFF_CAP", "10"))
+
+    # Record/replay cassette for offline, deterministic runs ("off", "record" or "replay")
+    CASSETTE_MODE: str = os.getenv("CASSETTE_MODE", "off").lower()
+    CASSETTE_PATH: str = os.getenv("CASSETTE_PATH", "gemini_cassette.jsonl")
+    CASSETTE_REPLAY_LATENCY: bool = os.getenv("CASSETTE_REPLAY_LATENCY", "False").lower() in ("1", "true", "yes")
+    CASSETTE_LATENCY_SCALE: float = float(os.getenv("CASSETTE_LATENCY_SCALE", "1.0"))
+
+    # Local triage classifier that answers confident low-risk turns without the LLM Planner
+    TRIAGE_ENABLED: bool = os.getenv("TRIAGE_ENABLED", "False").lower() in ("1", "true", "yes")
+    TRIAGE_MODEL_PATH: str = os.getenv("TRIAGE_MODEL_PATH", "triage_model.npz")
+    TRIAGE_THRESHOLD: float = float(os.getenv("TRIAGE_THRESHOLD", "0.85"))
+
+    # Cache Evaluator verdicts for a draft already judged against the same user message (opt-in)
+    VERDICT_CACHE_ENABLED: bool = os.getenv("VERDICT_CACHE_ENABLED", "False").lower() in ("1", "true", "yes")
+    VERDICT_CACHE_SIZE: int = int(os.getenv("VERDICT_CACHE_SIZE", "2048"))
+    VERDICT_CACHE_TTL: float = float(os.getenv("VERDICT_CACHE_TTL", "3600"))
+
+    # Per-browser-session agent state (see project/session_manager.py)
+    SESSION_MAX: int = int(os.getenv("SESSION_MAX", "500"))
+    SESSION_TTL: float = float(os.getenv("SESSION_TTL", "1800"))
+    SESSION_MEMORY_DIR: str = os.getenv("SESSION_MEMORY_DIR", "user_memory")
+    # Longest message kept in short-term history (~4 characters per token)
+    SESSION_MESSAGE_MAX_CHARS: int = int(os.getenv("SESSION_MESSAGE_MAX_CHARS", "4000"))
+
+    # Turns running LLM work at once; the rest queue by risk priority
+    ADMISSION_MAX_CONCURRENT: int = int(os.getenv("ADMISSION_MAX_CONCURRENT", "8"))
+    # Gradio handlers allowed to run (and wait in the admission queue) at once
+    GRADIO_CONCURRENCY: int = int(os.getenv("GRADIO_CONCURRENCY", "64"))
+
+    # Rule file for the compiled safety scanner; edits are picked up without a restart
+    SAFETY_RULES_PATH: str = os.getenv(
+        "SAFETY_RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "core", "safety_rules.json"))
+    SAFETY_RULES_RELOAD_INTERVAL: float = float(os.getenv("SAFETY_RULES_RELOAD_INTERVAL", "2.0"))
+
+    # Scan the Worker's streamed draft with the hard rules and cancel it on the first violation (opt-in:
+    # guarded drafts are streamed, so they skip the response cache, single-flight and hedging)
+    WORKER_STREAM_GUARD: bool = os.getenv("WORKER_STREAM_GUARD", "False").lower() in ("1", "true", "yes")
+    # Fresh drafts to try after an aborted one before falling back to the safe response
+    WORKER_GUARD_REGENERATIONS: int = int(os.getenv("WORKER_GUARD_REGENERATIONS", "1"))
+
+    # Local semantic pre-screen that approves clearly safe LOW-risk drafts without the LLM Evaluator
+    SAFETY_SCREEN_ENABLED: bool = os.getenv("SAFETY_SCREEN_ENABLED", "False").lower() in ("1", "true", "yes")
+    SAFETY_SCREEN_EXEMPLARS_PATH: str = os.getenv(
+        "SAFETY_SCREEN_EXEMPLARS_PATH",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "core", "safety_exemplars.json"))
+    SAFETY_SCREEN_MARGIN: float = float(os.getenv("SAFETY_SCREEN_MARGIN", "0.1"))
+    # Share of auto-approved drafts still sent to the LLM to measure disagreement
+    SAFETY_SCREEN_AUDIT_RATE: float = float(os.getenv("SAFETY_SCREEN_AUDIT_RATE", "0.05"))
+
+    # Long-term memory journal: group-commit fsync window (seconds) and compaction threshold (records)
+    LTM_JOURNAL_SYNC_INTERVAL: float = float(os.getenv("LTM_JOURNAL_SYNC_INTERVAL", "1.0"))
+    LTM_JOURNAL_COMPACT_RECORDS: int = int(os.getenv("LTM_JOURNAL_COMPACT_RECORDS", "1000"))
+
+    # Long-term memory backend: "json" (a journaled file per user) or "sqlite" (sharded store keyed by user id)
+    LTM_BACKEND: str = os.getenv("LTM_BACKEND", "json").lower()
+    LTM_SQLITE_DIR: str = os.getenv("LTM_SQLITE_DIR", "user_memory_db")
+    LTM_SQLITE_SHARDS: int = int(os.getenv("LTM_SQLITE_SHARDS", "8"))
+    LTM_SQLITE_POOL_SIZE: int = int(os.getenv("LTM_SQLITE_POOL_SIZE", "4"))
+    LTM_SQLITE_CACHE_USERS: int = int(os.getenv("LTM_SQLITE_CACHE_USERS", "4096"))
+    # Entries not updated for this many seconds expire (0 keeps them forever); default 90 days
+    LTM_TTL: float = float(os.getenv("LTM_TTL", "7776000"))
+
+    # Planner context budget (estimated tokens), split between long-term preferences, a rolling
+    # summary of older turns and verbatim recent turns (whatever the first two leave)
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+    CONTEXT_PREFERENCES_SHARE: float = float(os.getenv("CONTEXT_PREFERENCES_SHARE", "0.15"))
+    CONTEXT_SUMMARY_SHARE: float = float(os.getenv("CONTEXT_SUMMARY_SHARE", "0.25"))
+    # Fold older turns into the summary in the background once this many are waiting
+    CONTEXT_SUMMARY_ENABLED: bool = os.getenv("CONTEXT_SUMMARY_ENABLED", "True").lower() in ("1", "true", "yes")
+    CONTEXT_SUMMARY_BATCH: int = int(os.getenv("CONTEXT_SUMMARY_BATCH", "4"))
+
     # Internal: parsed list of API keys
     _GEMINI_API_KEYS_RAW: str = os.getenv("GEMINI_API_KEYS", "")
+    # Internal: .env path, resolved on first use ("" when there is none)
+    _ENV_FILE: Optional[str] = None
 
     # Publicly usable sequence of keys (list[str])
     @classmethod
@@ -48,6 +162,43 @@ class Config:
         parts = [p.strip() for p in raw.replace(";", ",").split(",")]
         return [p for p in parts if p]
 
+    @classmethod
+    def env_file(cls) -> str:
+        """Path of the .env file, or "" if there is none (looked up once)."""
+        if cls._ENV_FILE is None:
+            cls._ENV_FILE = find_dotenv(usecwd=True)
+        return cls._ENV_FILE
+
+    @classmethod
+    def env_file_mtime(cls) -> Optional[float]:
+        """Modification time of the .env file, or None if there is none."""
+        path = cls.env_file()
+        if not path:
+            return None
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return None
+
+    @classmethod
+    def reload_keys(cls) -> List[str]:
+        """Re-read GEMINI_API_KEYS so keys can be rotated without a restart.
+
+        As with ``load_dotenv``, a value set in the process environment wins;
+        only keys that came from the .env file are re-read from it.
+        """
+        if _KEYS_FROM_ENVIRON:
+            cls._GEMINI_API_KEYS_RAW = os.environ.get("GEMINI_API_KEYS", "")
+        else:
+            path = cls.env_file()
+            cls._GEMINI_API_KEYS_RAW = (dotenv_values(path).get("GEMINI_API_KEYS") if path else None) or ""
+        return cls.GEMINI_API_KEYS()
+
+    @classmethod
+    def cache_enabled_for(cls, agent_name: Optional[str]) -> bool:
+        """Whether responses for the given agent may be served from the cache."""
+        return cls.LLM_CACHE_ENABLED and bool(agent_name) and agent_name.lower() in cls.LLM_CACHE_AGENTS
+
     @classmethod
     def validate(cls) -> None:
         """Validate configuration and raise on misconfiguration.
@@ -56,7 +207,7 @@ class Config:
         key must be present.
         """
         keys = cls.GEMINI_API_KEYS()
-        if cls.MOCK_MODE:
+        if cls.MOCK_MODE or cls.CASSETTE_MODE == "replay":
             # allow running without keys
             return
         if not keys:
@@ -66,16 +217,15 @@ class Config:
 
     @classmethod
     def rotate_gemini_key(cls) -> str:
-        """Randomly pick an available Gemini API key.
+        """Pick the healthiest available Gemini API key.
+
+        Delegates to the rate-limit-aware KeyScheduler, which skips keys that
+        are cooling down after 429s and prefers the one with most headroom.
 
         Raises ValueError if there are no keys configured.
         """
-        keys = cls.GEMINI_API_KEYS()
-        if not keys:
-            raise ValueError("No API keys available for rotation")
-        # random.choice is fine for simple rotation; if you prefer round-robin
-        # implement a persistent index (e.g. Redis/DB/file) instead.
-        return random.choice(keys)
+        from project.core.key_scheduler import key_scheduler
+        return key_scheduler.acquire()
 
     @classmethod
     def max_retries(cls) -> int:
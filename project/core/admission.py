@@ -0,0 +1,106 @@
+"""
+Risk-aware admission scheduler for pipeline turns.
+
+At most ``max_concurrent`` turns run their LLM work at once; the rest wait
+in a priority queue instead of FIFO, so a user in crisis is admitted ahead
+of small talk. Priorities come from cheap local signals (see
+``MainAgent.admission_priority``). Within a priority class turns are served
+in arrival order.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Tuple, Any
+
+from project.core.metrics import registry
+from project.config import Config
+
+# Priority classes, most urgent first
+CRISIS = 0     # crisis language now, or the session's last plan was HIGH risk
+ELEVATED = 1   # the session's last plan was MEDIUM risk
+NORMAL = 2
+LOW = 3        # jailbreak attempts: answered, but never ahead of other users
+
+PRIORITY_NAMES = {CRISIS: "crisis", ELEVATED: "elevated", NORMAL: "normal", LOW: "low"}
+
+admission_queue_depth = registry.gauge(
+    "sereneshield_admission_queue_depth", "Turns waiting for admission by priority.", ["priority"])
+admission_in_flight = registry.gauge(
+    "sereneshield_admission_in_flight", "Turns currently admitted.")
+admission_wait_seconds = registry.histogram(
+    "sereneshield_admission_wait_seconds", "Time a turn waited for admission by priority.", ["priority"])
+
+
+class AdmissionScheduler:
+    """Priority-ordered concurrency limiter for a single asyncio event loop."""
+
+    def __init__(self, max_concurrent: int = 8):
+        self.max_concurrent = max_concurrent
+        self._active = 0
+        self._heap: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._waiting: Dict[int, int] = {p: 0 for p in PRIORITY_NAMES}
+        self._admitted: Dict[int, int] = {p: 0 for p in PRIORITY_NAMES}
+
+    def _set_depth(self, priority: int, delta: int):
+        self._waiting[priority] += delta
+        admission_queue_depth.set(self._waiting[priority], priority=PRIORITY_NAMES[priority])
+
+    async def acquire(self, priority: int = NORMAL):
+        """Wait until a slot is free and no more urgent turn is waiting."""
+        started = time.perf_counter()
+        if self._active < self.max_concurrent and not self._heap:
+            self._active += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._heap, (priority, next(self._seq), future))
+            self._set_depth(priority, +1)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # The slot was handed over just before the cancellation landed
+                    self.release()
+                raise
+            finally:
+                self._set_depth(priority, -1)
+
+        self._admitted[priority] += 1
+        admission_in_flight.set(self._active)
+        admission_wait_seconds.observe(time.perf_counter() - started, priority=PRIORITY_NAMES[priority])
+
+    def release(self):
+        """Hand the slot to the most urgent waiter, or free it."""
+        while self._heap:
+            _, _, future = heapq.heappop(self._heap)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+        admission_in_flight.set(self._active)
+
+    @asynccontextmanager
+    async def admit(self, priority: int = NORMAL) -> AsyncIterator[None]:
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {"in_flight": self._active, "queue_depth": sum(self._waiting.values())}
+        for priority, name in PRIORITY_NAMES.items():
+            waits = admission_wait_seconds.snapshot(priority=name) or {}
+            stats[name] = {
+                "waiting": self._waiting[priority],
+                "admitted": self._admitted[priority],
+                "wait_p50_s": waits.get("p50", 0.0),
+                "wait_p99_s": waits.get("p99", 0.0),
+            }
+        return stats
+
+
+# Singleton instance shared by every session in the process
+admission_scheduler = AdmissionScheduler(max_concurrent=Config.ADMISSION_MAX_CONCURRENT)
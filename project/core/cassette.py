@@ -0,0 +1,206 @@
+"""
+Record/replay cassettes for GeminiClient.
+
+In ``record`` mode every successful upstream call is appended to a compact
+JSONL file together with the latency of the attempt that succeeded (and
+chunk timings for streams), so retries and backoff are not replayed. Lines
+are written by a background thread, off the request path. In
+``replay`` mode calls are answered from that file by request hash without
+touching the network or needing API keys, optionally sleeping for the
+recorded latency, so the full ``MainAgent`` pipeline can be benchmarked
+deterministically offline.
+"""
+import asyncio
+import atexit
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Any, Iterator, AsyncIterator
+
+from project.core.observability import logger
+from project.config import Config
+
+RECORD = "record"
+REPLAY = "replay"
+
+
+class Cassette:
+    """A JSONL file of recorded Gemini request/response pairs."""
+
+    def __init__(self, path: str, mode: str, replay_latency: bool = False, latency_scale: float = 1.0):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode: {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self.latency_scale = latency_scale
+
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursor: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._pending: List[str] = []  # recorded lines not yet written
+        self._write_lock = threading.Lock()  # keeps flushes (thread and atexit) in order
+        self._wake = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._hits = 0
+        self._misses = 0
+        self._recorded = 0
+
+        if os.path.exists(path):
+            self._load()
+        elif mode == REPLAY:
+            logger.log("Cassette", f"Cassette file {path} not found; every call will miss", level="WARNING")
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self._entries.setdefault(entry["k"], []).append(entry)
+        logger.log("Cassette", f"Loaded {sum(len(v) for v in self._entries.values())} recorded call(s) from {self.path}")
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == RECORD
+
+    # ---- recording ----
+
+    def record(self, key: str, text: str, latency: float, chunks: Optional[List[List[Any]]] = None):
+        """Queue a successful call for writing.
+
+        ``latency`` is that of the successful attempt alone; ``chunks`` is a
+        list of [offset_ms, text] pairs for streams, timed from the same start.
+        """
+        entry: Dict[str, Any] = {"k": key, "t": text, "ms": round(latency * 1000, 1)}
+        if chunks is not None:
+            entry["c"] = chunks
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._entries.setdefault(key, []).append(entry)
+            self._recorded += 1
+            self._pending.append(line)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run_writer, name="cassette-writer", daemon=True)
+                self._writer.start()
+                atexit.register(self.flush)
+        self._wake.set()
+
+    def _run_writer(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.log("Cassette", f"Error writing {self.path}: {e}", level="ERROR")
+
+    def flush(self):
+        """Write every queued recording to the cassette file now."""
+        with self._write_lock:
+            with self._lock:
+                lines, self._pending = self._pending, []
+            if lines:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+
+    # ---- replay ----
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Next recorded entry for ``key``; repeated requests walk the recordings in order."""
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                self._misses += 1
+                return None
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = min(index + 1, len(entries) - 1)
+            self._hits += 1
+            return entries[index]
+
+    def _delay(self, ms: float) -> float:
+        return (ms / 1000.0) * self.latency_scale if self.replay_latency else 0.0
+
+    def replay(self, key: str) -> Optional[str]:
+        entry = self.lookup(key)
+        if entry is None:
+            return None
+        delay = self._delay(entry.get("ms", 0))
+        if delay:
+            time.sleep(delay)
+        return entry["t"]
+
+    async def replay_async(self, key: str) -> Optional[str]:
+        entry = self.lookup(key)
+        if entry is None:
+            return None
+        delay = self._delay(entry.get("ms", 0))
+        if delay:
+            await asyncio.sleep(delay)
+        return entry["t"]
+
+    def _chunks(self, entry: Dict[str, Any]) -> List[List[Any]]:
+        return entry.get("c") or [[entry.get("ms", 0), entry["t"]]]
+
+    def replay_stream(self, key: str) -> Iterator[str]:
+        entry = self.lookup(key)
+        if entry is None:
+            return
+        elapsed = 0.0
+        for offset_ms, text in self._chunks(entry):
+            delay = self._delay(offset_ms - elapsed)
+            elapsed = offset_ms
+            if delay > 0:
+                time.sleep(delay)
+            yield text
+
+    async def replay_stream_async(self, key: str) -> AsyncIterator[str]:
+        entry = self.lookup(key)
+        if entry is None:
+            return
+        elapsed = 0.0
+        for offset_ms, text in self._chunks(entry):
+            delay = self._delay(offset_ms - elapsed)
+            elapsed = offset_ms
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield text
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "entries": sum(len(v) for v in self._entries.values()),
+                "recorded": self._recorded,
+                "replay_hits": self._hits,
+                "replay_misses": self._misses,
+            }
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Process-wide cassette configured by CASSETTE_MODE, or None when disabled."""
+    global _cassette
+    if Config.CASSETTE_MODE not in (RECORD, REPLAY):
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(
+                Config.CASSETTE_PATH,
+                Config.CASSETTE_MODE,
+                replay_latency=Config.CASSETTE_REPLAY_LATENCY,
+                latency_scale=Config.CASSETTE_LATENCY_SCALE,
+            )
+        return _cassette
@@ -0,0 +1,182 @@
+"""
+Circuit breaker and error classification for the Gemini upstream.
+
+While the breaker is OPEN every call fails fast (GeminiClient returns None
+immediately) so agents fall back to their canned outputs instead of
+blocking the turn on retries. After ``open_seconds`` a few HALF_OPEN probe
+calls decide whether to close it again.
+
+Only upstream trouble (429, 5xx, transport errors) counts towards opening
+the breaker; bad keys, bad requests and local bugs do not.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Any
+
+from project.core.observability import logger
+from project.config import Config
+
+try:
+    import httpx
+    _TRANSPORT_ERRORS = (httpx.TransportError,)
+except ImportError:  # pragma: no cover - httpx ships with google-genai
+    _TRANSPORT_ERRORS = ()
+
+# Error classes returned by classify_error
+RETRYABLE = "retryable"   # 429, 5xx, timeouts, connection errors: upstream trouble
+EMPTY = "empty"           # Gemini answered without text: retry, but upstream is up
+KEY_ERROR = "key_error"   # 401/403: this key is bad, another one may work
+FATAL = "fatal"           # 400/404/other 4xx and unknown/internal errors: retrying will not help
+
+
+class EmptyResponseError(ValueError):
+    """Gemini returned a response with no text."""
+
+
+class StreamInterruptedError(RuntimeError):
+    """A streamed response failed after part of its text had been yielded."""
+
+
+def _status_code(error: Exception):
+    for attr in ("code", "status_code"):
+        code = getattr(error, attr, None)
+        if isinstance(code, int):
+            return code
+    response = getattr(error, "response", None)
+    code = getattr(response, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def classify_error(error: Exception) -> str:
+    """Classify an upstream error as RETRYABLE, EMPTY, KEY_ERROR or FATAL.
+
+    Decided by the SDK error's HTTP code or the transport exception type;
+    anything else is a local error and is not retried.
+    """
+    if isinstance(error, EmptyResponseError):
+        return EMPTY
+    code = _status_code(error)
+    if code is not None:
+        if code == 429 or code == 408 or code >= 500:
+            return RETRYABLE
+        if code in (401, 403):
+            return KEY_ERROR
+        if 400 <= code < 500:
+            return FATAL
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError) + _TRANSPORT_ERRORS):
+        return RETRYABLE
+    return FATAL
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker driven by the error rate over a sliding window."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self,
+                 failure_rate: float = 0.5,
+                 min_calls: int = 10,
+                 window: int = 20,
+                 open_seconds: float = 30.0,
+                 half_open_calls: int = 1):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self._outcomes: Deque[bool] = deque(maxlen=window)  # True = failure
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._lock = threading.Lock()
+        self._opened = threading.Event()  # set while OPEN; wakes blocking retry backoffs
+
+        self._rejected = 0
+        self._times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            return self._state
+
+    def _maybe_half_open(self, now: float):
+        if self._state == self.OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._half_open_in_flight = 0
+            self._opened.clear()
+            logger.log("CircuitBreaker", "Half-open: probing Gemini")
+
+    def allow_request(self) -> bool:
+        """Whether a call may go upstream now."""
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._half_open_in_flight < self.half_open_calls:
+                self._half_open_in_flight += 1
+                return True
+            self._rejected += 1
+            return False
+
+    def wait(self, timeout: float) -> bool:
+        """Block up to ``timeout`` seconds, returning True early if the breaker opens."""
+        return self._opened.wait(timeout)
+
+    def record_success(self):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._state = self.CLOSED
+                self._outcomes.clear()
+                logger.log("CircuitBreaker", "Closed: Gemini recovered")
+            self._outcomes.append(False)
+
+    def record_ignored(self):
+        """A call ended without saying anything about upstream health (bad key, bad request)."""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+
+    def record_failure(self):
+        """Record an upstream failure that indicates Gemini itself is unhealthy."""
+        now = time.monotonic()
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._open(now)
+                return
+            self._outcomes.append(True)
+            failures = sum(self._outcomes)
+            if self._state == self.CLOSED and len(self._outcomes) >= self.min_calls \
+                    and failures / len(self._outcomes) >= self.failure_rate:
+                self._open(now)
+
+    def _open(self, now: float):
+        self._state = self.OPEN
+        self._opened_at = now
+        self._times_opened += 1
+        self._opened.set()
+        logger.log("CircuitBreaker", f"Open: failing fast for {self.open_seconds:.0f}s", level="WARNING")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            return {
+                "state": self._state,
+                "window_failures": sum(self._outcomes),
+                "window_calls": len(self._outcomes),
+                "rejected_calls": self._rejected,
+                "times_opened": self._times_opened,
+            }
+
+
+# Singleton instance guarding the shared Gemini upstream
+circuit_breaker = CircuitBreaker(
+    failure_rate=Config.BREAKER_FAILURE_RATE,
+    min_calls=Config.BREAKER_MIN_CALLS,
+    window=Config.BREAKER_WINDOW,
+    open_seconds=Config.BREAKER_OPEN_SECONDS,
+)
@@ -0,0 +1,112 @@
+"""
+Process-wide pool of google-genai clients, keyed by API key.
+
+Constructing a ``genai.Client`` is not free (auth setup plus a fresh HTTP
+connection pool), and a new client per call means a new TLS handshake per
+call. The pool keeps one client per key for the lifetime of the process so
+every agent reuses the same warm keep-alive connections.
+"""
+import threading
+from typing import Dict, List, Optional, Any
+
+from google import genai
+
+from project.core.observability import logger
+
+
+class ClientPool:
+    """Thread-safe cache of ``genai.Client`` instances, one per API key."""
+
+    def __init__(self):
+        self._clients: Dict[str, genai.Client] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, api_key: str) -> genai.Client:
+        """Return the pooled client for ``api_key``, creating it on first use."""
+        with self._lock:
+            client = self._clients.get(api_key)
+            if client is not None:
+                self._hits += 1
+                return client
+            self._misses += 1
+            client = genai.Client(api_key=api_key)
+            self._clients[api_key] = client
+            return client
+
+    def warm(self, api_keys: List[str], probe: bool = False, model: Optional[str] = None) -> int:
+        """Pre-create clients for every key.
+
+        Args:
+            api_keys: Keys to warm (usually ``Config.GEMINI_API_KEYS()``)
+            probe: If True, issue a cheap metadata request per key so the
+                TLS connection is already open before the first user turn
+            model: Model name used for the probe request
+
+        Returns:
+            Number of clients created by this call.
+        """
+        created = 0
+        for key in api_keys:
+            with self._lock:
+                if key in self._clients:
+                    continue
+                self._clients[key] = genai.Client(api_key=key)
+                created += 1
+
+            if probe and model:
+                try:
+                    self._clients[key].models.get(model=model)
+                except Exception as e:
+                    logger.log("ClientPool", f"Warm-up probe failed: {type(e).__name__}: {e}", level="WARNING")
+
+        logger.log("ClientPool", f"Warmed {created} client(s)", data={"pool_size": len(self._clients)})
+        return created
+
+    def evict(self, api_key: str) -> None:
+        """Drop the client for a key (e.g. after it was removed or revoked)."""
+        with self._lock:
+            client = self._clients.pop(api_key, None)
+        if client is not None:
+            self._close_client(client)
+
+    def retain(self, api_keys: List[str]) -> None:
+        """Evict every pooled client whose key is not in ``api_keys``."""
+        wanted = set(api_keys)
+        with self._lock:
+            stale = [k for k in self._clients if k not in wanted]
+        for key in stale:
+            self.evict(key)
+
+    def close(self) -> None:
+        """Close and forget every pooled client."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            self._close_client(client)
+
+    @staticmethod
+    def _close_client(client: Any) -> None:
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool statistics."""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "connections_open": len(self._clients),
+                "reuse_ratio": round(self._hits / total, 4) if total else 0.0,
+            }
+
+
+# Singleton instance shared by every GeminiClient in the process
+client_pool = ClientPool()
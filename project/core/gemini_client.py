@@ -1,27 +1,70 @@
 import os
 import time
 import json
-from typing import Optional, Dict, Any, List
+import random
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, Dict, Any, List, Iterator, AsyncIterator, Tuple
 
 from google import genai
 from google.genai import types
 
 from project.core.observability import logger
+from project.core.client_pool import client_pool
+from project.core.key_scheduler import key_scheduler, estimate_tokens, key_label
+from project.core.response_cache import ResponseCache, get_response_cache
+from project.core.single_flight import single_flight
+from project.core.hedging import hedge_policy
+from project.core.cassette import get_cassette
+from project.core.circuit_breaker import (
+    circuit_breaker, classify_error, EmptyResponseError, StreamInterruptedError, RETRYABLE, KEY_ERROR, FATAL
+)
+from project.core.metrics import (
+    gemini_calls_total, gemini_call_seconds, gemini_attempts_total, gemini_attempt_seconds, gemini_retries_total,
+    gemini_hedges_fired_total, gemini_hedge_wins_total
+)
 from project.config import Config
 
+# Worker threads for hedged blocking calls (only used when HEDGE_ENABLED is set). Each
+# hedged call holds a slot until both of its requests finish, so the pool never queues.
+_hedge_slots = threading.BoundedSemaphore(max(1, Config.HEDGE_SYNC_CALLS))
+_hedge_executor = ThreadPoolExecutor(max_workers=2 * max(1, Config.HEDGE_SYNC_CALLS),
+                                     thread_name_prefix="gemini-hedge")
+
 
 class GeminiClient:
-    """Robust Gemini client that rotates API keys and uses the new google-genai SDK."""
+    """Robust Gemini client that rotates API keys and uses the new google-genai SDK.
+
+    Every call has a blocking variant (``generate_response``/``generate_json``)
+    and a native asyncio variant (``generate_response_async``/``generate_json_async``)
+    that runs on the SDK's ``client.aio`` surface and never blocks the event loop.
+    """
 
-    def __init__(self, system_instruction: Optional[str] = None):
+    def __init__(self, system_instruction: Optional[str] = None, agent_name: Optional[str] = None):
         self.system_instruction = system_instruction
-        
-        self.max_retries = Config.max_retries()
+        self.agent_name = agent_name or "GeminiClient"
+        self.cache_enabled = Config.cache_enabled_for(agent_name)
 
         self.retry_delay = float(os.getenv("GEMINI_RETRY_DELAY", "1.0"))
 
+    @property
+    def max_retries(self) -> int:
+        # Re-read per call: the key list can be hot-reloaded
+        return Config.max_retries()
+
+    def _estimate_tokens(self, prompt: str) -> int:
+        """Token reservation for the scheduler: prompt + instruction + a typical reply."""
+        return estimate_tokens(prompt) + estimate_tokens(self.system_instruction or "") + 256
+
+    @staticmethod
+    def _usage_tokens(response: Any) -> Optional[int]:
+        usage = getattr(response, "usage_metadata", None)
+        total = getattr(usage, "total_token_count", None) if usage is not None else None
+        return total if isinstance(total, int) else None
+
     def _build_contents(self, prompt: str) -> List[types.Content]:
-        """Build the contents list. 
+        """Build the contents list.
         NOTE: Do NOT add system instruction here. It goes in config.
         """
         return [
@@ -31,77 +74,638 @@ class GeminiClient:
             )
         ]
 
-    def generate_response(self, prompt: str, json_mode: bool = False, stream: bool = False) -> Optional[str]:
-        """Generate a text response from Gemini."""
-        
-        # Validate configuration first
+    def _build_config(self, json_mode: bool) -> types.GenerateContentConfig:
+        """Build the generation config shared by the sync and async paths."""
+        config_args: Dict[str, Any] = {
+            "temperature": getattr(Config, "TEMPERATURE", 0.1),
+            "top_p": float(os.getenv("TOP_P", "0.95")),
+            "max_output_tokens": getattr(Config, "MAX_OUTPUT_TOKENS", 2048),
+        }
+
+        # FIX: Add system_instruction to config, NOT contents
+        if self.system_instruction:
+            config_args["system_instruction"] = self.system_instruction
+
+        if json_mode:
+            config_args["response_mime_type"] = "application/json"
+
+        return types.GenerateContentConfig(**config_args)
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # Full jitter: spreads retries from many turns instead of synchronising them
+        return random.uniform(0, min(self.retry_delay * (2 ** attempt), Config.GEMINI_BACKOFF_CAP))
+
+    def _on_error(self, error: Exception, attempt: int) -> Optional[float]:
+        """Classify and record a failed attempt.
+
+        Returns the delay before the next attempt, or None to stop retrying.
+        Only upstream trouble (RETRYABLE) counts against the circuit breaker.
+        """
+        kind = classify_error(error)
+        if kind == RETRYABLE:
+            circuit_breaker.record_failure()
+        else:
+            circuit_breaker.record_ignored()
+
+        if kind == FATAL or attempt + 1 >= self.max_retries:
+            return None
+        if kind == KEY_ERROR:
+            # Bad key, not a bad upstream: move on to the next key right away
+            return 0.0
+        return self._backoff_delay(attempt)
+
+    def _breaker_allows(self) -> bool:
+        if circuit_breaker.allow_request():
+            return True
+        logger.log("GeminiClient", f"Circuit open, {self.agent_name} failing fast to fallback")
+        return False
+
+    def _config_ok(self) -> bool:
         try:
             Config.validate()
+            return True
         except Exception as e:
             logger.log("GeminiClient", f"Config validation failed: {e}")
+            return False
+
+    def _record_attempt(self, api_key: str, started: float, error: Optional[Exception] = None):
+        outcome = "ok" if error is None else classify_error(error)
+        gemini_attempts_total.inc(agent=self.agent_name, key=key_label(api_key), outcome=outcome)
+        gemini_attempt_seconds.observe(time.monotonic() - started, agent=self.agent_name, outcome=outcome)
+
+    def _record_abort(self, api_key: str, estimated: int, usage: Optional[int],
+                      attempt_start: float, start: float, attempts: int):
+        """Settle a stream the caller closed early; it says nothing about upstream health."""
+        key_scheduler.report_success(api_key, estimated, usage)
+        circuit_breaker.record_ignored()
+        gemini_attempts_total.inc(agent=self.agent_name, key=key_label(api_key), outcome="aborted")
+        gemini_attempt_seconds.observe(time.monotonic() - attempt_start, agent=self.agent_name, outcome="aborted")
+        self._record_call("aborted", start, attempts)
+
+    def _record_call(self, outcome: str, started: float, attempts: int = 1):
+        gemini_calls_total.inc(agent=self.agent_name, outcome=outcome)
+        gemini_call_seconds.observe(time.monotonic() - started, agent=self.agent_name)
+        if attempts > 1:
+            gemini_retries_total.inc(attempts - 1, agent=self.agent_name)
+
+    def _attempt(self, api_key: str, prompt: str, json_mode: bool, stream: bool) -> Tuple[str, Optional[int]]:
+        """One blocking upstream call; returns (text, total tokens used if reported)."""
+        client = client_pool.get(api_key)
+        contents = self._build_contents(prompt)
+        generate_config = self._build_config(json_mode)
+
+        usage = None
+        if stream:
+            result_parts: List[str] = []
+            for chunk in client.models.generate_content_stream(
+                model=Config.MODEL_NAME,
+                contents=contents,
+                config=generate_config,
+            ):
+                if getattr(chunk, "text", None):
+                    result_parts.append(chunk.text)
+                usage = self._usage_tokens(chunk) or usage
+            full_text = "".join(result_parts).strip()
+        else:
+            response = client.models.generate_content(
+                model=Config.MODEL_NAME,
+                contents=contents,
+                config=generate_config,
+            )
+            full_text = getattr(response, "text", None) or ""
+            usage = self._usage_tokens(response)
+
+        if not full_text:
+            raise EmptyResponseError("Empty response from Gemini")
+
+        return full_text.strip(), usage
+
+    async def _attempt_async(self, api_key: str, prompt: str, json_mode: bool, stream: bool) -> Tuple[str, Optional[int]]:
+        """One upstream call on ``client.aio``; returns (text, total tokens used if reported)."""
+        client = client_pool.get(api_key)
+        contents = self._build_contents(prompt)
+        generate_config = self._build_config(json_mode)
+
+        usage = None
+        if stream:
+            result_parts: List[str] = []
+            async for chunk in await client.aio.models.generate_content_stream(
+                model=Config.MODEL_NAME,
+                contents=contents,
+                config=generate_config,
+            ):
+                if getattr(chunk, "text", None):
+                    result_parts.append(chunk.text)
+                usage = self._usage_tokens(chunk) or usage
+            full_text = "".join(result_parts).strip()
+        else:
+            response = await client.aio.models.generate_content(
+                model=Config.MODEL_NAME,
+                contents=contents,
+                config=generate_config,
+            )
+            full_text = getattr(response, "text", None) or ""
+            usage = self._usage_tokens(response)
+
+        if not full_text:
+            raise EmptyResponseError("Empty response from Gemini")
+
+        return full_text.strip(), usage
+
+    def _call_key(self, api_key: str, prompt: str, json_mode: bool, stream: bool, estimated: int) -> str:
+        """One attempt on ``api_key`` with the outcome reported to the key scheduler."""
+        started = time.monotonic()
+        try:
+            text, usage = self._attempt(api_key, prompt, json_mode, stream)
+        except Exception as e:
+            key_scheduler.report_failure(api_key, e)
+            self._record_attempt(api_key, started, e)
+            raise
+        key_scheduler.report_success(api_key, estimated, usage)
+        self._record_attempt(api_key, started)
+        return text
+
+    async def _call_key_async(self, api_key: str, prompt: str, json_mode: bool, stream: bool, estimated: int) -> str:
+        """Async variant of ``_call_key``; a cancelled attempt is not reported as a failure."""
+        started = time.monotonic()
+        try:
+            text, usage = await self._attempt_async(api_key, prompt, json_mode, stream)
+        except Exception as e:
+            key_scheduler.report_failure(api_key, e)
+            self._record_attempt(api_key, started, e)
+            raise
+        key_scheduler.report_success(api_key, estimated, usage)
+        self._record_attempt(api_key, started)
+        return text
+
+    def _hedge_threshold(self) -> Optional[float]:
+        if not Config.HEDGE_ENABLED or len(Config.GEMINI_API_KEYS()) < 2:
             return None
+        return hedge_policy.threshold(self.agent_name)
+
+    def _hedge_key(self, api_key: str, estimated: int, call_id: int) -> Optional[str]:
+        """A different key to hedge on, or None if the hedge-rate cap is reached or there is none.
+
+        A hedge that is not sent gives back the rate-cap slot and key budget it reserved.
+        """
+        if not hedge_policy.try_fire(call_id):
+            return None
+        try:
+            hedge_key = key_scheduler.acquire(estimated, exclude=[api_key])
+        except ValueError:
+            hedge_key = None  # the key list was emptied by a reload
+        if hedge_key is None or hedge_key == api_key:
+            # No other key: acquire fell back to the primary's own key (or found none)
+            if hedge_key is not None:
+                key_scheduler.release(hedge_key, estimated)
+            hedge_policy.cancel(call_id)
+            return None
+        gemini_hedges_fired_total.inc(agent=self.agent_name)
+        logger.log("GeminiClient", f"{self.agent_name} call is slow, hedging on another key")
+        return hedge_key
+
+    def _call_hedged(self, api_key: str, prompt: str, json_mode: bool, stream: bool, estimated: int) -> str:
+        """Run an attempt, firing a duplicate on another key if it is slower than the agent's p90.
 
+        A blocking call cannot be cancelled, so the losing request finishes in
+        its worker thread and its result is discarded. When every hedging slot
+        is taken the call runs unhedged on the caller's thread instead of
+        queueing for the pool.
+        """
+        start = time.monotonic()
+        threshold = self._hedge_threshold()
+        if threshold is None or not _hedge_slots.acquire(blocking=False):
+            text = self._call_key(api_key, prompt, json_mode, stream, estimated)
+            hedge_policy.record_latency(self.agent_name, time.monotonic() - start)
+            return text
+
+        futures = []
+        try:
+            call_id = hedge_policy.record_call()
+            primary = _hedge_executor.submit(self._call_key, api_key, prompt, json_mode, stream, estimated)
+            futures.append(primary)
+            done, _ = wait(futures, timeout=threshold)
+            if not done:
+                hedge_key = self._hedge_key(api_key, estimated, call_id)
+                if hedge_key:
+                    futures.append(_hedge_executor.submit(self._call_key, hedge_key, prompt, json_mode, stream, estimated))
+
+            pending = set(futures)
+            while True:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                succeeded = [f for f in done if f.exception() is None]
+                if succeeded or not pending:
+                    winner = primary if primary in (succeeded or done) else (succeeded or list(done))[0]
+                    break
+        finally:
+            # Free the slot once the losing request (if any) has finished too
+            running = [f for f in futures if not f.done()]
+            if running:
+                running[0].add_done_callback(lambda _f: _hedge_slots.release())
+            else:
+                _hedge_slots.release()
+
+        if winner is not primary:
+            hedge_policy.record_win()
+            gemini_hedge_wins_total.inc(agent=self.agent_name)
+        text = winner.result()
+        hedge_policy.record_latency(self.agent_name, time.monotonic() - start)
+        return text
+
+    async def _call_hedged_async(self, api_key: str, prompt: str, json_mode: bool, stream: bool, estimated: int) -> str:
+        """Async variant of ``_call_hedged``; the losing request is cancelled."""
+        start = time.monotonic()
+        threshold = self._hedge_threshold()
+        if threshold is None:
+            text = await self._call_key_async(api_key, prompt, json_mode, stream, estimated)
+            hedge_policy.record_latency(self.agent_name, time.monotonic() - start)
+            return text
+
+        call_id = hedge_policy.record_call()
+        primary = asyncio.ensure_future(self._call_key_async(api_key, prompt, json_mode, stream, estimated))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=threshold)
+            if not done:
+                hedge_key = self._hedge_key(api_key, estimated, call_id)
+                if hedge_key:
+                    tasks.append(asyncio.ensure_future(
+                        self._call_key_async(hedge_key, prompt, json_mode, stream, estimated)
+                    ))
+
+            pending = set(tasks)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                succeeded = [t for t in done if t.exception() is None]
+                if succeeded or not pending:
+                    winner = primary if primary in (succeeded or done) else (succeeded or list(done))[0]
+                    break
+
+            if winner is not primary:
+                hedge_policy.record_win()
+                gemini_hedge_wins_total.inc(agent=self.agent_name)
+            text = winner.result()
+            hedge_policy.record_latency(self.agent_name, time.monotonic() - start)
+            return text
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _cache_key(self, prompt: str, json_mode: bool) -> str:
+        generation_config = {
+            "temperature": getattr(Config, "TEMPERATURE", 0.1),
+            "top_p": float(os.getenv("TOP_P", "0.95")),
+            "max_output_tokens": getattr(Config, "MAX_OUTPUT_TOKENS", 2048),
+            "json_mode": json_mode,
+        }
+        return ResponseCache.make_key(Config.MODEL_NAME, self.system_instruction, prompt, generation_config)
+
+    def _cassette_key(self, prompt: str, json_mode: bool, chunked: bool = False) -> str:
+        return self._cache_key(prompt, json_mode) + (":stream" if chunked else "")
+
+    def _replay_miss(self):
+        logger.log("GeminiClient", f"Cassette miss for {self.agent_name} request", level="WARNING")
+
+    def _is_cacheable(self, text: Optional[str], json_mode: bool) -> bool:
+        if not text:
+            return False
+        if not json_mode:
+            return True
+        try:
+            json.loads(text.replace("```json", "").replace("```", "").strip())
+            return True
+        except json.JSONDecodeError:
+            return False
+
+    def generate_response(self, prompt: str, json_mode: bool = False, stream: bool = False) -> Optional[str]:
+        """Generate a text response from Gemini.
+
+        Non-streamed calls consult the response cache (if enabled for this
+        agent) and are coalesced with identical in-flight calls.
+        """
+        if stream:
+            return self._generate_with_retries(prompt, json_mode, stream)
+
+        key = self._cache_key(prompt, json_mode)
+        if self.cache_enabled:
+            cached = get_response_cache().get(key)
+            if cached is not None:
+                logger.log("GeminiClient", f"{self.agent_name} response served from cache")
+                return cached
+
+        if Config.SINGLE_FLIGHT:
+            return single_flight.do(key, lambda: self._fetch(key, prompt, json_mode))
+        return self._fetch(key, prompt, json_mode)
+
+    async def generate_response_async(self, prompt: str, json_mode: bool = False, stream: bool = False) -> Optional[str]:
+        """Async variant of ``generate_response``."""
+        if stream:
+            return await self._generate_with_retries_async(prompt, json_mode, stream)
+
+        key = self._cache_key(prompt, json_mode)
+        if self.cache_enabled:
+            cached = await get_response_cache().get_async(key)
+            if cached is not None:
+                logger.log("GeminiClient", f"{self.agent_name} response served from cache")
+                return cached
+
+        if Config.SINGLE_FLIGHT:
+            return await single_flight.do_async(key, lambda: self._fetch_async(key, prompt, json_mode))
+        return await self._fetch_async(key, prompt, json_mode)
+
+    def _fetch(self, key: str, prompt: str, json_mode: bool) -> Optional[str]:
+        """Upstream call on a cache miss; stores the result if caching is enabled."""
+        start = time.monotonic()
+        text = self._generate_with_retries(prompt, json_mode, False)
+        if self.cache_enabled and self._is_cacheable(text, json_mode):
+            get_response_cache().put(key, text, time.monotonic() - start)
+        return text
+
+    async def _fetch_async(self, key: str, prompt: str, json_mode: bool) -> Optional[str]:
+        """Async variant of ``_fetch``."""
+        start = time.monotonic()
+        text = await self._generate_with_retries_async(prompt, json_mode, False)
+        if self.cache_enabled and self._is_cacheable(text, json_mode):
+            await get_response_cache().put_async(key, text, time.monotonic() - start)
+        return text
+
+    def _generate_with_retries(self, prompt: str, json_mode: bool, stream: bool) -> Optional[str]:
+        """Call Gemini, rotating keys and backing off between failed attempts."""
+        cassette = get_cassette()
+        if cassette and cassette.replaying:
+            replay_start = time.monotonic()
+            text = cassette.replay(self._cassette_key(prompt, json_mode))
+            if text is None:
+                self._replay_miss()
+            self._record_call("replay" if text is not None else "replay_miss", replay_start)
+            return text
+
+        # Validate configuration first
+        if not self._config_ok():
+            return None
+
+        start = time.monotonic()
+        estimated = self._estimate_tokens(prompt)
+        attempts = 0
         for attempt in range(self.max_retries):
+            attempts = attempt + 1
+            if not self._breaker_allows():
+                self._record_call("breaker_open", start, attempt)
+                return None
             try:
-                # pick a key and create a client
-                api_key = Config.rotate_gemini_key()
+                # pick the healthiest key and reuse its pooled client
+                api_key = key_scheduler.acquire(estimated)
                 logger.log("GeminiClient", f"Using configured API key (attempt {attempt + 1}/{self.max_retries})")
 
-                client = genai.Client(api_key=api_key)
-
-                # 1. Prepare Content (User prompt only)
-                contents = self._build_contents(prompt)
-
-                # 2. Prepare Config
-                config_args: Dict[str, Any] = {
-                    "temperature": getattr(Config, "TEMPERATURE", 0.1),
-                    "top_p": float(os.getenv("TOP_P", "0.95")),
-                    "max_output_tokens": getattr(Config, "MAX_OUTPUT_TOKENS", 2048),
-                }
-
-                # FIX: Add system_instruction to config, NOT contents
-                if self.system_instruction:
-                    config_args["system_instruction"] = self.system_instruction
-
-                if json_mode:
-                    config_args["response_mime_type"] = "application/json"
-
-                generate_config = types.GenerateContentConfig(**config_args)
-
-                # 3. Generate
-                if stream:
-                    result_parts: List[str] = []
-                    for chunk in client.models.generate_content_stream(
-                        model=Config.MODEL_NAME,
-                        contents=contents,
-                        config=generate_config,
-                    ):
-                        if getattr(chunk, "text", None):
-                            result_parts.append(chunk.text)
-                    full_text = "".join(result_parts).strip()
-                else:
-                    response = client.models.generate_content(
-                        model=Config.MODEL_NAME,
-                        contents=contents,
-                        config=generate_config,
-                    )
-                    full_text = getattr(response, "text", None) or ""
-
-                if not full_text:
-                    raise ValueError("Empty response from Gemini")
-
-                return full_text.strip()
+                attempt_start = time.monotonic()
+                text = self._call_hedged(api_key, prompt, json_mode, stream, estimated)
+                circuit_breaker.record_success()
+                if cassette:
+                    cassette.record(self._cassette_key(prompt, json_mode), text, time.monotonic() - attempt_start)
+                self._record_call("ok", start, attempt + 1)
+                return text
 
             except Exception as e:
                 logger.log("GeminiClient", f"API error (attempt {attempt + 1}): {type(e).__name__}: {e}")
-                time.sleep(min(self.retry_delay * (2 ** attempt), 10))
+                delay = self._on_error(e, attempt)
+                if delay is None:
+                    break
+                # Backoff on the caller's thread, cut short if the breaker opens meanwhile
+                circuit_breaker.wait(delay)
 
         logger.log("GeminiClient", "All retries failed.")
+        self._record_call("failed", start, attempts)
         return None
 
-    def generate_json(self, prompt: str) -> Optional[Dict[str, Any]]:
-        """Request a JSON response and parse it into a Python dict."""
-        response_text = self.generate_response(prompt, json_mode=True, stream=False)
+    async def _generate_with_retries_async(self, prompt: str, json_mode: bool, stream: bool) -> Optional[str]:
+        """Async variant of ``_generate_with_retries`` using ``client.aio``."""
+        cassette = get_cassette()
+        if cassette and cassette.replaying:
+            replay_start = time.monotonic()
+            text = await cassette.replay_async(self._cassette_key(prompt, json_mode))
+            if text is None:
+                self._replay_miss()
+            self._record_call("replay" if text is not None else "replay_miss", replay_start)
+            return text
+
+        if not self._config_ok():
+            return None
+
+        start = time.monotonic()
+        estimated = self._estimate_tokens(prompt)
+        attempts = 0
+        for attempt in range(self.max_retries):
+            attempts = attempt + 1
+            if not self._breaker_allows():
+                self._record_call("breaker_open", start, attempt)
+                return None
+            try:
+                api_key = key_scheduler.acquire(estimated)
+                logger.log("GeminiClient", f"Using configured API key (async attempt {attempt + 1}/{self.max_retries})")
+
+                attempt_start = time.monotonic()
+                text = await self._call_hedged_async(api_key, prompt, json_mode, stream, estimated)
+                circuit_breaker.record_success()
+                if cassette:
+                    cassette.record(self._cassette_key(prompt, json_mode), text, time.monotonic() - attempt_start)
+                self._record_call("ok", start, attempt + 1)
+                return text
+
+            except asyncio.CancelledError:
+                circuit_breaker.record_ignored()
+                raise
+            except Exception as e:
+                logger.log("GeminiClient", f"API error (async attempt {attempt + 1}): {type(e).__name__}: {e}")
+                delay = self._on_error(e, attempt)
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+
+        logger.log("GeminiClient", "All retries failed.")
+        self._record_call("failed", start, attempts)
+        return None
+
+    def stream_response(self, prompt: str) -> Iterator[str]:
+        """Yield text chunks as Gemini produces them.
+
+        A failed attempt is retried on another key only if nothing has been
+        yielded yet; once text reached the caller, an error raises
+        ``StreamInterruptedError`` so a truncated response is never taken for
+        a complete one. Closing the generator early cancels the upstream response.
+        """
+        cassette = get_cassette()
+        key = self._cassette_key(prompt, False, chunked=True)
+        if cassette and cassette.replaying:
+            replay_start = time.monotonic()
+            emitted = False
+            for text in cassette.replay_stream(key):
+                emitted = True
+                yield text
+            if not emitted:
+                self._replay_miss()
+            self._record_call("replay" if emitted else "replay_miss", replay_start)
+            return
+
+        if not self._config_ok():
+            return
+
+        start = time.monotonic()
+        estimated = self._estimate_tokens(prompt)
+        attempts = 0
+        for attempt in range(self.max_retries):
+            attempts = attempt + 1
+            if not self._breaker_allows():
+                self._record_call("breaker_open", start, attempt)
+                return
+            api_key = None
+            attempt_start = time.monotonic()
+            emitted = False
+            usage = None
+            chunks: List[List[Any]] = []
+            try:
+                api_key = key_scheduler.acquire(estimated)
+                logger.log("GeminiClient", f"Streaming with configured API key (attempt {attempt + 1}/{self.max_retries})")
+
+                client = client_pool.get(api_key)
+                stream = client.models.generate_content_stream(
+                    model=Config.MODEL_NAME,
+                    contents=self._build_contents(prompt),
+                    config=self._build_config(json_mode=False),
+                )
+                try:
+                    for chunk in stream:
+                        usage = self._usage_tokens(chunk) or usage
+                        text = getattr(chunk, "text", None)
+                        if text:
+                            emitted = True
+                            if cassette:
+                                chunks.append([round((time.monotonic() - attempt_start) * 1000, 1), text])
+                            yield text
+                except GeneratorExit:
+                    # The caller stopped reading: drop the upstream response now
+                    close = getattr(stream, "close", None)
+                    if close:
+                        close()
+                    self._record_abort(api_key, estimated, usage, attempt_start, start, attempts)
+                    raise
+
+                if not emitted:
+                    raise EmptyResponseError("Empty response from Gemini")
+                key_scheduler.report_success(api_key, estimated, usage)
+                circuit_breaker.record_success()
+                if cassette:
+                    cassette.record(key, "".join(c[1] for c in chunks), time.monotonic() - attempt_start, chunks)
+                self._record_attempt(api_key, attempt_start)
+                self._record_call("ok", start, attempts)
+                return
+
+            except Exception as e:
+                logger.log("GeminiClient", f"Stream error (attempt {attempt + 1}): {type(e).__name__}: {e}")
+                if api_key:
+                    key_scheduler.report_failure(api_key, e)
+                    self._record_attempt(api_key, attempt_start, e)
+                delay = self._on_error(e, attempt)
+                if emitted:
+                    self._record_call("failed", start, attempts)
+                    raise StreamInterruptedError(f"Stream failed mid-response: {type(e).__name__}: {e}") from e
+                if delay is None:
+                    self._record_call("failed", start, attempts)
+                    return
+                # Backoff on the caller's thread, cut short if the breaker opens meanwhile
+                circuit_breaker.wait(delay)
+
+        logger.log("GeminiClient", "All retries failed.")
+        self._record_call("failed", start, attempts)
+
+    async def stream_response_async(self, prompt: str) -> AsyncIterator[str]:
+        """Async variant of ``stream_response``."""
+        cassette = get_cassette()
+        key = self._cassette_key(prompt, False, chunked=True)
+        if cassette and cassette.replaying:
+            replay_start = time.monotonic()
+            emitted = False
+            async for text in cassette.replay_stream_async(key):
+                emitted = True
+                yield text
+            if not emitted:
+                self._replay_miss()
+            self._record_call("replay" if emitted else "replay_miss", replay_start)
+            return
+
+        if not self._config_ok():
+            return
+
+        start = time.monotonic()
+        estimated = self._estimate_tokens(prompt)
+        attempts = 0
+        for attempt in range(self.max_retries):
+            attempts = attempt + 1
+            if not self._breaker_allows():
+                self._record_call("breaker_open", start, attempt)
+                return
+            api_key = None
+            attempt_start = time.monotonic()
+            emitted = False
+            usage = None
+            chunks: List[List[Any]] = []
+            try:
+                api_key = key_scheduler.acquire(estimated)
+                logger.log("GeminiClient", f"Streaming with configured API key (async attempt {attempt + 1}/{self.max_retries})")
+
+                client = client_pool.get(api_key)
+                stream = await client.aio.models.generate_content_stream(
+                    model=Config.MODEL_NAME,
+                    contents=self._build_contents(prompt),
+                    config=self._build_config(json_mode=False),
+                )
+                try:
+                    async for chunk in stream:
+                        usage = self._usage_tokens(chunk) or usage
+                        text = getattr(chunk, "text", None)
+                        if text:
+                            emitted = True
+                            if cassette:
+                                chunks.append([round((time.monotonic() - attempt_start) * 1000, 1), text])
+                            yield text
+                except GeneratorExit:
+                    aclose = getattr(stream, "aclose", None)
+                    if aclose:
+                        await aclose()
+                    self._record_abort(api_key, estimated, usage, attempt_start, start, attempts)
+                    raise
+
+                if not emitted:
+                    raise EmptyResponseError("Empty response from Gemini")
+                key_scheduler.report_success(api_key, estimated, usage)
+                circuit_breaker.record_success()
+                if cassette:
+                    cassette.record(key, "".join(c[1] for c in chunks), time.monotonic() - attempt_start, chunks)
+                self._record_attempt(api_key, attempt_start)
+                self._record_call("ok", start, attempts)
+                return
+
+            except asyncio.CancelledError:
+                circuit_breaker.record_ignored()
+                raise
+            except Exception as e:
+                logger.log("GeminiClient", f"Stream error (async attempt {attempt + 1}): {type(e).__name__}: {e}")
+                if api_key:
+                    key_scheduler.report_failure(api_key, e)
+                    self._record_attempt(api_key, attempt_start, e)
+                delay = self._on_error(e, attempt)
+                if emitted:
+                    self._record_call("failed", start, attempts)
+                    raise StreamInterruptedError(f"Stream failed mid-response: {type(e).__name__}: {e}") from e
+                if delay is None:
+                    self._record_call("failed", start, attempts)
+                    return
+                await asyncio.sleep(delay)
+
+        logger.log("GeminiClient", "All retries failed.")
+        self._record_call("failed", start, attempts)
+
+    def _parse_json(self, response_text: Optional[str]) -> Optional[Dict[str, Any]]:
         if not response_text:
             return None
 
@@ -111,4 +715,12 @@ class GeminiClient:
             return json.loads(cleaned)
         except json.JSONDecodeError as e:
             logger.log("GeminiClient", f"JSON parsing error: {e}. Response was: {cleaned}")
-            return None
\ No newline at end of file
+            return None
+
+    def generate_json(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """Request a JSON response and parse it into a Python dict."""
+        return self._parse_json(self.generate_response(prompt, json_mode=True, stream=False))
+
+    async def generate_json_async(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """Async variant of ``generate_json``."""
+        return self._parse_json(await self.generate_response_async(prompt, json_mode=True, stream=False))
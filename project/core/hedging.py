@@ -0,0 +1,116 @@
+"""
+Hedged requests for Gemini tail latency.
+
+If a call has not returned within an adaptive threshold (a running
+percentile of that agent's recent latencies), a duplicate is fired on a
+different API key and whichever finishes first wins. The fraction of calls
+that may be hedged is capped over a sliding window so quota use stays
+bounded.
+"""
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional, Any
+
+from project.config import Config
+
+
+class HedgePolicy:
+    """Adaptive hedge thresholds per agent plus a sliding-window hedge-rate cap."""
+
+    def __init__(self,
+                 percentile: float = 0.9,
+                 min_samples: int = 20,
+                 min_delay: float = 0.3,
+                 max_rate: float = 0.1,
+                 window: int = 200):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_rate = max_rate
+
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._window: Deque[bool] = deque(maxlen=window)
+        self._window_hedged = 0
+        self._lock = threading.Lock()
+
+        self._calls = 0
+        self._hedges_fired = 0
+        self._hedge_wins = 0
+
+    def threshold(self, agent: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None until enough samples exist."""
+        with self._lock:
+            samples = self._latencies.get(agent)
+            if not samples or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(self.percentile * len(ordered)))
+        return max(self.min_delay, ordered[index])
+
+    def record_latency(self, agent: str, latency: float):
+        with self._lock:
+            samples = self._latencies.get(agent)
+            if samples is None:
+                samples = self._latencies[agent] = deque(maxlen=500)
+            samples.append(latency)
+
+    def _push_window(self, hedged: bool):
+        if len(self._window) == self._window.maxlen and self._window[0]:
+            self._window_hedged -= 1
+        self._window.append(hedged)
+        if hedged:
+            self._window_hedged += 1
+
+    def record_call(self) -> int:
+        """Count a hedge-eligible call (hedged or not) in the rate window; returns its id for ``try_fire``."""
+        with self._lock:
+            self._calls += 1
+            self._push_window(False)
+            return self._calls
+
+    def try_fire(self, call_id: int) -> bool:
+        """Reserve a hedge for call ``call_id`` if the windowed hedge rate is under the cap."""
+        with self._lock:
+            if not self._window or (self._window_hedged + 1) / len(self._window) > self.max_rate:
+                return False
+            # Re-label that call's slot; other calls may have been recorded since.
+            # A call that already left the window is not counted in it.
+            index = len(self._window) - 1 - (self._calls - call_id)
+            if index >= 0 and not self._window[index]:
+                self._window[index] = True
+                self._window_hedged += 1
+            self._hedges_fired += 1
+            return True
+
+    def cancel(self, call_id: int):
+        """Give back a hedge reserved by ``try_fire`` that was never sent."""
+        with self._lock:
+            index = len(self._window) - 1 - (self._calls - call_id)
+            if index >= 0 and self._window[index]:
+                self._window[index] = False
+                self._window_hedged -= 1
+            self._hedges_fired -= 1
+
+    def record_win(self):
+        """The hedge finished before the original request."""
+        with self._lock:
+            self._hedge_wins += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "hedges_fired": self._hedges_fired,
+                "hedge_wins": self._hedge_wins,
+                "fire_rate": round(self._hedges_fired / self._calls, 4) if self._calls else 0.0,
+                "win_rate": round(self._hedge_wins / self._hedges_fired, 4) if self._hedges_fired else 0.0,
+            }
+
+
+# Singleton instance shared by every GeminiClient in the process
+hedge_policy = HedgePolicy(
+    percentile=Config.HEDGE_PERCENTILE,
+    min_samples=Config.HEDGE_MIN_SAMPLES,
+    min_delay=Config.HEDGE_MIN_DELAY,
+    max_rate=Config.HEDGE_MAX_RATE,
+)
@@ -0,0 +1,259 @@
+"""
+Rate-limit-aware scheduling of Gemini API keys.
+
+Each key gets two token buckets (requests per minute and tokens per minute)
+plus an exponential cooldown that starts when the key returns 429 / quota
+errors. ``acquire`` hands out the healthy key with the most headroom, so a
+key that was just throttled is not picked again until it has recovered.
+"""
+import os
+import time
+import threading
+from typing import Dict, List, Optional, Any
+
+from project.core.observability import logger
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for 429 / RESOURCE_EXHAUSTED errors, judged by the SDK error's code and status."""
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    return getattr(error, "status", None) == "RESOURCE_EXHAUSTED"
+
+
+def key_label(key: str) -> str:
+    """Non-secret identifier for an API key (its last four characters)."""
+    return f"...{key[-4:]}" if len(key) > 4 else "...."
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``capacity`` per minute."""
+
+    def __init__(self, capacity: float):
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.refill_per_sec = self.capacity / 60.0
+        self._last = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self._last
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_sec)
+            self._last = now
+
+    def headroom(self, now: float) -> float:
+        """Fraction of the bucket currently available (can go below 0 when overdrawn)."""
+        self._refill(now)
+        return self.tokens / self.capacity if self.capacity else 0.0
+
+    def consume(self, amount: float, now: float):
+        # Allowed to go negative: the real usage is only known after the call
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class KeyState:
+    """Budget, cooldown and usage counters for a single API key."""
+
+    def __init__(self, key: str, rpm: int, tpm: int):
+        self.key = key
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.cooldown_until = 0.0
+        self.consecutive_rate_limits = 0
+        self.total_requests = 0
+        self.total_successes = 0
+        self.total_failures = 0
+        self.total_rate_limited = 0
+        self.total_tokens = 0
+        self.last_error: Optional[str] = None
+
+    def headroom(self, now: float) -> float:
+        return min(self.requests.headroom(now), self.tokens.headroom(now))
+
+    def is_cooling(self, now: float) -> bool:
+        return now < self.cooldown_until
+
+    @property
+    def label(self) -> str:
+        """Non-secret identifier for logs and stats."""
+        return key_label(self.key)
+
+
+class KeyScheduler:
+    """Picks the API key with the most remaining budget and tracks per-key health.
+
+    Every ``reload_interval`` seconds the ``.env`` file is checked and the
+    key list re-read if it changed, so keys can be added or revoked without
+    restarting the process.
+    """
+
+    def __init__(self,
+                 rpm: Optional[int] = None,
+                 tpm: Optional[int] = None,
+                 cooldown_base: Optional[float] = None,
+                 cooldown_max: Optional[float] = None,
+                 reload_interval: Optional[float] = None):
+        self.rpm = rpm or int(os.getenv("GEMINI_KEY_RPM", "15"))
+        self.tpm = tpm or int(os.getenv("GEMINI_KEY_TPM", "1000000"))
+        self.cooldown_base = cooldown_base or float(os.getenv("GEMINI_KEY_COOLDOWN_BASE", "2.0"))
+        self.cooldown_max = cooldown_max or float(os.getenv("GEMINI_KEY_COOLDOWN_MAX", "120.0"))
+        self.reload_interval = reload_interval or float(os.getenv("GEMINI_KEYS_RELOAD_INTERVAL", "30"))
+
+        self._states: Dict[str, KeyState] = {}
+        self._lock = threading.Lock()
+        self._last_reload = 0.0
+        self._env_mtime: Optional[float] = None
+
+    # ---- key list management ----
+
+    def _sync_keys(self, keys: List[str]):
+        """Add/remove key states to match ``keys`` (caller holds the lock)."""
+        for key in keys:
+            if key not in self._states:
+                self._states[key] = KeyState(key, self.rpm, self.tpm)
+        for key in [k for k in self._states if k not in keys]:
+            del self._states[key]
+
+    def reload(self) -> List[str]:
+        """Re-read the key list from ``.env`` / the environment."""
+        from project.config import Config
+        from project.core.client_pool import client_pool
+
+        keys = Config.reload_keys()
+        with self._lock:
+            before = set(self._states)
+            self._sync_keys(keys)
+            self._last_reload = time.monotonic()
+            self._env_mtime = Config.env_file_mtime()
+        client_pool.retain(keys)
+
+        if set(keys) != before:
+            logger.log("KeyScheduler", f"Key list reloaded: {len(keys)} key(s)")
+        return keys
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if self._states and now - self._last_reload < self.reload_interval:
+            return
+        from project.config import Config
+
+        if not self._states or Config.env_file_mtime() != self._env_mtime:
+            self.reload()
+        else:
+            self._last_reload = now
+
+    # ---- scheduling ----
+
+    def acquire(self, estimated_tokens: int = 0, exclude: Optional[List[str]] = None) -> str:
+        """Reserve budget on the best key and return it.
+
+        Prefers keys that are not cooling down, then the one with the most
+        headroom. When every key is cooling, the one that recovers first is
+        returned rather than blocking the caller.
+
+        Raises ValueError if there are no keys configured.
+        """
+        self._maybe_reload()
+        now = time.monotonic()
+        with self._lock:
+            candidates = [s for s in self._states.values() if not exclude or s.key not in exclude]
+            if not candidates:
+                candidates = list(self._states.values())
+            if not candidates:
+                raise ValueError("No API keys available for rotation")
+
+            healthy = [s for s in candidates if not s.is_cooling(now)]
+            if healthy:
+                state = max(healthy, key=lambda s: s.headroom(now))
+            else:
+                state = min(candidates, key=lambda s: s.cooldown_until)
+
+            state.requests.consume(1, now)
+            state.tokens.consume(estimated_tokens, now)
+            state.total_requests += 1
+            return state.key
+
+    def release(self, key: str, estimated_tokens: int = 0):
+        """Return the budget ``acquire`` reserved on ``key`` for a request that was never sent."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return
+            state.requests.consume(-1, now)
+            state.tokens.consume(-estimated_tokens, now)
+            state.total_requests -= 1
+
+    def report_success(self, key: str, estimated_tokens: int = 0, actual_tokens: Optional[int] = None):
+        """Record a successful call, correcting the token reservation if usage is known."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return
+            state.total_successes += 1
+            state.consecutive_rate_limits = 0
+            used = actual_tokens if actual_tokens is not None else estimated_tokens
+            state.total_tokens += used
+            if actual_tokens is not None:
+                state.tokens.consume(actual_tokens - estimated_tokens, now)
+
+    def report_failure(self, key: str, error: Exception):
+        """Record a failed call; rate-limit errors put the key into exponential cooldown."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return
+            state.total_failures += 1
+            state.last_error = f"{type(error).__name__}: {error}"[:200]
+            if not is_rate_limit_error(error):
+                return
+            state.total_rate_limited += 1
+            cooldown = min(self.cooldown_base * (2 ** state.consecutive_rate_limits), self.cooldown_max)
+            state.consecutive_rate_limits += 1
+            state.cooldown_until = now + cooldown
+            # An exhausted quota means the bucket estimate was optimistic
+            state.requests.tokens = min(state.requests.tokens, 0.0)
+            label = state.label
+
+        logger.log("KeyScheduler", f"Key {label} rate limited, cooling down for {cooldown:.1f}s", level="WARNING")
+
+    # ---- reporting ----
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-key health and utilization counters (keys are masked)."""
+        now = time.monotonic()
+        with self._lock:
+            keys = []
+            for state in self._states.values():
+                keys.append({
+                    "key": state.label,
+                    "healthy": not state.is_cooling(now),
+                    "cooldown_remaining_s": round(max(0.0, state.cooldown_until - now), 2),
+                    "rpm_utilization": round(1.0 - state.requests.headroom(now), 4),
+                    "tpm_utilization": round(1.0 - state.tokens.headroom(now), 4),
+                    "requests": state.total_requests,
+                    "successes": state.total_successes,
+                    "failures": state.total_failures,
+                    "rate_limited": state.total_rate_limited,
+                    "tokens": state.total_tokens,
+                    "last_error": state.last_error,
+                })
+            return {
+                "total_keys": len(keys),
+                "healthy_keys": sum(1 for k in keys if k["healthy"]),
+                "rpm_limit": self.rpm,
+                "tpm_limit": self.tpm,
+                "keys": keys,
+            }
+
+
+# Singleton instance shared by every GeminiClient in the process
+key_scheduler = KeyScheduler()
@@ -0,0 +1,254 @@
+"""
+Lightweight in-process metrics with Prometheus text exposition.
+
+Counters, gauges and fixed-bucket histograms keyed by label values. Recording
+is a dict lookup, a ``bisect`` and a few additions under a lock, so it is
+cheap enough to leave on in production. ``registry.render()`` produces the
+Prometheus text format served on ``/metrics`` by ``app.py``.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Default latency buckets in seconds: 5 ms .. 60 s
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Buckets for cheap local work (regex guards): 10 µs .. 50 ms
+FAST_BUCKETS = (0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.01, 0.05)
+# Buckets for prompt sizes in estimated tokens
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 1500, 2000, 4000, 8000, 16000)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Gauge(Counter):
+    """A value that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: "Histogram", labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram with sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, **labels) -> _Timer:
+        """Context manager observing the elapsed wall time of its block."""
+        return _Timer(self, labels)
+
+    def snapshot(self, **labels) -> Optional[Dict[str, float]]:
+        """Count, sum and bucket-estimated p50/p99 for one label set."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            if series is None:
+                return None
+            counts, total = list(series[0]), series[1]
+        n = sum(counts)
+        return {"count": n, "sum": total,
+                "p50": self._quantile(counts, n, 0.5), "p99": self._quantile(counts, n, 0.99)}
+
+    def _quantile(self, counts: List[int], n: int, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile."""
+        running = 0
+        for index, count in enumerate(counts):
+            running += count
+            if n and running >= q * n:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return 0.0
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = [(key, list(series[0]), series[1]) for key, series in self._series.items()]
+        for key, counts, total in items:
+            running = 0
+            for bound, count in zip(self.buckets, counts):
+                running += count
+                le = 'le="%s"' % format(bound, "g")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {running}")
+            running += counts[-1]
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, inf)} {running}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {running}")
+        return lines
+
+
+class Registry:
+    """Holds every metric and renders them in Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Singleton registry and the metrics recorded across the pipeline
+registry = Registry()
+
+turns_total = registry.counter(
+    "sereneshield_turns_total", "Completed turns by pipeline mode.", ["mode"])
+turn_seconds = registry.histogram(
+    "sereneshield_turn_seconds", "End-to-end turn latency by pipeline mode.", ["mode"])
+stage_seconds = registry.histogram(
+    "sereneshield_stage_seconds", "Latency of each pipeline stage.", ["stage"])
+
+gemini_calls_total = registry.counter(
+    "sereneshield_gemini_calls_total", "Logical Gemini calls by agent and outcome.", ["agent", "outcome"])
+gemini_call_seconds = registry.histogram(
+    "sereneshield_gemini_call_seconds", "Logical Gemini call latency including retries.", ["agent"])
+gemini_attempts_total = registry.counter(
+    "sereneshield_gemini_attempts_total", "Upstream Gemini attempts by agent, key and outcome.",
+    ["agent", "key", "outcome"])
+gemini_attempt_seconds = registry.histogram(
+    "sereneshield_gemini_attempt_seconds", "Latency of single upstream attempts.", ["agent", "outcome"])
+gemini_retries_total = registry.counter(
+    "sereneshield_gemini_retries_total", "Attempts beyond the first, by agent.", ["agent"])
+gemini_hedges_fired_total = registry.counter(
+    "sereneshield_gemini_hedges_fired_total", "Duplicate requests sent on another key for slow calls, by agent.",
+    ["agent"])
+gemini_hedge_wins_total = registry.counter(
+    "sereneshield_gemini_hedge_wins_total", "Hedged calls answered by the duplicate request, by agent.", ["agent"])
+
+guard_seconds = registry.histogram(
+    "sereneshield_guard_seconds", "Time spent in local regex guards.", ["guard"], buckets=FAST_BUCKETS)
+plot_seconds = registry.histogram(
+    "sereneshield_plot_render_seconds", "Distress plot rendering time.")
+queue_wait_seconds = registry.histogram(
+    "sereneshield_queue_wait_seconds", "Time a turn waited before it could start.", ["queue"])
+
+worker_guard_aborts_total = registry.counter(
+    "sereneshield_worker_guard_aborts_total", "Worker generations cancelled by the stream guard, by rule.", ["rule"])
+worker_guard_saved_tokens_total = registry.counter(
+    "sereneshield_worker_guard_saved_tokens_total", "Estimated output tokens not generated because of early aborts.")
+worker_guard_saved_seconds_total = registry.counter(
+    "sereneshield_worker_guard_saved_seconds_total", "Estimated generation time saved by early aborts.")
+
+safety_screen_total = registry.counter(
+    "sereneshield_safety_screen_total", "Local safety pre-screen decisions.", ["decision"])
+safety_screen_disagreements_total = registry.counter(
+    "sereneshield_safety_screen_disagreements_total", "Audited auto-approvals the LLM Evaluator rejected.")
+
+cache_lookups_total = registry.counter(
+    "sereneshield_cache_lookups_total", "Local cache lookups by cache and result (hit or miss).", ["cache", "result"])
+
+context_tokens = registry.histogram(
+    "sereneshield_context_tokens", "Estimated tokens per turn in each part of the Planner prompt.", ["part"],
+    buckets=TOKEN_BUCKETS)
@@ -0,0 +1,206 @@
+"""
+Two-tier cache for deterministic Gemini responses.
+
+An in-memory LRU sits in front of an on-disk SQLite table so hot entries are
+served without touching disk and the rest survive restarts. Entries expire
+after a TTL and both tiers are bounded in size. The cache is opt-in and is
+enabled per agent (see ``Config.LLM_CACHE_AGENTS``).
+
+Reads never write: last-access times of disk hits are batched into the
+next ``put``, and expired rows are left for the periodic prune. The async
+variants run any SQLite work in a thread so the event loop never blocks.
+The memory tier has its own lock, never held across SQLite I/O, so a
+memory lookup on the event loop does not wait for a disk write or commit.
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+from project.core.observability import logger
+from project.config import Config
+
+
+class ResponseCache:
+    """LRU-in-front-of-SQLite response cache with TTL and size-based eviction."""
+
+    def __init__(self,
+                 path: str = "llm_cache.sqlite3",
+                 ttl_seconds: float = 86400.0,
+                 max_entries: int = 50000,
+                 memory_entries: int = 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+
+        # key -> (value, created_at, original_latency)
+        self._memory: "OrderedDict[str, Tuple[str, float, float]]" = OrderedDict()
+        # Guards the memory tier, ``_touched`` and the counters; held only briefly
+        self._lock = threading.Lock()
+        # Serializes use of the SQLite connection
+        self._db_lock = threading.Lock()
+        self._puts_since_prune = 0
+        # key -> last access of disk hits not yet written back
+        self._touched: Dict[str, float] = {}
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created_at REAL NOT NULL, last_access REAL NOT NULL, latency REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+        self._hits_memory = 0
+        self._hits_disk = 0
+        self._misses = 0
+        self._saved_latency = 0.0
+
+    @staticmethod
+    def make_key(model: str, system_instruction: Optional[str], prompt: str, generation_config: Dict[str, Any]) -> str:
+        """Stable hash of everything that determines the model's output."""
+        payload = json.dumps(
+            [model, system_instruction or "", prompt, generation_config],
+            sort_keys=True, ensure_ascii=False, default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _get_memory(self, key: str, now: float) -> Optional[str]:
+        """Memory-tier lookup; no I/O, safe to call on the event loop."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            value, created_at, latency = entry
+            if now - created_at > self.ttl_seconds:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self._hits_memory += 1
+            self._saved_latency += latency
+            return value
+
+    def _get_disk(self, key: str, now: float) -> Optional[str]:
+        """Disk-tier lookup (read only; expired rows are left for ``_prune``)."""
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT value, created_at, latency FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+        with self._lock:
+            if row is None or now - row[1] > self.ttl_seconds:
+                self._misses += 1
+                return None
+
+            value, created_at, latency = row
+            self._touched[key] = now
+            self._remember(key, value, created_at, latency)
+            self._hits_disk += 1
+            self._saved_latency += latency
+            return value
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for ``key`` or None on miss/expiry."""
+        now = time.time()
+        value = self._get_memory(key, now)
+        return value if value is not None else self._get_disk(key, now)
+
+    async def get_async(self, key: str) -> Optional[str]:
+        """Async variant of ``get``; only a memory miss goes to a thread."""
+        now = time.time()
+        value = self._get_memory(key, now)
+        return value if value is not None else await asyncio.to_thread(self._get_disk, key, now)
+
+    def put(self, key: str, value: str, latency: float = 0.0):
+        """Store a response along with how long it took to produce upstream."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now, latency)
+            touched, self._touched = self._touched, {}
+            self._puts_since_prune += 1
+            prune = self._puts_since_prune >= 100
+            if prune:
+                self._puts_since_prune = 0
+
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, last_access, latency)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, value, now, now, latency),
+            )
+            if touched:
+                self._conn.executemany(
+                    "UPDATE responses SET last_access = ? WHERE key = ?",
+                    [(accessed, touched_key) for touched_key, accessed in touched.items()],
+                )
+            if prune:
+                self._prune(now)
+            self._conn.commit()
+
+    async def put_async(self, key: str, value: str, latency: float = 0.0):
+        """Async variant of ``put``, run in a thread."""
+        await asyncio.to_thread(self.put, key, value, latency)
+
+    def _remember(self, key: str, value: str, created_at: float, latency: float):
+        """Insert into the memory tier (caller holds the lock)."""
+        self._memory[key] = (value, created_at, latency)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _prune(self, now: float):
+        """Drop expired rows and trim the disk tier to ``max_entries`` (caller holds ``_db_lock``)."""
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self):
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+        with self._db_lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit ratio and upstream latency saved by cache hits."""
+        with self._lock:
+            hits = self._hits_memory + self._hits_disk
+            total = hits + self._misses
+            return {
+                "hits_memory": self._hits_memory,
+                "hits_disk": self._hits_disk,
+                "misses": self._misses,
+                "hit_ratio": round(hits / total, 4) if total else 0.0,
+                "saved_latency_s": round(self._saved_latency, 3),
+                "memory_entries": len(self._memory),
+            }
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide cache instance, created on first use from Config."""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(
+                path=Config.LLM_CACHE_PATH,
+                ttl_seconds=Config.LLM_CACHE_TTL,
+                max_entries=Config.LLM_CACHE_MAX_ENTRIES,
+                memory_entries=Config.LLM_CACHE_MEMORY_ENTRIES,
+            )
+            logger.log("ResponseCache", f"Opened response cache at {Config.LLM_CACHE_PATH}")
+        return _response_cache
@@ -0,0 +1,605 @@
+"""
+Compiled safety-rule scanner shared by the Planner and the Evaluator.
+
+All rule sets live in one JSON file (see ``safety_rules.json``). Each set is
+compiled into a single alternation with one named group per rule, so a scan
+reports which rule fired. Python's ``re`` cannot use its fast literal search
+on an alternation, so every rule also gets a literal anchor (the longest
+literal each match must contain); a scan first looks the anchors up with
+``str.find`` and runs the alternation only over the rules whose anchor is
+present, starting at the first anchor when it begins the pattern. Clean text,
+the common case, never reaches the regex engine. Input is normalized once
+per text (case, Unicode compatibility forms and accents,
+Cyrillic/Greek look-alikes, zero-width characters, runs of whitespace and
+s-p-a-c-e-d letters) and every match is mapped back to its span in the
+original text. Leetspeak inside words ("su1c1de") is only folded for rule
+sets marked ``fold_leet`` (the ones run on user input): in a Worker draft
+"5mg" or "1st" is ordinary text.
+
+Rule sets marked ``negatable`` ignore a match when a negation cue ("cannot",
+"not a doctor") appears in the same sentence, rather than anywhere in the
+text. Patterns are combined into one regex, so they must not use numbered
+backreferences or named groups of their own.
+
+The rule file is re-read when its mtime changes (checked at most every
+``reload_interval`` seconds); a file that fails to load is logged and the
+previous rules stay active.
+"""
+import bisect
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Any
+
+from project.core.observability import logger
+from project.core.metrics import guard_seconds
+from project.config import Config
+
+_ZERO_WIDTH = "\u00ad\u180e\u200b\u200c\u200d\u2060\ufeff"
+
+# Look-alike letters that NFKC leaves alone (lowercase forms; input is casefolded first)
+_CONFUSABLES = str.maketrans({
+    # Cyrillic
+    "а": "a", "в": "b", "е": "e", "ё": "e", "і": "i", "ї": "i", "ј": "j", "к": "k",
+    "м": "m", "н": "h", "о": "o", "р": "p", "с": "c", "т": "t", "у": "y", "х": "x", "ѕ": "s",
+    "һ": "h", "ԁ": "d", "ԛ": "q", "ԝ": "w",
+    # Greek
+    "α": "a", "β": "b", "ε": "e", "η": "n", "ι": "i", "κ": "k", "μ": "u", "ν": "v", "ο": "o",
+    "ρ": "p", "τ": "t", "υ": "u", "χ": "x",
+    # Latin variants and punctuation
+    "ı": "i", "ɑ": "a", "ɡ": "g", "ʟ": "l", "‐": "-", "‑": "-", "‒": "-", "–": "-", "—": "-",
+    "‘": "'", "’": "'", "ʼ": "'", "“": '"', "”": '"',
+})
+
+_LEET = str.maketrans("013457@$", "oieastas")
+
+_NON_ASCII_RE = re.compile(r"[^\x00-\x7f]+")
+# Runs of horizontal whitespace that are not a single plain space (newlines end sentences)
+_WHITESPACE_RE = re.compile(r"[^\S\n]{2,}|[^\S\n ]")
+# Words that mix letters with digits/symbols used as letters: "h4rm", "d1agnose", "$uicide"
+_LEET_RE = re.compile(r"(?<![\w@$])(?=[\w@$]*[a-z])(?=[\w@$]*[013457@$])[\w@$]+")
+# At least four single letters split by one separator: "d i a g n o s e", "k.i.l.l"
+_SPACED_RE = re.compile(r"(?<![\w@$])(?:[a-z][ ._*-]){3,}[a-z](?![\w@$])")
+
+_ODD_WHITESPACE = "\t\r\x0b\x0c\x1c\x1d\x1e\x1f"
+_LEET_CHARS = "013457@$"
+# For the s-p-a-c-e-d letter check: letters become "a", other word characters "0", the rest " "
+_SPACED_CLASSES = str.maketrans(
+    {chr(c): " " for c in range(128)}
+    | {c: "a" for c in "abcdefghijklmnopqrstuvwxyz"}
+    | {c: "0" for c in "0123456789_@$"})
+
+_SENTENCE_ENDS = ".!?\n"
+
+
+class _StageMap(NamedTuple):
+    """Piecewise map from positions in a rewritten text back to positions in its input."""
+    starts: List[int]    # segment start in the output
+    origins: List[int]   # input position the segment starts from
+    steps: List[int]     # 1: copied from the input, 0: every character comes from the origin
+
+    def __call__(self, pos: int) -> int:
+        i = bisect.bisect_right(self.starts, pos) - 1
+        return self.origins[i] + (pos - self.starts[i]) * self.steps[i]
+
+
+class Normalized(NamedTuple):
+    """Normalized text plus the rewrite stages needed to map spans back to the source."""
+    text: str
+    maps: Tuple[_StageMap, ...]
+    source_length: int
+
+    def source_index(self, pos: int) -> int:
+        for stage in reversed(self.maps):
+            pos = stage(pos)
+        return pos
+
+    def span(self, start: int, end: int) -> Tuple[int, int]:
+        if not self.maps:
+            return start, end
+        if start >= len(self.text):
+            return self.source_length, self.source_length
+        if end <= start:
+            return self.source_index(start), self.source_index(start)
+        return self.source_index(start), self.source_index(end - 1) + 1
+
+
+class RuleMatch(NamedTuple):
+    rule_set: str
+    rule: str
+    start: int   # span in the original text
+    end: int
+    negated: bool = False
+
+
+@functools.lru_cache(maxsize=4096)
+def _fold_char(char: str) -> str:
+    if char in _ZERO_WIDTH:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", char)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return stripped.casefold().translate(_CONFUSABLES)
+
+
+class _FoldTable(dict):
+    """``str.translate`` table of one-to-one character folds, filled on demand.
+
+    Characters whose fold changes the length (ligatures, zero-width characters)
+    map to themselves here and are rewritten, with a position map, afterwards.
+    """
+
+    def __missing__(self, codepoint: int) -> str:
+        char = chr(codepoint)
+        folded = _fold_char(char)
+        value = folded if len(folded) == 1 else char
+        if len(self) < 65536:
+            self[codepoint] = value
+        return value
+
+
+_FOLD_TABLE = _FoldTable()
+
+
+def _rewrite(text: str, matches: Iterable["re.Match"], replace,
+             keeps_layout: bool = False) -> Tuple[str, Optional[_StageMap]]:
+    """Apply ``replace(match) -> [(chars, index), ...]`` to each match.
+
+    Returns the new text and a map back to ``text`` (None when nothing changed
+    or, with ``keeps_layout``, when every character stays where it was).
+    """
+    parts: List[str] = []
+    segments: List[Tuple[int, int, int]] = []   # (output start, input origin, step)
+    out = last = 0
+    matched = False
+    for match in matches:
+        matched = True
+        if match.start() > last:
+            segments.append((out, last, 1))
+            parts.append(text[last:match.start()])
+            out += match.start() - last
+        for chars, index in replace(match):
+            if chars:
+                segments.append((out, index, 0))
+                parts.append(chars)
+                out += len(chars)
+        last = match.end()
+    if not matched:
+        return text, None
+    if last < len(text):
+        segments.append((out, last, 1))
+        parts.append(text[last:])
+    if keeps_layout:
+        return "".join(parts), None
+    starts, origins, steps = (list(column) for column in zip(*segments))
+    return "".join(parts), _StageMap(starts, origins, steps)
+
+
+# The rewrite regexes are slow to run over a whole text, so candidate positions are found
+# with str.find (memchr speed) and the regex only runs where something could match.
+
+class _NextOf:
+    """Next occurrence, at or after a position, of any of several substrings (amortized linear)."""
+
+    def __init__(self, text: str, needles: Iterable[str]):
+        self.text = text
+        self.next = {needle: text.find(needle) for needle in needles}   # -1: gone for good
+
+    def __call__(self, pos: int) -> int:
+        best = -1
+        for needle, at in self.next.items():
+            if at != -1 and at < pos:
+                at = self.next[needle] = self.text.find(needle, pos)
+            if at != -1 and (best == -1 or at < best):
+                best = at
+        return best
+
+
+def _whitespace_matches(text: str):
+    next_candidate = _NextOf(text, ("  ",) + tuple(_ODD_WHITESPACE))
+    pos = 0
+    while True:
+        i = next_candidate(pos)
+        if i == -1:
+            return
+        match = _WHITESPACE_RE.match(text, max(i - 1, pos)) or _WHITESPACE_RE.match(text, i)
+        if match:
+            yield match
+        pos = match.end() if match else i + 1
+
+
+def _leet_matches(text: str):
+    next_candidate = _NextOf(text, _LEET_CHARS)
+    pos = 0
+    while True:
+        i = next_candidate(pos)
+        if i == -1:
+            return
+        start = i
+        while start > pos and (text[start - 1].isalnum() or text[start - 1] in "_@$"):
+            start -= 1
+        match = _LEET_RE.match(text, start)
+        if match:
+            yield match
+        pos = match.end() if match else i + 1
+
+
+def _spaced_classes(text: str) -> str:
+    # The padding space shifts indexes back onto the text
+    return " " + text.translate(_SPACED_CLASSES) + " "
+
+
+def _spaced_matches(text: str, padded: Optional[str] = None):
+    # Four single-letter words in a row
+    padded = padded or _spaced_classes(text)
+    pos = 0
+    while True:
+        i = padded.find(" a a a a ", pos)
+        if i == -1:
+            return
+        match = _SPACED_RE.match(text, i)
+        if match:
+            yield match
+        pos = match.end() if match else i + 1
+
+
+# (candidate matches, replacement, whether character positions are unchanged, leet stage)
+_REWRITES = (
+    (_whitespace_matches, lambda m: [(" ", m.start())], False, False),
+    (_leet_matches, lambda m: [(m.group().translate(_LEET), m.start())], True, True),
+    (_spaced_matches, lambda m: [(c, i) for i, c in enumerate(m.group(), m.start()) if c.isalpha()], False, False),
+)
+
+
+def normalize(text: str, leet: bool = True) -> Normalized:
+    """Fold case, look-alikes and obfuscation so the rules see canonical text.
+
+    ``leet`` also folds digits and symbols used as letters inside words.
+    """
+    maps: List[_StageMap] = []
+    suspect = _ODD_WHITESPACE + _LEET_CHARS if leet else _ODD_WHITESPACE
+    if text.isascii():
+        folded = text.lower()
+        if (not any(c in folded for c in suspect) and "  " not in folded
+                and " a a a a " not in _spaced_classes(folded)):
+            # Plain text, the common case: nothing to rewrite
+            return Normalized(folded, (), len(text))
+    else:
+        # One-to-one folds keep every position; only what is left over needs a map
+        folded = text.translate(_FOLD_TABLE)
+        if not folded.isascii():
+            folded, stage = _rewrite(
+                folded, _NON_ASCII_RE.finditer(folded),
+                lambda m: [(_fold_char(c), i) for i, c in enumerate(m.group(), m.start())])
+            if stage is not None:
+                maps.append(stage)
+
+    for matches, replace, keeps_layout, leet_stage in _REWRITES:
+        if leet_stage and not leet:
+            continue
+        folded, stage = _rewrite(folded, matches(folded), replace, keeps_layout)
+        if stage is not None:
+            maps.append(stage)
+    return Normalized(folded, tuple(maps), len(text))
+
+
+def _skip_class(pattern: str, i: int) -> int:
+    """Index of the ``]`` closing the character class that opens at ``i``."""
+    i += 1
+    if pattern[i:i + 1] == "^":
+        i += 1
+    if pattern[i:i + 1] == "]":
+        i += 1
+    while i < len(pattern) and pattern[i] != "]":
+        i += 2 if pattern[i] == "\\" else 1
+    return i
+
+
+def _anchor(pattern: str) -> Tuple[Optional[str], bool]:
+    """Longest literal (3+ chars) every match of ``pattern`` contains, and whether matches start with it.
+
+    Conservative: groups, classes, escapes like ``\\d`` and optional characters
+    end a literal run, and a top-level ``|`` means there is no single anchor.
+    """
+    items: List[Optional[str]] = []   # a literal character, "" for zero-width, None for anything else
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "\\":
+            escaped = pattern[i + 1:i + 2]
+            if escaped in ("b", "B", "A", "Z"):
+                items.append("")
+            else:
+                items.append(None if escaped.isalnum() else escaped)
+            i += 2
+            continue
+        if c == "[":
+            i = _skip_class(pattern, i)
+            items.append(None)
+        elif c == "(":
+            # Skip the whole group; it may be optional or an alternation
+            depth = 0
+            while i < n:
+                if pattern[i] == "\\":
+                    i += 1
+                elif pattern[i] == "[":
+                    i = _skip_class(pattern, i)
+                elif pattern[i] == "(":
+                    depth += 1
+                elif pattern[i] == ")":
+                    depth -= 1
+                    if depth == 0:
+                        break
+                i += 1
+            items.append(None)
+        elif c == "|":
+            return None, False
+        elif c in "?*{":
+            if c == "{":
+                i = pattern.find("}", i) if pattern.find("}", i) != -1 else n
+            if items:
+                items[-1] = None   # the quantified item may be absent
+        elif c == "+":
+            items.append(None)     # the item is present, but repeats break the run
+        elif c in "^$":
+            items.append("")
+        else:
+            items.append(None if c == "." else c)
+        i += 1
+
+    runs: List[Tuple[str, bool]] = []
+    run, at_start, consumed = "", True, False
+    for item in items + [None]:
+        if item is None:
+            if run:
+                runs.append((run, at_start))
+            run, at_start, consumed = "", False, True
+        else:
+            if not run:
+                at_start = not consumed
+            run += item
+    runs = [r for r in runs if len(r[0]) >= 3]
+    if not runs:
+        return None, False
+    anchor, is_prefix = max(runs, key=lambda r: len(r[0]))
+    # Scanned text is casefolded, so an uppercase literal could only ever match under (?i)
+    return anchor.lower(), is_prefix
+
+
+class _CompiledSet:
+    """One rule set: the combined alternation plus per-rule anchors for prefiltering."""
+
+    def __init__(self, rules: List[Tuple[str, str]], negatable: bool, fold_leet: bool):
+        self.patterns = [pattern for pattern, _ in rules]
+        self.rules = {f"r{index}": label for index, (_, label) in enumerate(rules)}   # group -> rule as written
+        self.anchors = [_anchor(pattern) for pattern in self.patterns]
+        self._anchored = [(index, anchor, is_prefix)
+                          for index, (anchor, is_prefix) in enumerate(self.anchors) if anchor is not None]
+        self._unanchored = [index for index, (anchor, _) in enumerate(self.anchors) if anchor is None]
+        self.negatable = negatable
+        self.fold_leet = fold_leet
+        self.regex = self._alternation(tuple(range(len(rules))))
+        self._subsets: Dict[Tuple[int, ...], "re.Pattern"] = {}
+
+    def _alternation(self, indexes: Tuple[int, ...]) -> "re.Pattern":
+        return re.compile("|".join(f"(?P<r{i}>{self.patterns[i]})" for i in indexes))
+
+    def finditer(self, text: str):
+        """Non-overlapping matches of the rules whose anchors occur in ``text``."""
+        hits = [rule for rule in self._anchored if rule[1] in text]
+        if not hits and not self._unanchored:
+            return iter(())
+        candidates = sorted(self._unanchored + [index for index, _, _ in hits])
+        start = 0
+        if not self._unanchored and all(is_prefix for _, _, is_prefix in hits):
+            # Every candidate match begins at its anchor: skip straight to the first one
+            start = min(text.find(anchor) for _, anchor, _ in hits)
+        if len(candidates) == len(self.patterns):
+            regex = self.regex
+        else:
+            key = tuple(candidates)
+            regex = self._subsets.get(key)
+            if regex is None:
+                regex = self._subsets[key] = self._alternation(key)
+        return regex.finditer(text, start)
+
+
+class _RuleBook(NamedTuple):
+    version: str
+    sets: Dict[str, _CompiledSet]
+    negation: Optional["re.Pattern"]
+
+
+def _compile_rules(raw: bytes) -> _RuleBook:
+    spec = json.loads(raw.decode("utf-8"))
+    sets: Dict[str, _CompiledSet] = {}
+    for name, body in spec.get("rule_sets", {}).items():
+        # (regex, rule as written in the file)
+        rules = [(str(p), str(p)) for p in body.get("patterns", [])]
+        rules += [(re.escape(str(lit).lower()), str(lit)) for lit in body.get("literals", [])]
+        if not rules:
+            continue
+        for pattern, _ in rules:
+            re.compile(pattern)  # report a bad rule on its own rather than as part of the alternation
+        sets[name] = _CompiledSet(rules, bool(body.get("negatable", False)), bool(body.get("fold_leet", False)))
+
+    cues = [re.escape(str(c).lower()) for c in spec.get("negation_cues", [])]
+    negation = re.compile("|".join(cues)) if cues else None
+    return _RuleBook(hashlib.sha256(raw).hexdigest()[:16], sets, negation)
+
+
+class SafetyScanner:
+    """Scans text against the compiled rule sets and hot-reloads the rule file."""
+
+    def __init__(self, path: str, reload_interval: float = 2.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._checked = 0.0
+        self._last: Dict[bool, Tuple[str, Normalized]] = {}   # leet -> last text and its normalization
+
+        self._scans = 0
+        self._reloads = 0
+        self._reload_errors = 0
+
+        # A missing or broken rule file at startup is fatal: never run without the hard rules
+        self._book = self._load()
+
+    def _load(self) -> _RuleBook:
+        stat = os.stat(self.path)
+        with open(self.path, "rb") as f:
+            book = _compile_rules(f.read())
+        self._stamp = (stat.st_mtime_ns, stat.st_size)
+        return book
+
+    def reload(self) -> bool:
+        """Re-read the rule file; keeps the current rules if it does not load."""
+        with self._lock:
+            try:
+                book = self._load()
+            except Exception as e:
+                self._reload_errors += 1
+                logger.log("SafetyScan", f"Rule reload failed, keeping version {self._book.version}: {e}",
+                           level="ERROR")
+                return False
+            changed = book.version != self._book.version
+            self._book = book
+            self._last = {}
+            if changed:
+                self._reloads += 1
+                logger.log("SafetyScan", f"Loaded safety rules version {book.version}",
+                           data={"rule_sets": {name: len(s.rules) for name, s in book.sets.items()}})
+            return changed
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked < self.reload_interval:
+            return
+        self._checked = now
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        if (stat.st_mtime_ns, stat.st_size) != self._stamp:
+            if not self.reload():
+                # Do not retry a broken file on every scan; wait for the next edit
+                self._stamp = (stat.st_mtime_ns, stat.st_size)
+
+    @property
+    def version(self) -> str:
+        """Hash of the active rule file; changes whenever the rules do."""
+        self._maybe_reload()
+        return self._book.version
+
+    def patterns(self, rule_set: str) -> List[str]:
+        self._maybe_reload()
+        compiled = self._book.sets.get(rule_set)
+        return list(compiled.rules.values()) if compiled else []
+
+    def normalize(self, text: str, leet: bool = True) -> Normalized:
+        # Planner and Evaluator often scan the same text for several sets in a row
+        last = self._last.get(leet)
+        if last is not None and last[0] is text:
+            return last[1]
+        normalized = normalize(text, leet)
+        self._last[leet] = (text, normalized)
+        return normalized
+
+    @staticmethod
+    def _sentence_end(text: str, end: int) -> int:
+        """Index of the first sentence terminator at or after ``end``, or -1."""
+        right = -1
+        for c in _SENTENCE_ENDS:
+            found = text.find(c, end)
+            if found != -1 and (right == -1 or found < right):
+                right = found
+        return right
+
+    def _negated(self, book: _RuleBook, text: str, start: int, end: int) -> bool:
+        if book.negation is None:
+            return False
+        left = max(text.rfind(c, 0, start) for c in _SENTENCE_ENDS) + 1
+        right = self._sentence_end(text, end)
+        return book.negation.search(text, left, right if right != -1 else len(text)) is not None
+
+    def scan(self, text: str, rule_sets: Optional[Iterable[str]] = None) -> List[RuleMatch]:
+        """Every (non-overlapping) rule match per set, including negated ones."""
+        self._maybe_reload()
+        book = self._book
+        self._scans += 1
+        matches = []
+        for name in (rule_sets if rule_sets is not None else book.sets):
+            compiled = book.sets.get(name)
+            if compiled is None:
+                continue
+            normalized = self.normalize(text, compiled.fold_leet)
+            for m in compiled.finditer(normalized.text):
+                negated = compiled.negatable and self._negated(book, normalized.text, m.start(), m.end())
+                start, end = normalized.span(m.start(), m.end())
+                matches.append(RuleMatch(name, compiled.rules[m.lastgroup], start, end, negated))
+        return matches
+
+    def first_violation(self, text: str, rule_sets: Iterable[str], partial: bool = False) -> Optional[RuleMatch]:
+        """First non-negated match, trying ``rule_sets`` in order; stops at the first hit.
+
+        With ``partial`` the text is the unfinished head of a stream: a
+        negatable match whose sentence has not ended yet is held back, since
+        its negation cue may still arrive.
+        """
+        self._maybe_reload()
+        book = self._book
+        self._scans += 1
+        for name in rule_sets:
+            compiled = book.sets.get(name)
+            if compiled is None:
+                continue
+            normalized = self.normalize(text, compiled.fold_leet)
+            for m in compiled.finditer(normalized.text):
+                if compiled.negatable:
+                    if partial and self._sentence_end(normalized.text, m.end()) == -1:
+                        continue
+                    if self._negated(book, normalized.text, m.start(), m.end()):
+                        continue
+                start, end = normalized.span(m.start(), m.end())
+                return RuleMatch(name, compiled.rules[m.lastgroup], start, end)
+        return None
+
+    def matches(self, text: str, rule_set: str) -> bool:
+        return self.first_violation(text, (rule_set,)) is not None
+
+    def get_stats(self) -> Dict[str, Any]:
+        book = self._book
+        return {
+            "version": book.version,
+            "rule_sets": {name: len(s.rules) for name, s in book.sets.items()},
+            "scans": self._scans,
+            "reloads": self._reloads,
+            "reload_errors": self._reload_errors,
+        }
+
+
+# Singleton instance shared by the Planner and the Evaluator
+safety_scanner = SafetyScanner(Config.SAFETY_RULES_PATH, Config.SAFETY_RULES_RELOAD_INTERVAL)
+
+
+# ---- user-input signals shared by the Planner, Evaluator and admission ----
+
+def is_crisis(text: str) -> bool:
+    """Self-harm / suicide language."""
+    return safety_scanner.matches(text, "crisis")
+
+
+def is_jailbreak(text: str) -> bool:
+    """Common jailbreak patterns."""
+    with guard_seconds.time(guard="jailbreak"):
+        return safety_scanner.matches(text, "jailbreak")
+
+
+def input_features(text: str) -> Tuple[bool, bool]:
+    """(crisis, medical request): user-input signals that can change the verdict on the same draft."""
+    return is_crisis(text), safety_scanner.matches(text, "medical_request")
@@ -0,0 +1,94 @@
+"""
+Single-flight request coalescing.
+
+Concurrent callers asking for the same key share one in-flight upstream
+call: the first caller (the leader) runs it and everyone else waits for its
+result or its error. In-flight calls are tracked as
+``concurrent.futures.Future`` objects, so blocking threads and asyncio tasks
+can wait on the same call regardless of which side started it.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key."""
+
+    def __init__(self):
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._leaders = 0
+        self._followers = 0
+
+    def _join(self, key: str):
+        """Return (future, is_leader) for ``key``."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._followers += 1
+                return future, False
+            future = Future()
+            # A running future cannot be cancelled by one impatient waiter
+            future.set_running_or_notify_cancel()
+            self._calls[key] = future
+            self._leaders += 1
+            return future, True
+
+    def _forget(self, key: str, future: Future):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run ``fn`` once for all concurrent callers with the same key (blocking)."""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._forget(key, future)
+        future.set_result(result)
+        return result
+
+    async def do_async(self, key: str, coro_fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant of ``do``.
+
+        The leader's call runs as its own task, so cancelling the leader (or
+        any follower) does not cancel the shared upstream request.
+        """
+        future, leader = self._join(key)
+        if leader:
+            task = asyncio.ensure_future(coro_fn())
+
+            def _settle(t: asyncio.Task):
+                self._forget(key, future)
+                if t.cancelled():
+                    future.set_exception(asyncio.CancelledError())
+                elif t.exception() is not None:
+                    future.set_exception(t.exception())
+                else:
+                    future.set_result(t.result())
+
+            task.add_done_callback(_settle)
+
+        return await asyncio.wrap_future(future)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Number of upstream calls made, callers coalesced and calls in flight."""
+        with self._lock:
+            return {
+                "upstream_calls": self._leaders,
+                "coalesced_calls": self._followers,
+                "in_flight": len(self._calls),
+            }
+
+
+# Singleton instance shared by every GeminiClient in the process
+single_flight = SingleFlight()
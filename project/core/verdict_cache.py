@@ -0,0 +1,95 @@
+"""
+In-process cache of Evaluator verdicts.
+
+Identical drafts (fallback messages, crisis-resource replies, canned
+responses) are evaluated once and then answered locally. Entries are keyed
+by the normalized draft, the features of the turn that can change the
+verdict on it (the plan's risk level and the crisis / medical-request
+flags of the user message) and a version hash of everything that shapes
+the verdict (evaluator prompt, safety rules, model), so changing any of
+those invalidates the cache. The message text itself is not part of the
+key, so the same draft answering differently worded messages of the same
+kind is evaluated once. Lookups are counted in the metrics registry. The
+cache is opt-in (``VERDICT_CACHE_ENABLED``).
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Any
+
+from project.core.metrics import cache_lookups_total
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE_RE.sub(" ", text).strip().lower()
+
+
+def prompt_version(*parts: str) -> str:
+    """Short hash identifying the evaluator configuration."""
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+class VerdictCache:
+    """Bounded LRU of raw Evaluator verdicts with a TTL."""
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def make_key(self, version: str, draft: str, risk_level: Optional[str], features: Tuple) -> str:
+        """Cache key for a draft in a turn with these features; a new ``version`` drops every older entry."""
+        with self._lock:
+            if version != self._version:
+                if self._version is not None:
+                    self._entries.clear()
+                    self._invalidations += 1
+                self._version = version
+        payload = f"{version}\x1f{risk_level or ''}\x1f{features!r}\x1f{normalize_text(draft)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                cache_lookups_total.inc(cache="verdict", result="miss")
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            cache_lookups_total.inc(cache="verdict", result="hit")
+            return dict(entry[1])
+
+    def put(self, key: str, verdict: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (time.time(), dict(verdict))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self._invalidations,
+            }
@@ -4,92 +4,460 @@ Main Agent: Orchestrator for the multi-agent pipeline.
 from project.agents.planner import Planner
 from project.agents.worker import Worker
 from project.agents.evaluator import Evaluator
+from project.agents.fused import FusedAgent
+from project.agents.summarizer import Summarizer
 from project.memory.session_memory import SessionMemory
-from project.memory.long_term_memory import LongTermMemory # NEW IMPORT
+from project.memory.long_term_memory import LongTermMemory, open_long_term_memory # NEW IMPORT
+from project.memory.context_builder import ContextBuilder
 from project.core.observability import logger
+from project.core.metrics import stage_seconds, turns_total, turn_seconds, context_tokens
+from project.core.admission import CRISIS, ELEVATED, NORMAL, LOW
+from project.core.safety_scan import is_crisis, is_jailbreak
 from project.config import Config
-from typing import Dict
+from typing import Dict, Tuple, AsyncIterator, Optional, Any
+import asyncio
+import time
+from contextlib import contextmanager
+
+# Values of the ``mode`` label on turn metrics
+PIPELINE_MODES = ("staged", "fused", "fused_fallback")
 
 class MainAgent:
-    def __init__(self, mock_mode: bool = None):
-        # Initialize components
-        self.planner = Planner()
-        self.worker = Worker()
-        self.evaluator = Evaluator()
-        self.memory = SessionMemory(max_history=8)
-        self.long_term_memory = LongTermMemory() # NEW COMPONENT
+    def __init__(self, mock_mode: bool = None,
+                 planner: Optional[Planner] = None,
+                 worker: Optional[Worker] = None,
+                 evaluator: Optional[Evaluator] = None,
+                 fused: Optional[FusedAgent] = None,
+                 memory: Optional[SessionMemory] = None,
+                 long_term_memory: Optional[LongTermMemory] = None,
+                 summarizer: Optional[Summarizer] = None):
+        # Initialize components (agents may be shared between sessions, memories may not)
+        self.planner = planner or Planner()
+        self.worker = worker or Worker()
+        self.evaluator = evaluator or Evaluator()
+        self.fused = fused or FusedAgent()
+        self.summarizer = summarizer or Summarizer()
+        self.memory = memory or SessionMemory(max_history=8)
+        self.long_term_memory = long_term_memory or open_long_term_memory("default", "user_long_term_data.json") # NEW COMPONENT
         
         # Set mock mode
         self.mock_mode = mock_mode if mock_mode is not None else Config.MOCK_MODE
         self.planner.mock_mode = self.mock_mode
         self.worker.mock_mode = self.mock_mode
         self.evaluator.mock_mode = self.mock_mode
+        self.summarizer.mock_mode = self.mock_mode
+        
+        # Token-budgeted history: preferences + rolling summary + recent turns
+        self.context = ContextBuilder(self.memory, self.summarizer)
+        self._turn_tokens: Dict[str, int] = {}
+        
+        # Speculative Worker drafting (LIVE async path only)
+        self.speculative = Config.SPECULATIVE_WORKER
+        self._last_plan: Optional[Dict] = None
+        self.speculation_stats = {"attempts": 0, "hits": 0, "misses": 0, "saved_ms": 0.0}
+        
+        # Cancel Worker generations as soon as they break an Evaluator hard rule
+        self.worker_guard = Config.WORKER_STREAM_GUARD
+        
+        # "staged" (Planner -> Worker -> Evaluator) or "fused" (one call, staged fallback)
+        self.pipeline_mode = Config.PIPELINE_MODE
+        self._turn_timings: Dict[str, float] = {}
         
         logger.log("MainAgent", f"Initialized in {'MOCK' if self.mock_mode else 'LIVE'} mode")
     
-    def handle_message(self, user_input: str) -> Dict:
-        """Process a single user message through the pipeline."""
+    def _begin_turn(self, user_input: str, preferences: Optional[str] = None) -> Tuple[str, str]:
+        """Record the user turn and gather history + long-term context.
+
+        Async turns pass ``preferences`` in, read without blocking the event loop.
+        """
+        self._turn_timings = {}
         logger.log("System", "Processing new message", 
                    data={"input_preview": user_input[:50] + "..."})
         
+        # 1. Update Memory
+        self.memory.add_message("user", user_input)
+        
+        # 2. Fit long-term preferences, the rolling summary and recent turns into the token budget
+        if preferences is None:
+            preferences = self.long_term_memory.get_preferences_string()
+        history_str, lt_memory_str, tokens = self.context.build(preferences)
+        # The Planner adds "planner_prompt" when it actually sends its prompt
+        for part in ("preferences", "summary", "recent", "context"):
+            context_tokens.observe(tokens[part], part=part)
+        self._turn_tokens = tokens
+        logger.log("MainAgent", "Context built", data=tokens)
+        return history_str, lt_memory_str
+
+    def _record_stage(self, stage: str, elapsed: float):
+        stage_seconds.observe(elapsed, stage=stage)
+        self._turn_timings[f"{stage}_ms"] = round(elapsed * 1000, 1)
+
+    @contextmanager
+    def _stage(self, stage: str):
+        """Time a pipeline stage into the metrics and this turn's ``timings``."""
+        started = time.perf_counter()
         try:
-            # 1. Update Memory
-            self.memory.add_message("user", user_input)
-            history_str = self.memory.get_history_string()
+            yield
+        finally:
+            self._record_stage(stage, time.perf_counter() - started)
+
+    @staticmethod
+    def _preference(plan: Dict) -> Optional[Tuple[str, str]]:
+        save_pref = plan.get("save_preference")
+        if save_pref and isinstance(save_pref, dict):
+            key = save_pref.get("key")
+            value = save_pref.get("value")
+            if key and value:
+                return key, value
+        return None
+
+    def _save_preference(self, plan: Dict):
+        # 3a. Save Preferences if detected (New Feature)
+        preference = self._preference(plan)
+        if preference:
+            self.long_term_memory.update_preference(*preference)
+            logger.log("MainAgent", f"Saved User Preference: {preference[0]}={preference[1]}")
+
+    async def _save_preference_async(self, plan: Dict):
+        preference = self._preference(plan)
+        if preference:
+            await self.long_term_memory.update_preference_async(*preference)
+            logger.log("MainAgent", f"Saved User Preference: {preference[0]}={preference[1]}")
+
+    def _finish_turn(self, plan: Dict, worker_res: Dict, eval_res: Dict) -> Dict:
+        final_response = eval_res.get("final_response")
+        
+        # 6. Update Memory
+        self.memory.add_message("assistant", final_response)
+        
+        # 7. Compile results
+        return {
+            "response": final_response,
+            "plan": plan,
+            "tools_used": worker_res.get("tools_used", []),
+            "safety_status": eval_res.get("status"),
+            "conversation_stats": self.memory.get_stats(),
+            "timings": dict(self._turn_timings),
+            "context_tokens": dict(self._turn_tokens),
+            "logs": logger.get_logs()
+        }
+
+    def _error_result(self, e: Exception) -> Dict:
+        logger.log("MainAgent", f"Pipeline error: {e}")
+        error_response = "I apologize, but I'm experiencing technical difficulties. Please try again later."
+        self.memory.add_message("assistant", error_response)
+        
+        return {
+            "response": error_response,
+            "plan": {"emotion": "error", "risk_level": "LOW", "action": "chat"},
+            "tools_used": [],
+            "safety_status": "REJECTED",
+            "conversation_stats": self.memory.get_stats(),
+            "logs": logger.get_logs()
+        }
+
+    def _worker_guard(self):
+        """Guard factory handed to the Worker, or None to generate unguarded."""
+        return self.evaluator.stream_guard if self.worker_guard and not self.mock_mode else None
+
+    def _speculate(self, user_input: str, streaming: bool = False) -> Optional[Dict[str, Any]]:
+        """Start a Worker draft from a locally guessed plan while the Planner runs."""
+        if not self.speculative:
+            return None
+        provisional = self.planner.provisional_plan(user_input, self._last_plan)
+        if provisional is None:
+            return None
+        
+        spec: Dict[str, Any] = {"plan": provisional, "started": time.monotonic(), "finished": None}
+        if streaming:
+            queue: asyncio.Queue = asyncio.Queue()
             
-            # 2. Get Long Term Context
-            lt_memory_str = self.long_term_memory.get_preferences_string()
+            async def buffer_stream():
+                try:
+                    async for event in self.worker.work_stream_async(provisional, self._worker_guard()):
+                        await queue.put(event)
+                except Exception as e:
+                    logger.log("MainAgent", f"Speculative draft failed: {e}")
+                    await queue.put({"type": "done", "output": None})
             
-            # 3. Planner (Analyze Input + History + Long Term Memory)
-            plan = self.planner.plan(user_input, history_str, lt_memory_str)
+            spec["queue"] = queue
+            task = asyncio.ensure_future(buffer_stream())
+        else:
+            task = asyncio.ensure_future(self.worker.work_async(provisional, self._worker_guard()))
+        
+        task.add_done_callback(lambda _: spec.__setitem__("finished", time.monotonic()))
+        spec["task"] = task
+        self.speculation_stats["attempts"] += 1
+        return spec
+
+    def _resolve_speculation(self, spec: Optional[Dict[str, Any]], plan: Dict) -> bool:
+        """Keep the speculative draft if the real plan has the same action and technique."""
+        if spec is None:
+            return False
+        guess = spec["plan"]
+        hit = guess.get("action") == plan.get("action") and \
+            (guess.get("technique_suggestion") or "none") == (plan.get("technique_suggestion") or "none")
+        
+        if hit:
+            # Work the draft had already done when the plan arrived
+            saved_ms = ((spec["finished"] or time.monotonic()) - spec["started"]) * 1000
+            self.speculation_stats["hits"] += 1
+            self.speculation_stats["saved_ms"] += saved_ms
+            logger.log("MainAgent", f"Speculation hit: kept draft, saved ~{saved_ms:.0f} ms",
+                       data={"action": plan.get("action"), "hit_rate": self.get_speculation_stats()["hit_rate"]})
+        else:
+            self._cancel_speculation(spec)
+            self.speculation_stats["misses"] += 1
+            logger.log("MainAgent", "Speculation miss: discarded draft",
+                       data={"guessed": guess.get("action"), "actual": plan.get("action")})
+        return hit
+
+    @staticmethod
+    def _cancel_speculation(spec: Optional[Dict[str, Any]]):
+        """Stop a speculative draft that is still running."""
+        if spec is not None and not spec["task"].done():
+            spec["task"].cancel()
+
+    async def _speculative_work(self, spec: Optional[Dict[str, Any]], hit: bool, plan: Dict) -> Dict:
+        if hit:
+            try:
+                return await spec["task"]
+            except Exception as e:
+                logger.log("MainAgent", f"Speculative draft failed, redrafting: {e}")
+        return await self.worker.work_async(plan, self._worker_guard())
+
+    async def _speculative_stream(self, spec: Optional[Dict[str, Any]], hit: bool, plan: Dict) -> AsyncIterator[Dict]:
+        if hit:
+            while True:
+                event = await spec["queue"].get()
+                if event["type"] == "done":
+                    if event["output"] is None:
+                        event = {"type": "done", "output": await self.worker.work_async(plan, self._worker_guard())}
+                    yield event
+                    return
+                yield event
+        async for event in self.worker.work_stream_async(plan, self._worker_guard()):
+            yield event
+
+    def get_speculation_stats(self) -> Dict[str, Any]:
+        """Speculation hit rate and total latency saved."""
+        stats = dict(self.speculation_stats)
+        decided = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / decided, 4) if decided else 0.0
+        stats["saved_ms"] = round(stats["saved_ms"], 1)
+        return stats
+
+    def admission_priority(self, user_input: str) -> int:
+        """Admission priority for this turn from cheap local signals."""
+        last_risk = (self._last_plan or {}).get("risk_level")
+        if is_crisis(user_input) or last_risk == "HIGH":
+            return CRISIS
+        if is_jailbreak(user_input):
+            return LOW
+        if last_risk == "MEDIUM":
+            return ELEVATED
+        return NORMAL
+
+    def _use_fused(self, user_input: str) -> bool:
+        """Fused mode is skipped up front for turns the local guards already flag."""
+        return self.pipeline_mode == "fused" and not self.mock_mode and \
+            not is_jailbreak(user_input) and not is_crisis(user_input)
+
+    def _accept_fused(self, fused_res: Optional[Tuple[Dict, Dict, Dict]], save: bool = True) -> Optional[Dict]:
+        """Finish a fused turn, or return None to rerun it through the staged pipeline.
+
+        With ``save=False`` the caller stores the plan's preference itself (async turns).
+        """
+        if fused_res is None:
+            return None
+        plan, worker_res, eval_res = fused_res
+        
+        reason = None
+        if plan.get("risk_level") == "HIGH" or plan.get("action") in ("emergency_protocol", "enforce_boundary"):
+            reason = "high-risk plan"
+        elif self.evaluator.hard_rule_violation(worker_res["draft_response"]):
+            reason = "regex hard rule"
+        elif eval_res.get("status") != "APPROVED":
+            reason = "self-check rejected draft"
+        if reason:
+            logger.log("MainAgent", f"Fused turn falling back to staged pipeline: {reason}")
+            return None
+        
+        self._last_plan = plan
+        if save:
+            self._save_preference(plan)
+        return self._finish_turn(plan, worker_res, eval_res)
+
+    def _record_latency(self, mode: str, started: float):
+        elapsed = time.perf_counter() - started
+        turns_total.inc(mode=mode)
+        turn_seconds.observe(elapsed, mode=mode)
+
+    @staticmethod
+    def get_pipeline_stats() -> Dict[str, Any]:
+        """Turn count and mean latency per pipeline mode, across every session in the process."""
+        stats = {}
+        for mode in PIPELINE_MODES:
+            s = turn_seconds.snapshot(mode=mode)
+            if s is not None and s["count"]:
+                stats[mode] = {"turns": int(s["count"]), "avg_ms": round(s["sum"] / s["count"] * 1000, 1)}
+        return stats
+
+    def handle_message(self, user_input: str) -> Dict:
+        """Process a single user message through the pipeline."""
+        started = time.perf_counter()
+        mode = "staged"
+        try:
+            history_str, lt_memory_str = self._begin_turn(user_input)
             
-            # 3a. Save Preferences if detected (New Feature)
-            save_pref = plan.get("save_preference")
-            if save_pref and isinstance(save_pref, dict):
-                key = save_pref.get("key")
-                value = save_pref.get("value")
-                if key and value:
-                    self.long_term_memory.update_preference(key, value)
-                    logger.log("MainAgent", f"Saved User Preference: {key}={value}")
+            if self._use_fused(user_input):
+                with self._stage("fused"):
+                    fused_res = self.fused.run(user_input, history_str, lt_memory_str)
+                result = self._accept_fused(fused_res)
+                if result is not None:
+                    self._record_latency("fused", started)
+                    return result
+                mode = "fused_fallback"
+            
+            # 3. Planner (Analyze Input + History + Long Term Memory)
+            with self._stage("planner"):
+                plan = self.planner.plan(user_input, history_str, lt_memory_str, self._turn_tokens)
+            self._last_plan = plan
+            self._save_preference(plan)
             
             # 4. Worker (Execute Plan)
-            worker_res = self.worker.work(plan)
+            with self._stage("worker"):
+                worker_res = self.worker.work(plan, self._worker_guard())
             
             # 5. Evaluator (Check Output vs Input)
-            eval_res = self.evaluator.evaluate(worker_res, user_input)
+            with self._stage("evaluator"):
+                eval_res = self.evaluator.evaluate(worker_res, user_input, plan.get("risk_level"))
             
-            final_response = eval_res.get("final_response")
+            result = self._finish_turn(plan, worker_res, eval_res)
+            self._record_latency(mode, started)
+            return result
+            
+        except Exception as e:
+            return self._error_result(e)
+
+    async def handle_message_async(self, user_input: str) -> Dict:
+        """Async variant of ``handle_message``; awaits each LLM stage instead of blocking a thread."""
+        started = time.perf_counter()
+        mode = "staged"
+        spec = None
+        try:
+            history_str, lt_memory_str = self._begin_turn(
+                user_input, await self.long_term_memory.get_preferences_string_async())
             
-            # 6. Update Memory
-            self.memory.add_message("assistant", final_response)
+            if self._use_fused(user_input):
+                with self._stage("fused"):
+                    fused_res = await self.fused.run_async(user_input, history_str, lt_memory_str)
+                result = self._accept_fused(fused_res, save=False)
+                if result is not None:
+                    await self._save_preference_async(result["plan"])
+                    self._record_latency("fused", started)
+                    return result
+                mode = "fused_fallback"
             
-            # 7. Compile results
-            return {
-                "response": final_response,
-                "plan": plan,
-                "tools_used": worker_res.get("tools_used", []),
-                "safety_status": eval_res.get("status"),
-                "conversation_stats": self.memory.get_stats(),
-                "logs": logger.get_logs()
-            }
+            spec = self._speculate(user_input)
+            with self._stage("planner"):
+                plan = await self.planner.plan_async(user_input, history_str, lt_memory_str, self._turn_tokens)
+            self._last_plan = plan
+            await self._save_preference_async(plan)
+            
+            hit = self._resolve_speculation(spec, plan)
+            with self._stage("worker"):
+                worker_res = await self._speculative_work(spec, hit, plan)
+            
+            with self._stage("evaluator"):
+                eval_res = await self.evaluator.evaluate_async(worker_res, user_input, plan.get("risk_level"))
+            
+            result = self._finish_turn(plan, worker_res, eval_res)
+            self._record_latency(mode, started)
+            return result
             
         except Exception as e:
-            logger.log("MainAgent", f"Pipeline error: {e}")
-            error_response = "I apologize, but I'm experiencing technical difficulties. Please try again later."
-            self.memory.add_message("assistant", error_response)
-            
-            return {
-                "response": error_response,
-                "plan": {"emotion": "error", "risk_level": "LOW", "action": "chat"},
-                "tools_used": [],
-                "safety_status": "REJECTED",
-                "conversation_stats": self.memory.get_stats(),
-                "logs": logger.get_logs()
-            }
+            return self._error_result(e)
+        finally:
+            # A Planner error or a cancelled turn must not leave the draft burning a Worker call
+            self._cancel_speculation(spec)
+    
+    async def stream_message_async(self, user_input: str) -> AsyncIterator[Dict]:
+        """Process a message, streaming the Worker's draft as it is generated.
+
+        Yields, in order:
+            {"type": "plan", "plan": ...}       once the Planner has decided
+            {"type": "draft", "text": ...}      growing draft text, per chunk
+            {"type": "final", "result": ...}    same dict as ``handle_message``
+
+        The Evaluator's regex rules run on the growing text; once one trips,
+        no further draft text is emitted. With the Worker stream guard on, the
+        generation is also cancelled upstream and may restart, in which case
+        the draft text starts over. The final result is authoritative
+        and may replace the streamed text entirely if the draft is rejected.
+        In fused mode the draft arrives in one piece with the final result.
+        """
+        started = time.perf_counter()
+        mode = "staged"
+        spec = None
+        try:
+            history_str, lt_memory_str = self._begin_turn(
+                user_input, await self.long_term_memory.get_preferences_string_async())
+            
+            if self._use_fused(user_input):
+                with self._stage("fused"):
+                    fused_res = await self.fused.run_async(user_input, history_str, lt_memory_str)
+                result = self._accept_fused(fused_res, save=False)
+                if result is not None:
+                    await self._save_preference_async(result["plan"])
+                    self._record_latency("fused", started)
+                    yield {"type": "plan", "plan": result["plan"]}
+                    yield {"type": "final", "result": result}
+                    return
+                mode = "fused_fallback"
+            
+            spec = self._speculate(user_input, streaming=True)
+            with self._stage("planner"):
+                plan = await self.planner.plan_async(user_input, history_str, lt_memory_str, self._turn_tokens)
+            self._last_plan = plan
+            await self._save_preference_async(plan)
+            yield {"type": "plan", "plan": plan}
+            
+            hit = self._resolve_speculation(spec, plan)
+            guard = self.evaluator.stream_guard()
+            worker_res = None
+            worker_start = time.perf_counter()
+            async for event in self._speculative_stream(spec, hit, plan):
+                if event["type"] == "done":
+                    worker_res = event["output"]
+                    guard.finish()
+                elif event["type"] == "restart":
+                    # The Worker dropped a draft (it broke a hard rule, or its stream failed) and is writing a new one
+                    guard = self.evaluator.stream_guard()
+                elif guard.feed(event["text"]) is None:
+                    yield {"type": "draft", "text": guard.text}
+            self._record_stage("worker", time.perf_counter() - worker_start)
+            
+            if guard.violation:
+                logger.log("MainAgent", f"Stream guard withheld draft: {guard.violation}")
+            
+            with self._stage("evaluator"):
+                eval_res = await self.evaluator.evaluate_async(worker_res, user_input, plan.get("risk_level"))
+            result = self._finish_turn(plan, worker_res, eval_res)
+            self._record_latency(mode, started)
+            
+        except Exception as e:
+            result = self._error_result(e)
+        finally:
+            # Also runs when the consumer stops reading mid-turn
+            self._cancel_speculation(spec)
+        
+        yield {"type": "final", "result": result}
     
     def get_conversation_summary(self) -> str:
         return self.memory.get_conversation_summary()
     
     def clear_memory(self):
         self.memory.clear()
+        self.context.reset()
         logger.log("MainAgent", "Conversation memory cleared")
\ No newline at end of file
@@ -0,0 +1,197 @@
+"""
+Token-budgeted conversation context for the Planner (and fused) prompt.
+
+Each turn, ``ContextBuilder.build`` splits ``CONTEXT_TOKEN_BUDGET`` between
+the user's long-term preferences (up to ``CONTEXT_PREFERENCES_SHARE``), a
+rolling summary of older turns (up to ``CONTEXT_SUMMARY_SHARE``) and as
+many recent messages as fit verbatim, newest first, in what is left. Text
+that must be shortened is cut at a sentence or word boundary. Tokens are
+estimated locally (``estimate_tokens``, ~4 characters per token).
+
+Messages that drop out of the verbatim window, or will soon be evicted
+from session memory (fewer than ``CONTEXT_SUMMARY_BATCH`` free slots), are
+folded into the summary by the Summarizer in the background: on the
+running event loop for async turns, or on a small thread pool for blocking
+ones. A turn never waits for it and simply uses the latest finished
+summary. Messages evicted before a refresh covered them (e.g. while one
+was in flight) are held by the session memory until a later refresh does.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from project.memory.session_memory import SessionMemory, Message
+from project.core.key_scheduler import estimate_tokens
+from project.core.observability import logger
+from project.core.metrics import stage_seconds
+from project.config import Config
+
+# Blocking summaries for sync turns (async turns summarize on their event loop)
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="context-summary")
+
+
+def _tokens(text: str) -> int:
+    return estimate_tokens(text) if text else 0
+
+
+def clip(text: str, max_tokens: int) -> str:
+    """``text`` cut to about ``max_tokens``, preferring a sentence, line or word boundary."""
+    if _tokens(text) <= max_tokens:
+        return text
+    limit = max(0, max_tokens * 4 - 3)
+    cut = text[:limit]
+    boundary = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "), cut.rfind("\n"))
+    if boundary >= limit // 2:
+        cut = cut[:boundary + 1]
+    elif cut.rfind(" ") >= limit // 2:
+        cut = cut[:cut.rfind(" ")]
+    return cut.rstrip() + "..."
+
+
+def _line(message: Message) -> str:
+    return f"{message.label}: {message.content}"
+
+
+class ContextBuilder:
+    """Builds one session's prompt context within a token budget."""
+
+    def __init__(self, memory: SessionMemory, summarizer: Any, budget: Optional[int] = None):
+        self.memory = memory
+        self.summarizer = summarizer
+        self.budget = budget if budget is not None else Config.CONTEXT_TOKEN_BUDGET
+
+        self.summary = ""
+        self._summarized_to = 0  # seq of the first message the summary does not cover
+        self._refresh: Optional[Any] = None  # in-flight asyncio.Task or Future
+        self._generation = 0  # bumped by reset() so stale refreshes are dropped
+        self._lock = threading.Lock()
+        if Config.CONTEXT_SUMMARY_ENABLED:
+            # Room for two windows' worth of messages evicted ahead of the summary
+            memory.keep_evicted(max(memory.max_history * 4, Config.CONTEXT_SUMMARY_BATCH))
+
+    def build(self, preferences: str) -> Tuple[str, str, Dict[str, int]]:
+        """Return ``(history_str, memory_str, token counts)`` for this turn."""
+        memory_str = clip(preferences, int(self.budget * Config.CONTEXT_PREFERENCES_SHARE))
+        with self._lock:
+            summary, covered = self.summary, self._summarized_to
+        summary = clip(summary, int(self.budget * Config.CONTEXT_SUMMARY_SHARE))
+        remaining = self.budget - _tokens(memory_str) - _tokens(summary)
+
+        # Newest first; the summary already stands in for messages it covers
+        messages = self.memory.messages()
+        self.memory.release_evicted(covered)
+        evicted = self.memory.evicted()
+        recent: List[str] = []
+        first_recent = messages[-1].seq + 1 if messages else covered
+        for message in reversed(messages):
+            if message.seq < covered:
+                break
+            line = _line(message)
+            cost = _tokens(line)
+            if cost > remaining:
+                if not recent:
+                    # The current message always goes in, shortened if it must be
+                    recent.append(clip(line, max(remaining, 1)))
+                    first_recent = message.seq
+                break
+            recent.append(line)
+            remaining -= cost
+            first_recent = message.seq
+        recent.reverse()
+
+        # Messages waiting for the summary: evicted ones it does not cover yet, those
+        # outside the verbatim window, plus, once the ring is nearly full, the oldest
+        # few before it evicts them
+        pending_end = first_recent
+        evicting = bool(messages) and self.memory.free_slots < Config.CONTEXT_SUMMARY_BATCH
+        if evicting:
+            pending_end = max(pending_end, messages[0].seq + Config.CONTEXT_SUMMARY_BATCH)
+        older = evicted + [m for m in messages if covered <= m.seq < pending_end]
+        if older:
+            urgent = bool(evicted) or (evicting and older[0] is messages[0])
+            self._maybe_refresh(older, urgent)
+
+        recent_str = "\n".join(recent)
+        if summary:
+            history_str = f"EARLIER IN THIS CONVERSATION (summary):\n{summary}"
+            if recent_str:
+                history_str += f"\n\nRECENT MESSAGES:\n{recent_str}"
+        else:
+            history_str = recent_str or "No prior conversation."
+
+        tokens = {
+            "budget": self.budget,
+            "preferences": _tokens(memory_str),
+            "summary": _tokens(summary),
+            "recent": _tokens(recent_str),
+            "recent_messages": len(recent),
+            "unsummarized_messages": len(older),
+        }
+        tokens["context"] = tokens["preferences"] + tokens["summary"] + tokens["recent"]
+        return history_str, memory_str, tokens
+
+    # ---- background summary ----
+
+    def _maybe_refresh(self, older: List[Message], urgent: bool):
+        """Start a summary refresh once enough turns wait, or sooner if ``urgent`` (eviction)."""
+        if not Config.CONTEXT_SUMMARY_ENABLED:
+            return
+        if len(older) < Config.CONTEXT_SUMMARY_BATCH and not urgent:
+            return
+        with self._lock:
+            if self._refresh is not None and not self._refresh.done():
+                return
+            previous, generation = self.summary, self._generation
+
+        lines = [_line(m) for m in older]
+        upto = older[-1].seq + 1
+        max_tokens = int(self.budget * Config.CONTEXT_SUMMARY_SHARE)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if loop is not None:
+            refresh = loop.create_task(self._refresh_async(previous, lines, max_tokens, upto, generation))
+        else:
+            refresh = _summary_executor.submit(self._refresh_sync, previous, lines, max_tokens, upto, generation)
+        with self._lock:
+            self._refresh = refresh
+
+    def _refresh_sync(self, previous: str, lines: List[str], max_tokens: int, upto: int, generation: int):
+        started = time.perf_counter()
+        try:
+            summary = self.summarizer.summarize(previous, lines, max_tokens)
+        except Exception as e:
+            logger.log("ContextBuilder", f"Summary refresh failed: {e}", level="WARNING")
+            return
+        self._apply(summary, upto, generation, started, len(lines))
+
+    async def _refresh_async(self, previous: str, lines: List[str], max_tokens: int, upto: int, generation: int):
+        started = time.perf_counter()
+        try:
+            summary = await self.summarizer.summarize_async(previous, lines, max_tokens)
+        except Exception as e:
+            logger.log("ContextBuilder", f"Summary refresh failed: {e}", level="WARNING")
+            return
+        self._apply(summary, upto, generation, started, len(lines))
+
+    def _apply(self, summary: str, upto: int, generation: int, started: float, folded: int):
+        with self._lock:
+            if generation != self._generation:
+                return  # the conversation was cleared meanwhile
+            self.summary, self._summarized_to = summary, upto
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, stage="summary")
+        logger.log("ContextBuilder", f"Rolling summary refreshed ({folded} message(s) folded in)",
+                   data={"summary_tokens": _tokens(summary), "ms": round(elapsed * 1000, 1)})
+
+    def reset(self):
+        """Forget the summary (the session's history was cleared)."""
+        with self._lock:
+            self._generation += 1
+            self.summary = ""
+            self._summarized_to = 0
+            self._refresh = None
@@ -1,49 +1,284 @@
 """
 Long-Term Memory Module: Persists user preferences and key facts.
+
+Storage is a JSON snapshot (``storage_file``) plus an append-only journal
+(``storage_file + ".journal"``) holding one JSON record per change, so a
+write costs one small append no matter how much is stored. Appends reach
+the OS immediately; a shared background flusher fsyncs dirty journals in
+batches (group commit every ``LTM_JOURNAL_SYNC_INTERVAL`` seconds) and
+folds journals longer than ``LTM_JOURNAL_COMPACT_RECORDS`` into a new
+snapshot, which replaces the old one atomically. On startup the snapshot
+is loaded and the journal replayed on top of it; a torn last record left
+by a crash is dropped.
 """
+import atexit
 import json
 import os
-from typing import Dict, Any
+import threading
+import time
+from typing import Dict, Any, Optional, Set
+
+from project.core.observability import logger
+from project.config import Config
+
+
+def _empty() -> Dict[str, Dict[str, Any]]:
+    return {"preferences": {}, "facts": {}}
+
+
+def format_preferences(preferences: Dict[str, Any]) -> str:
+    """Preferences as the text block given to the LLM."""
+    if not preferences:
+        return "No known user preferences."
+    return "KNOWN USER PREFERENCES:\n" + "\n".join(f"- {k}: {v}" for k, v in preferences.items())
+
+
+class JournalFlusher:
+    """Background group commit shared by every ``LongTermMemory`` in the process."""
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self._pending: Set["LongTermMemory"] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def mark(self, memory: "LongTermMemory"):
+        """Queue a memory whose journal has unsynced records."""
+        with self._lock:
+            self._pending.add(memory)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ltm-journal", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def discard(self, memory: "LongTermMemory"):
+        """Forget a queued memory (its files are being removed)."""
+        with self._lock:
+            self._pending.discard(memory)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self):
+        """Sync (and compact, if due) every queued journal now."""
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        for memory in pending:
+            try:
+                memory.sync()
+            except Exception as e:
+                logger.log("LongTermMemory", f"Journal sync failed for {memory.storage_file}: {e}", level="WARNING")
+
 
 class LongTermMemory:
     def __init__(self, storage_file: str = "user_long_term_data.json"):
         self.storage_file = storage_file
+        self.journal_file = storage_file + ".journal"
+        self._lock = threading.RLock()
+        # One compaction at a time: the flusher thread and the atexit flush can both start one
+        self._compact_lock = threading.Lock()
+        self._journal = None
+        self._records = 0    # journal records not yet folded into the snapshot
+        self._unsynced = 0   # journal records not yet fsynced
+        self._rendered: Optional[str] = None
         self._load_memory()
 
+    # ---- startup ----
+
     def _load_memory(self):
-        """Load memory from JSON file or initialize empty."""
-        if os.path.exists(self.storage_file):
-            try:
-                with open(self.storage_file, 'r', encoding='utf-8') as f:
-                    self.data = json.load(f)
-            except Exception:
-                self.data = {"preferences": {}, "facts": {}}
-        else:
-            self.data = {"preferences": {}, "facts": {}}
-
-    def _save_memory(self):
-        """Persist memory to disk."""
+        """Load the snapshot, then replay the journal(s) written after it."""
+        self.data = self._read_snapshot()
+        rotated = self.journal_file + ".old"
+        had_rotated = os.path.exists(rotated)
+        for path in (rotated, self.journal_file):
+            self._records += self._replay(path)
+
+        if had_rotated:
+            # A compaction was interrupted: persist the merged view before the next one rotates again
+            self._write_snapshot(self.data)
+            os.remove(rotated)
+
+    def _read_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.storage_file):
+            return _empty()
         try:
-            with open(self.storage_file, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, indent=4)
+            with open(self.storage_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
         except Exception as e:
-            print(f"Error saving long-term memory: {e}")
+            # Keep the unreadable file for inspection instead of silently overwriting it
+            corrupt = f"{self.storage_file}.corrupt-{int(time.time())}"
+            os.replace(self.storage_file, corrupt)
+            logger.log("LongTermMemory", f"Unreadable snapshot moved to {corrupt}: {e}", level="ERROR")
+            return _empty()
+        for namespace, values in _empty().items():
+            data.setdefault(namespace, values)
+        return data
+
+    def _replay(self, path: str) -> int:
+        """Apply a journal's records in order; returns how many were applied."""
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return 0
+        applied, good_end = 0, 0
+        with f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError, TypeError):
+                    break
+                applied += 1
+                good_end += len(line)
+            size = f.seek(0, os.SEEK_END)
+
+        if good_end < size:
+            # Torn or corrupt tail (e.g. a crash mid-append): later appends must not be glued to it
+            logger.log("LongTermMemory", f"Dropped {size - good_end} byte(s) of damaged journal in {path}",
+                       level="WARNING")
+            os.truncate(path, good_end)
+        return applied
+
+    def _apply(self, record: Dict[str, Any]):
+        op = record["op"]
+        if op == "set":
+            self.data.setdefault(record["ns"], {})[record["key"]] = record["value"]
+        elif op == "clear":
+            self.data = _empty()
+
+    # ---- writes ----
+
+    def _append(self, record: Dict[str, Any]):
+        """Apply a change in memory and append it to the journal."""
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._apply(record)
+            self._rendered = None
+            try:
+                if self._journal is None:
+                    self._journal = open(self.journal_file, 'a', encoding='utf-8')
+                self._journal.write(line)
+                self._journal.flush()
+            except Exception as e:
+                logger.log("LongTermMemory", f"Error saving long-term memory: {e}", level="ERROR")
+                return
+            self._records += 1
+            self._unsynced += 1
+        journal_flusher.mark(self)
+
+    def sync(self):
+        """fsync unsynced journal records, then compact if the journal is long enough."""
+        with self._lock:
+            if self._journal is not None and self._unsynced:
+                os.fsync(self._journal.fileno())
+                self._unsynced = 0
+            due = self._records >= Config.LTM_JOURNAL_COMPACT_RECORDS
+        if due:
+            self.compact()
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot and start an empty journal.
+
+        Writes made while the snapshot is being written go to the new
+        journal; if the process dies midway, startup replays the rotated
+        journal too, so nothing is lost.
+        """
+        rotated = self.journal_file + ".old"
+        with self._compact_lock:
+            with self._lock:
+                if self._journal is not None:
+                    self._journal.flush()
+                    os.fsync(self._journal.fileno())
+                    self._journal.close()
+                    self._journal = None
+                if os.path.exists(self.journal_file):
+                    os.replace(self.journal_file, rotated)
+                snapshot = {namespace: dict(values) for namespace, values in self.data.items()}
+                folded, self._records, self._unsynced = self._records, 0, 0
+
+            self._write_snapshot(snapshot)
+            if os.path.exists(rotated):
+                os.remove(rotated)
+        logger.log("LongTermMemory", f"Compacted {folded} journal record(s) into {self.storage_file}")
+
+    def _write_snapshot(self, data: Dict[str, Dict[str, Any]]):
+        """Atomically replace the snapshot (write a temp file, fsync, rename)."""
+        tmp = self.storage_file + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.storage_file)
+
+    def close(self):
+        """Sync and close the journal (it reopens on the next write)."""
+        with self._lock:
+            if self._journal is not None:
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+                self._journal.close()
+                self._journal = None
+                self._unsynced = 0
+
+    def destroy(self):
+        """Close the journal and delete every file of this memory (snapshot, journals, temp file)."""
+        journal_flusher.discard(self)
+        with self._compact_lock, self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            for path in (self.storage_file, self.journal_file, self.journal_file + ".old", self.storage_file + ".tmp"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self.data = _empty()
+            self._rendered = None
+            self._records = self._unsynced = 0
+
+    # ---- public API ----
 
     def update_preference(self, key: str, value: str):
         """Save a user preference (e.g., 'preferred_technique': 'box_breathing')."""
-        self.data["preferences"][key] = value
-        self._save_memory()
+        self._append({"op": "set", "ns": "preferences", "key": key, "value": value})
+
+    async def update_preference_async(self, key: str, value: str):
+        """Async variant of ``update_preference`` (an in-memory change and one small append)."""
+        self.update_preference(key, value)
 
     def get_preferences_string(self) -> str:
-        """Format preferences for LLM context."""
-        if not self.data["preferences"]:
-            return "No known user preferences."
-        
-        return "KNOWN USER PREFERENCES:\n" + "\n".join(
-            f"- {k}: {v}" for k, v in self.data["preferences"].items()
-        )
+        """Format preferences for LLM context (rendered once per change)."""
+        rendered = self._rendered
+        if rendered is not None:
+            return rendered
+
+        with self._lock:
+            rendered = self._rendered = format_preferences(self.data["preferences"])
+        return rendered
+
+    async def get_preferences_string_async(self) -> str:
+        """Async variant of ``get_preferences_string`` (served from memory)."""
+        return self.get_preferences_string()
 
     def clear(self):
         """Wipe memory (useful for demo/testing)."""
-        self.data = {"preferences": {}, "facts": {}}
-        self._save_memory()
\ No newline at end of file
+        self._append({"op": "clear"})
+
+
+def open_long_term_memory(user_id: str, json_path: str):
+    """Long-term memory for one user on the configured backend (``Config.LTM_BACKEND``).
+
+    ``json_path`` is the user's file for the "json" backend; the "sqlite"
+    backend keys the shared store by ``user_id`` instead.
+    """
+    if Config.LTM_BACKEND == "sqlite":
+        from project.memory.sqlite_memory import SQLiteLongTermMemory
+        return SQLiteLongTermMemory(user_id)
+    return LongTermMemory(json_path)
+
+
+# Singleton flusher shared by every LongTermMemory in the process
+journal_flusher = JournalFlusher(Config.LTM_JOURNAL_SYNC_INTERVAL)
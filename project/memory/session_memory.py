@@ -1,62 +1,167 @@
 """
 Manages short-term conversation history with safety limits.
+
+Messages live in a fixed ring buffer of ``max_history`` user/assistant
+pairs. Each message is a slotted record whose history line is rendered
+once, when it arrives; role counts are updated as messages enter and fall
+out of the ring, and the joined history string is cached until the next
+message. Per-session memory and per-turn work are therefore bounded by
+the window, not by the length of the conversation. Stored content is
+capped at ``Config.SESSION_MESSAGE_MAX_CHARS``.
 """
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Deque, Dict, List, Optional
+
+from project.config import Config
+
+# Longest message text shown per line in the LLM history context
+HISTORY_LINE_CHARS = 200
+
+
+class Role(IntEnum):
+    USER = 0
+    ASSISTANT = 1
+    OTHER = 2  # any other role string (e.g. "system"), kept as given
+
+    @classmethod
+    def parse(cls, role: str) -> "Role":
+        return _ROLES.get(role, cls.OTHER)
+
+
+_ROLES = {"user": Role.USER, "assistant": Role.ASSISTANT}
+
+
+class Message:
+    __slots__ = ("role", "name", "content", "timestamp", "line", "seq")
+
+    def __init__(self, role: str, content: str, timestamp: float, seq: int = 0):
+        self.role = Role.parse(role)
+        self.name = role  # the role as given; counted under OTHER unless user/assistant
+        self.content = content
+        self.timestamp = timestamp
+        self.seq = seq  # position in the whole conversation, counting evicted messages
+        shown = content if len(content) <= HISTORY_LINE_CHARS else content[:HISTORY_LINE_CHARS] + "..."
+        self.line = f"{self.label}: {shown}"
+
+    @property
+    def label(self) -> str:
+        """The role as shown in history text ("USER", "ASSISTANT", ...)."""
+        return self.name.upper()
+
 
 class SessionMemory:
-    def __init__(self, max_history: int = 10):
-        self.history = []  # List of {"role": "user/assistant", "content": "...", "timestamp": float}
+    def __init__(self, max_history: int = 10, max_message_chars: Optional[int] = None):
         self.max_history = max_history
-    
+        self.max_message_chars = max_message_chars or Config.SESSION_MESSAGE_MAX_CHARS
+        self._capacity = max(1, max_history * 2)  # *2 for user+assistant pairs
+        self._ring: List[Optional[Message]] = [None] * self._capacity
+        self._start = 0
+        self._size = 0
+        self._role_counts = [0] * len(Role)
+        self._history_cache: Dict[int, str] = {}
+        self._added = 0
+        self._evicted: Optional[Deque[Message]] = None  # see keep_evicted()
+
+    def keep_evicted(self, limit: int):
+        """Hold up to ``limit`` evicted messages until released (so they can still be summarized)."""
+        self._evicted = deque(self._evicted or (), maxlen=max(1, limit))
+
+    def evicted(self) -> List[Message]:
+        """Evicted messages held by ``keep_evicted``, oldest first."""
+        return list(self._evicted) if self._evicted else []
+
+    def release_evicted(self, upto: int):
+        """Stop holding evicted messages with ``seq < upto``."""
+        while self._evicted and self._evicted[0].seq < upto:
+            self._evicted.popleft()
+
     def add_message(self, role: str, content: str):
         """Add message to history with timestamp."""
-        import time
-        self.history.append({
-            "role": role,
-            "content": content,
-            "timestamp": time.time()
-        })
-        
-        # Maintain history limit
-        if len(self.history) > self.max_history * 2:  # *2 for user+assistant pairs
-            self.history = self.history[-self.max_history * 2:]
-    
+        if len(content) > self.max_message_chars:
+            content = content[:self.max_message_chars]
+        message = Message(role, content, time.time(), self._added)
+        self._added += 1
+
+        if self._size < self._capacity:
+            self._ring[(self._start + self._size) % self._capacity] = message
+            self._size += 1
+        else:
+            # Full: overwrite the oldest message
+            oldest = self._ring[self._start]
+            self._role_counts[oldest.role] -= 1
+            if self._evicted is not None:
+                self._evicted.append(oldest)
+            self._ring[self._start] = message
+            self._start = (self._start + 1) % self._capacity
+        self._role_counts[message.role] += 1
+        self._history_cache.clear()
+
+    def _recent(self, count: int) -> List[Message]:
+        count = min(count, self._size)
+        first = self._start + self._size - count
+        return [self._ring[(first + i) % self._capacity] for i in range(count)]
+
+    def messages(self) -> List[Message]:
+        """Retained message records, oldest first."""
+        return self._recent(self._size)
+
+    @property
+    def full(self) -> bool:
+        """Whether the next message will evict the oldest one."""
+        return self._size == self._capacity
+
+    @property
+    def free_slots(self) -> int:
+        """Messages that can still be added before the oldest is evicted."""
+        return self._capacity - self._size
+
+    @property
+    def history(self) -> List[Dict]:
+        """Retained messages, oldest first, as {"role", "content", "timestamp"} dicts."""
+        return [{"role": m.name, "content": m.content, "timestamp": m.timestamp}
+                for m in self._recent(self._size)]
+
     def get_history_string(self, last_n: int = 5) -> str:
         """
         Returns formatted history for LLM context.
-        Includes only last N exchanges to stay within token limits.
+        Includes only last N exchanges to stay within token limits
+        (``last_n=0`` returns every retained message).
         """
-        recent = self.history[-last_n * 2:]  # N exchanges = 2N messages
-        
-        if not recent:
-            return "No prior conversation."
-        
-        formatted = []
-        for msg in recent:
-            role = msg["role"].upper()
-            content = msg["content"]
-            # Truncate very long messages
-            if len(content) > 200:
-                content = content[:200] + "..."
-            formatted.append(f"{role}: {content}")
-        
-        return "\n".join(formatted)
-    
+        cached = self._history_cache.get(last_n)
+        if cached is not None:
+            return cached
+
+        if last_n > 0:
+            recent = self._recent(last_n * 2)  # N exchanges = 2N messages
+        else:
+            # Same slice as the list-based history: last_n=0 ([-0:]) means all of it
+            recent = self.messages()[-last_n * 2:]
+        rendered = "\n".join(m.line for m in recent) if recent else "No prior conversation."
+        self._history_cache[last_n] = rendered
+        return rendered
+
     def get_conversation_summary(self) -> str:
         """Get brief summary of conversation flow."""
-        if not self.history:
+        if not self._size:
             return "New conversation"
-        
-        user_msgs = [m for m in self.history if m["role"] == "user"]
-        return f"{len(user_msgs)} messages exchanged"
-    
+        return f"{self._role_counts[Role.USER]} messages exchanged"
+
     def clear(self):
         """Clear all history."""
-        self.history = []
-    
+        self._ring = [None] * self._capacity
+        self._start = 0
+        self._size = 0
+        self._role_counts = [0] * len(Role)
+        self._history_cache.clear()
+        if self._evicted is not None:
+            self._evicted.clear()
+
     def get_stats(self) -> dict:
         """Get conversation statistics."""
         return {
-            "total_messages": len(self.history),
-            "user_messages": len([m for m in self.history if m["role"] == "user"]),
-            "assistant_messages": len([m for m in self.history if m["role"] == "assistant"])
-        }
\ No newline at end of file
+            "total_messages": self._size,
+            "user_messages": self._role_counts[Role.USER],
+            "assistant_messages": self._role_counts[Role.ASSISTANT]
+        }
@@ -0,0 +1,346 @@
+"""
+SQLite long-term memory: per-user preferences and facts for many users.
+
+Rows are keyed by (user_id, namespace, key) and spread over several SQLite
+files by a stable hash of the user id. Each shard runs in WAL mode behind a
+small connection pool, and every statement is a constant string so
+sqlite3's per-connection statement cache keeps it prepared; a lookup is one
+primary-key range read whatever the number of users. A user's record is
+loaded on first use and kept in an LRU of hot users, and writes go through
+to SQLite and update the cached record in place; a load that raced a write
+to the same user reads again rather than caching what it saw. The async
+methods of ``SQLiteLongTermMemory`` run SQLite work on a worker thread, so
+only cache misses and writes leave the event loop. Entries not updated for
+``ttl_seconds`` are stale: they are skipped on load and deleted by a purge
+that runs on one shard every few hundred writes.
+
+``scripts/ltm_sqlite.py`` imports and exports the per-user JSON files used
+by ``LongTermMemory``.
+"""
+import asyncio
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from project.core.observability import logger
+from project.memory.long_term_memory import format_preferences
+from project.config import Config
+
+Record = Dict[str, Dict[str, Any]]
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS memory ("
+    " user_id TEXT NOT NULL, ns TEXT NOT NULL, key TEXT NOT NULL,"
+    " value TEXT NOT NULL, updated_at REAL NOT NULL,"
+    " PRIMARY KEY (user_id, ns, key)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS memory_updated_at ON memory (updated_at)",
+)
+_SELECT_USER = "SELECT ns, key, value, updated_at FROM memory WHERE user_id = ? AND updated_at >= ?"
+_UPSERT = (
+    "INSERT INTO memory (user_id, ns, key, value, updated_at) VALUES (?, ?, ?, ?, ?)"
+    " ON CONFLICT (user_id, ns, key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at"
+)
+_DELETE_USER = "DELETE FROM memory WHERE user_id = ?"
+_PURGE = "DELETE FROM memory WHERE updated_at < ?"
+_SELECT_ALL = "SELECT user_id, ns, key, value FROM memory WHERE updated_at >= ? ORDER BY user_id"
+
+_PURGE_EVERY = 500
+
+
+def _empty() -> Record:
+    return {"preferences": {}, "facts": {}}
+
+
+class _Shard:
+    """One SQLite file and a fixed pool of connections to it."""
+
+    def __init__(self, path: str, pool_size: int):
+        self.path = path
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(max(1, pool_size)):
+            self._pool.put(self._connect())
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10.0, cached_statements=32)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+class SQLiteMemoryStore:
+    """Sharded SQLite store with an LRU of hot user records and TTL expiry."""
+
+    def __init__(self,
+                 directory: str = "user_memory_db",
+                 shards: int = 8,
+                 pool_size: int = 4,
+                 cache_users: int = 4096,
+                 ttl_seconds: float = 0.0):
+        self.directory = directory
+        self.cache_users = cache_users
+        self.ttl_seconds = ttl_seconds
+
+        os.makedirs(directory, exist_ok=True)
+        self.shards = [_Shard(os.path.join(directory, f"ltm-{i:02d}.sqlite3"), pool_size)
+                       for i in range(max(1, shards))]
+
+        # user_id -> (record, time after which the record may hold expired entries)
+        self._cache: "OrderedDict[str, Tuple[Record, float]]" = OrderedDict()
+        # user_id -> [loads in progress, writes seen since they started]
+        self._loading: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+        self._writes_since_purge = 0
+        self._next_purge_shard = 0
+
+        self._hits = 0
+        self._loads = 0
+        self._writes = 0
+        self._purged = 0
+
+    def _shard(self, user_id: str) -> _Shard:
+        # crc32 rather than hash() so a user maps to the same file in every process
+        return self.shards[zlib.crc32(user_id.encode("utf-8")) % len(self.shards)]
+
+    def _cutoff(self, now: float) -> float:
+        return now - self.ttl_seconds if self.ttl_seconds > 0 else float("-inf")
+
+    def cached(self, user_id: str) -> Optional[Record]:
+        """The user's record if the LRU holds a fresh copy, without touching SQLite."""
+        with self._lock:
+            entry = self._cache.get(user_id)
+            if entry is None or time.time() >= entry[1]:
+                return None
+            self._cache.move_to_end(user_id)
+            self._hits += 1
+            return entry[0]
+
+    def load(self, user_id: str) -> Record:
+        """The user's record (namespace -> key -> value), from the LRU or SQLite."""
+        record = self.cached(user_id)
+        if record is not None:
+            return record
+
+        while True:
+            now = time.time()
+            with self._lock:
+                loading = self._loading.setdefault(user_id, [0, 0])
+                loading[0] += 1
+                seen = loading[1]
+            try:
+                record = _empty()
+                oldest = float("inf")
+                with self._shard(user_id).connection() as conn:
+                    rows = conn.execute(_SELECT_USER, (user_id, self._cutoff(now))).fetchall()
+                for ns, key, value, updated_at in rows:
+                    record.setdefault(ns, {})[key] = json.loads(value)
+                    oldest = min(oldest, updated_at)
+                refresh_at = oldest + self.ttl_seconds if self.ttl_seconds > 0 else float("inf")
+            except BaseException:
+                with self._lock:
+                    self._done_loading(user_id, loading)
+                raise
+
+            # The race check and the cache insert share one lock hold, so a write is
+            # either seen here or finds the cached record and updates it
+            with self._lock:
+                self._done_loading(user_id, loading)
+                if loading[1] == seen:
+                    self._cache[user_id] = (record, refresh_at)
+                    self._cache.move_to_end(user_id)
+                    while len(self._cache) > self.cache_users:
+                        self._cache.popitem(last=False)
+                    self._loads += 1
+                    return record
+            # A write for this user landed mid-read: the rows may predate it, so read again
+
+    def _done_loading(self, user_id: str, loading: List[int]):
+        """Unregister one finished load (call under ``self._lock``)."""
+        loading[0] -= 1
+        if not loading[0]:
+            del self._loading[user_id]
+
+    def _written(self, user_id: str):
+        """Tell loads in progress for ``user_id`` that it changed (call under ``self._lock``)."""
+        loading = self._loading.get(user_id)
+        if loading is not None:
+            loading[1] += 1
+
+    def set(self, user_id: str, namespace: str, key: str, value: Any):
+        """Write one entry through to SQLite and into the cached record."""
+        now = time.time()
+        with self._shard(user_id).connection() as conn:
+            conn.execute(_UPSERT, (user_id, namespace, key, json.dumps(value, ensure_ascii=False), now))
+            conn.commit()
+
+        with self._lock:
+            self._written(user_id)
+            entry = self._cache.get(user_id)
+            if entry is not None:
+                record, refresh_at = entry
+                record.setdefault(namespace, {})[key] = value
+                if self.ttl_seconds > 0:
+                    # The new entry expires too; it may now be the first to
+                    self._cache[user_id] = (record, min(refresh_at, now + self.ttl_seconds))
+            self._writes += 1
+            self._writes_since_purge += 1
+            purge = self._writes_since_purge >= _PURGE_EVERY and self.ttl_seconds > 0
+            if purge:
+                self._writes_since_purge = 0
+                shard = self.shards[self._next_purge_shard]
+                self._next_purge_shard = (self._next_purge_shard + 1) % len(self.shards)
+        if purge:
+            self._purge(shard, now)
+
+    def import_user(self, user_id: str, record: Record, updated_at: Optional[float] = None):
+        """Replace a user's entries with ``record`` in one transaction."""
+        updated_at = updated_at or time.time()
+        rows = [(user_id, ns, key, json.dumps(value, ensure_ascii=False), updated_at)
+                for ns, values in record.items() for key, value in values.items()]
+        with self._shard(user_id).connection() as conn:
+            with conn:
+                conn.execute(_DELETE_USER, (user_id,))
+                conn.executemany(_UPSERT, rows)
+        with self._lock:
+            self._written(user_id)
+            self._cache.pop(user_id, None)
+
+    def clear_user(self, user_id: str):
+        with self._shard(user_id).connection() as conn:
+            conn.execute(_DELETE_USER, (user_id,))
+            conn.commit()
+        with self._lock:
+            self._written(user_id)
+            if user_id in self._cache:
+                self._cache[user_id] = (_empty(), float("inf"))
+
+    def iter_users(self) -> Iterator[Tuple[str, Record]]:
+        """Every user's live (unexpired) record, shard by shard."""
+        cutoff = self._cutoff(time.time())
+        for shard in self.shards:
+            with shard.connection() as conn:
+                rows = conn.execute(_SELECT_ALL, (cutoff,)).fetchall()
+            user_id, record = None, None
+            for row_user, ns, key, value in rows:
+                if row_user != user_id:
+                    if record is not None:
+                        yield user_id, record
+                    user_id, record = row_user, _empty()
+                record.setdefault(ns, {})[key] = json.loads(value)
+            if record is not None:
+                yield user_id, record
+
+    def _purge(self, shard: _Shard, now: float):
+        with shard.connection() as conn:
+            deleted = conn.execute(_PURGE, (self._cutoff(now),)).rowcount
+            conn.commit()
+        if deleted:
+            with self._lock:
+                self._purged += deleted
+            logger.log("LongTermMemory", f"Purged {deleted} stale entr{'y' if deleted == 1 else 'ies'}",
+                       data={"shard": os.path.basename(shard.path)})
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._loads
+            return {
+                "shards": len(self.shards),
+                "cached_users": len(self._cache),
+                "cache_hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "loads": self._loads,
+                "writes": self._writes,
+                "purged": self._purged,
+            }
+
+
+class SQLiteLongTermMemory:
+    """``LongTermMemory`` interface for one user of the shared SQLite store."""
+
+    def __init__(self, user_id: str, store: Optional[SQLiteMemoryStore] = None):
+        self.user_id = user_id
+        self.store = store or get_memory_store()
+        self._rendered: Optional[str] = None
+        self._rendered_from: Optional[Record] = None
+
+    @property
+    def data(self) -> Record:
+        return self.store.load(self.user_id)
+
+    def update_preference(self, key: str, value: str):
+        """Save a user preference (e.g., 'preferred_technique': 'box_breathing')."""
+        self.store.set(self.user_id, "preferences", key, value)
+        self._rendered = None
+
+    async def update_preference_async(self, key: str, value: str):
+        """Async variant of ``update_preference`` (the write runs on a worker thread)."""
+        await asyncio.to_thread(self.update_preference, key, value)
+
+    def get_preferences_string(self) -> str:
+        """Format preferences for LLM context (re-rendered only after a change or reload)."""
+        return self._render(self.store.load(self.user_id))
+
+    async def get_preferences_string_async(self) -> str:
+        """Async variant of ``get_preferences_string``; only a cache miss leaves the event loop."""
+        record = self.store.cached(self.user_id)
+        if record is None:
+            record = await asyncio.to_thread(self.store.load, self.user_id)
+        return self._render(record)
+
+    def _render(self, record: Record) -> str:
+        if self._rendered is None or self._rendered_from is not record:
+            self._rendered = format_preferences(record["preferences"])
+            self._rendered_from = record
+        return self._rendered
+
+    def clear(self):
+        """Wipe this user's memory."""
+        self.store.clear_user(self.user_id)
+        self._rendered = None
+
+    def close(self):
+        """Nothing to release per user; the store's connections are shared."""
+
+
+_memory_store: Optional[SQLiteMemoryStore] = None
+_memory_store_lock = threading.Lock()
+
+
+def get_memory_store() -> SQLiteMemoryStore:
+    """Process-wide store, created on first use from Config."""
+    global _memory_store
+    with _memory_store_lock:
+        if _memory_store is None:
+            _memory_store = SQLiteMemoryStore(
+                directory=Config.LTM_SQLITE_DIR,
+                shards=Config.LTM_SQLITE_SHARDS,
+                pool_size=Config.LTM_SQLITE_POOL_SIZE,
+                cache_users=Config.LTM_SQLITE_CACHE_USERS,
+                ttl_seconds=Config.LTM_TTL,
+            )
+            logger.log("LongTermMemory", f"Opened SQLite memory store at {Config.LTM_SQLITE_DIR}")
+        return _memory_store
@@ -0,0 +1,237 @@
+"""
+Session Manager: per-user agent state on top of shared, stateless agents.
+
+The Planner, Worker and Evaluator (Gemini clients, compiled patterns,
+caches) are created once per process. Each browser session gets its own
+``MainAgent`` wrapper holding its ``SessionMemory``, created lazily on the
+first turn and evicted when idle (TTL) or when the session cap is reached
+(LRU). Turns for the same session are serialized so concurrent requests
+cannot interleave its history.
+
+Long-term memory outlives the browser session, so it is keyed by a stable
+user id (a login, or the browser id cookie set by ``app.py``) and shared
+by every session of that user. Without one, it is keyed by the session id,
+so users without a cookie never see each other's preferences. Memory
+files idle for longer than ``Config.LTM_TTL`` are removed.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Any
+
+from project.agents.planner import Planner
+from project.agents.worker import Worker
+from project.agents.evaluator import Evaluator
+from project.agents.fused import FusedAgent
+from project.agents.summarizer import Summarizer
+from project.main_agent import MainAgent
+from project.memory.session_memory import SessionMemory
+from project.memory.long_term_memory import open_long_term_memory
+from project.core.observability import logger
+from project.core.metrics import queue_wait_seconds
+from project.config import Config
+
+
+
+def memory_key(user_id: str) -> str:
+    """Store key and file name for a user's long-term memory: a hash of the raw id.
+
+    Distinct ids never share a key, whatever characters they contain.
+    """
+    return hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:32]
+
+
+# How often idle memory files are looked for (seconds)
+_PURGE_INTERVAL = 3600.0
+
+
+class Session:
+    """One user's agent plus the lock that serializes their turns."""
+
+    def __init__(self, session_id: str, agent: MainAgent):
+        self.session_id = session_id
+        self.agent = agent
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        self.users = 0  # turns running or waiting for the lock; never evicted while > 0
+
+
+class SessionManager:
+    """Lazily creates, shares and evicts per-session ``MainAgent`` instances."""
+
+    def __init__(self,
+                 max_sessions: int = 500,
+                 ttl_seconds: float = 1800.0,
+                 memory_dir: str = "user_memory",
+                 mock_mode: Optional[bool] = None):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.memory_dir = memory_dir
+        self.mock_mode = mock_mode if mock_mode is not None else Config.MOCK_MODE
+
+        # Heavy, stateless components shared by every session
+        self.planner = Planner()
+        self.worker = Worker()
+        self.evaluator = Evaluator()
+        self.fused = FusedAgent()
+        self.summarizer = Summarizer()
+
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._evicted_ttl = 0
+        self._evicted_lru = 0
+        # One long-term memory per memory key, shared by all of the user's sessions while any is alive
+        self._memories: "weakref.WeakValueDictionary[str, Any]" = weakref.WeakValueDictionary()
+        self._purged_at = -_PURGE_INTERVAL  # first sweep on the first turn
+        self._purged = 0
+
+        os.makedirs(self.memory_dir, exist_ok=True)
+
+    def _long_term_memory(self, user_id: str):
+        """The user's long-term memory, shared by all of their live sessions."""
+        key = memory_key(user_id)
+        memory = self._memories.get(key)
+        if memory is None:
+            path = os.path.join(self.memory_dir, f"{key}.json")
+            memory = self._memories[key] = open_long_term_memory(key, path)
+        return memory
+
+    def _create(self, session_id: str, user_id: Optional[str] = None) -> Session:
+        agent = MainAgent(
+            mock_mode=self.mock_mode,
+            planner=self.planner,
+            worker=self.worker,
+            evaluator=self.evaluator,
+            fused=self.fused,
+            summarizer=self.summarizer,
+            memory=SessionMemory(max_history=8),
+            long_term_memory=self._long_term_memory(user_id or f"session-{session_id}"),
+        )
+        self._created += 1
+        return Session(session_id, agent)
+
+    def _evict(self, now: float):
+        """Drop idle sessions past the TTL, then the least recently used over the cap.
+
+        Sessions with a turn running or waiting for the lock are never evicted.
+        """
+        for session_id, session in list(self._sessions.items()):
+            if now - session.last_used > self.ttl_seconds and not session.users:
+                del self._sessions[session_id]
+                self._evicted_ttl += 1
+
+        for session_id, session in list(self._sessions.items()):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            if not session.users:
+                del self._sessions[session_id]
+                self._evicted_lru += 1
+
+    def get(self, session_id: str, user_id: Optional[str] = None) -> Session:
+        """Return the session for ``session_id``, creating it if needed."""
+        return self._checkout(session_id, user_id, hold=False)
+
+    def _checkout(self, session_id: str, user_id: Optional[str], hold: bool) -> Session:
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = self._create(session_id, user_id)
+                logger.log("SessionManager", "Created session", data={"active": len(self._sessions)})
+            self._sessions.move_to_end(session_id)
+            session.last_used = now
+            if hold:
+                session.users += 1
+            self._evict(now)
+            purge = self._purge_due(now)
+        if purge:
+            threading.Thread(target=self.purge_idle_memory, name="ltm-purge", daemon=True).start()
+        return session
+
+    @asynccontextmanager
+    async def session(self, session_id: Optional[str], user_id: Optional[str] = None) -> AsyncIterator[MainAgent]:
+        """Hold the session's turn lock and yield its agent.
+
+        ``user_id`` picks the long-term memory of a new session (without one
+        the memory is the session's own). Without a ``session_id`` the turn
+        gets a throwaway agent instead of sharing one.
+        """
+        if session_id is None:
+            with self._lock:
+                session = self._create(f"anonymous-{uuid.uuid4().hex}", user_id)
+            yield session.agent
+            return
+
+        session = self._checkout(session_id, user_id, hold=True)
+        try:
+            waited = time.perf_counter()
+            async with session.lock:
+                queue_wait_seconds.observe(time.perf_counter() - waited, queue="session")
+                yield session.agent
+        finally:
+            with self._lock:
+                session.users -= 1
+                session.last_used = time.monotonic()
+
+    # ---- idle memory files ----
+
+    def _purge_due(self, now: float) -> bool:
+        """Claim the next idle-file sweep if one is due (call under ``self._lock``)."""
+        if Config.LTM_BACKEND != "json" or Config.LTM_TTL <= 0 or now - self._purged_at < _PURGE_INTERVAL:
+            return False
+        self._purged_at = now
+        return True
+
+    def purge_idle_memory(self):
+        """Remove memory files (snapshot and journals) not written for ``Config.LTM_TTL``."""
+        cutoff = time.time() - Config.LTM_TTL
+        removed = 0
+        try:
+            names = os.listdir(self.memory_dir)
+        except OSError as e:
+            logger.log("SessionManager", f"Memory sweep failed: {e}", level="WARNING")
+            return
+        files: Dict[str, list] = {}
+        for name in names:
+            key = name.split(".json", 1)[0]
+            if key != name:
+                files.setdefault(key, []).append(os.path.join(self.memory_dir, name))
+
+        for key, paths in files.items():
+            try:
+                if max(os.path.getmtime(path) for path in paths) >= cutoff:
+                    continue
+                with self._lock:
+                    if key in self._memories:
+                        continue  # open in a live session
+                    for path in paths:
+                        os.remove(path)
+            except OSError:
+                continue
+            removed += 1
+        with self._lock:
+            self._purged += removed
+        if removed:
+            logger.log("SessionManager", f"Removed idle long-term memory of {removed} user(s)")
+
+    def close(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active_sessions": len(self._sessions),
+                "created": self._created,
+                "evicted_ttl": self._evicted_ttl,
+                "evicted_lru": self._evicted_lru,
+                "memory_users": len(self._memories),
+                "memory_purged": self._purged,
+            }
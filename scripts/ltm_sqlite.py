@@ -0,0 +1,88 @@
+"""
+Move long-term memory between the per-user JSON files and the SQLite store.
+
+    # Load every user file (snapshot + journal) from a directory into SQLite
+    python scripts/ltm_sqlite.py import user_memory/
+
+    # A single file, e.g. the old process-wide store, under an explicit user id
+    python scripts/ltm_sqlite.py import user_long_term_data.json --user default
+
+    # Write one <user_id>.json per user back out
+    python scripts/ltm_sqlite.py export exported_memory/
+
+The user id of an imported file is its name without ``.json``: the memory
+key (a hash of the user id) ``SessionManager`` named it after and reads
+the store with. Set LTM_BACKEND=sqlite to serve
+the store at runtime; LTM_SQLITE_DIR and LTM_SQLITE_SHARDS pick the store.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from project.memory.long_term_memory import LongTermMemory
+from project.memory.sqlite_memory import get_memory_store
+
+# SessionManager keys are file-safe already; ids given with --user may not be
+_UNSAFE_ID_RE = re.compile(r"[^A-Za-z0-9_-]")
+
+
+def _json_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            yield from sorted(glob.glob(os.path.join(path, "*.json")))
+        else:
+            yield path
+
+
+def import_json(args):
+    files = list(_json_files(args.paths))
+    if args.user and len(files) != 1:
+        sys.exit("--user needs exactly one input file")
+
+    store = get_memory_store()
+    users = entries = 0
+    for path in files:
+        user_id = args.user or os.path.basename(path)[:-len(".json")]
+        record = LongTermMemory(path).data
+        store.import_user(user_id, record)
+        users += 1
+        entries += sum(len(values) for values in record.values())
+    print(f"Imported {entries} entr{'y' if entries == 1 else 'ies'} for {users} user(s) into {store.directory}")
+
+
+def export_json(args):
+    os.makedirs(args.out, exist_ok=True)
+    store = get_memory_store()
+    users = 0
+    for user_id, record in store.iter_users():
+        name = _UNSAFE_ID_RE.sub("_", user_id)[:64] or "default"
+        with open(os.path.join(args.out, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=4)
+        users += 1
+    print(f"Exported {users} user(s) to {args.out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("import", help="load per-user JSON files into the SQLite store")
+    p.add_argument("paths", nargs="+", help="JSON files or directories of them")
+    p.add_argument("--user", help="user id for a single input file (default: file name)")
+    p.set_defaults(func=import_json)
+
+    p = sub.add_parser("export", help="write every user in the SQLite store as <user_id>.json")
+    p.add_argument("out")
+    p.set_defaults(func=export_json)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Push a corpus of multi-turn conversations through the full pipeline.
+
+    python scripts/replay_conversations.py conversations.jsonl \
+        --out turns.jsonl --report report.json --backend mock --workers 8
+
+Each input line is ``{"id": ..., "turns": ["msg", ...]}`` (turns may also be
+``{"role": "user", "content": ...}`` dicts; non-user turns are skipped).
+Every conversation runs through a fresh ``MainAgent`` in a worker process.
+Input is read and output written incrementally, with a bounded number of
+conversations in flight, so corpora larger than memory are fine.
+
+Backends:
+    mock    MOCK_MODE, no network
+    live    real Gemini calls (needs GEMINI_API_KEYS)
+    replay  answers from a recorded cassette (CASSETTE_MODE=replay)
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Iterator, List, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Per-process state set up by _init_worker
+_memory_dir = None
+
+
+def _init_worker(backend: str, cassette: str, replay_latency: bool, quiet: bool):
+    """Configure the backend through the environment before the project is imported."""
+    global _memory_dir
+    os.environ["MOCK_MODE"] = "true" if backend == "mock" else "false"
+    if backend == "replay":
+        os.environ["CASSETTE_MODE"] = "replay"
+        os.environ["CASSETTE_PATH"] = cassette
+        os.environ["CASSETTE_REPLAY_LATENCY"] = "true" if replay_latency else "false"
+    if quiet:
+        # The pipeline logger prints every event; keep worker output off the console
+        sys.stdout = open(os.devnull, "w")
+    _memory_dir = tempfile.mkdtemp(prefix="replay_ltm_")
+
+
+def _user_turns(conversation: Dict[str, Any]) -> List[str]:
+    turns = []
+    for turn in conversation.get("turns", []):
+        if isinstance(turn, str):
+            turns.append(turn)
+        elif isinstance(turn, dict) and turn.get("role", "user") == "user":
+            turns.append(turn.get("content", ""))
+    return turns
+
+
+def run_conversation(line: str) -> List[Dict[str, Any]]:
+    """Run one JSONL conversation through a fresh MainAgent; returns per-turn records."""
+    from project.main_agent import MainAgent
+    from project.memory.long_term_memory import LongTermMemory
+
+    conversation = json.loads(line)
+    conversation_id = str(conversation.get("id", ""))
+    # A private directory per conversation: ids may repeat or be missing
+    directory = tempfile.mkdtemp(prefix="conversation_", dir=_memory_dir)
+    memory = LongTermMemory(os.path.join(directory, "memory.json"))
+    try:
+        return _replay_turns(MainAgent(long_term_memory=memory), conversation_id, conversation)
+    finally:
+        memory.destroy()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _replay_turns(agent, conversation_id: str, conversation: Dict[str, Any]) -> List[Dict[str, Any]]:
+    from project.core.observability import logger
+
+    records = []
+    for index, text in enumerate(_user_turns(conversation)):
+        started = time.perf_counter()
+        result = agent.handle_message(text)
+        latency_ms = (time.perf_counter() - started) * 1000
+        plan = result.get("plan", {})
+        records.append({
+            "conversation_id": conversation_id,
+            "turn": index,
+            "input": text,
+            "response": result.get("response"),
+            "action": plan.get("action"),
+            "risk_level": plan.get("risk_level"),
+            "distress_score": plan.get("distress_score"),
+            "safety_status": result.get("safety_status"),
+            "latency_ms": round(latency_ms, 1),
+            "timings": result.get("timings", {}),
+        })
+        # Logs accumulate per process; drop them so later turns stay cheap
+        logger.clear()
+    return records
+
+
+class Reservoir:
+    """Fixed-size uniform sample for percentiles over an unbounded stream."""
+
+    def __init__(self, size: int = 10000, seed: int = 7):
+        self.size = size
+        self.samples: List[float] = []
+        self.seen = 0
+        self._random = random.Random(seed)
+
+    def add(self, value: float):
+        self.seen += 1
+        if len(self.samples) < self.size:
+            self.samples.append(value)
+        else:
+            index = self._random.randrange(self.seen)
+            if index < self.size:
+                self.samples[index] = value
+
+    def percentiles(self) -> Dict[str, float]:
+        if not self.samples:
+            return {}
+        ordered = sorted(self.samples)
+        pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        return {"p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99), "max": ordered[-1]}
+
+
+class Summary:
+    def __init__(self):
+        self.conversations = 0
+        self.failed_conversations = 0
+        self.turns = 0
+        self.latency = Reservoir()
+        self.stages: Dict[str, Reservoir] = {}
+        self.actions = Counter()
+        self.risk_levels = Counter()
+        self.verdicts = Counter()
+
+    def add(self, records: List[Dict[str, Any]]):
+        self.conversations += 1
+        for record in records:
+            self.turns += 1
+            self.latency.add(record["latency_ms"])
+            for stage, ms in record["timings"].items():
+                self.stages.setdefault(stage, Reservoir()).add(ms)
+            self.actions[record["action"]] += 1
+            self.risk_levels[record["risk_level"]] += 1
+            self.verdicts[record["safety_status"]] += 1
+
+    def report(self, elapsed: float, backend: str, workers: int) -> Dict[str, Any]:
+        return {
+            "backend": backend,
+            "workers": workers,
+            "conversations": self.conversations,
+            "failed_conversations": self.failed_conversations,
+            "turns": self.turns,
+            "elapsed_s": round(elapsed, 2),
+            "turns_per_s": round(self.turns / elapsed, 2) if elapsed else 0.0,
+            "turn_latency_ms": self.latency.percentiles(),
+            "stage_latency_ms": {stage: r.percentiles() for stage, r in sorted(self.stages.items())},
+            "actions": dict(self.actions),
+            "risk_levels": dict(self.risk_levels),
+            "safety_verdicts": dict(self.verdicts),
+        }
+
+
+def read_lines(path: str) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("conversations", help="input JSONL of conversations")
+    parser.add_argument("--out", default="replay_turns.jsonl", help="per-turn output JSONL")
+    parser.add_argument("--report", default=None, help="write the summary JSON here as well as stdout")
+    parser.add_argument("--backend", choices=["mock", "live", "replay"], default="mock")
+    parser.add_argument("--cassette", default="gemini_cassette.jsonl", help="cassette for --backend replay")
+    parser.add_argument("--replay-latency", action="store_true", help="sleep for recorded latencies when replaying")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--in-flight", type=int, default=0, help="max conversations queued (default 4 x workers)")
+    parser.add_argument("--verbose", action="store_true", help="keep pipeline logs from workers")
+    args = parser.parse_args()
+
+    max_in_flight = args.in_flight or args.workers * 4
+    summary = Summary()
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(args.backend, args.cassette, args.replay_latency, not args.verbose)) as pool, \
+            open(args.out, "w", encoding="utf-8") as out:
+
+        def drain(pending, block_until):
+            while len(pending) > block_until:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    try:
+                        records = future.result()
+                    except Exception as e:
+                        summary.failed_conversations += 1
+                        print(f"conversation failed: {type(e).__name__}: {e}", file=sys.stderr)
+                        continue
+                    for record in records:
+                        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    summary.add(records)
+
+        pending = set()
+        for line in read_lines(args.conversations):
+            pending.add(pool.submit(run_conversation, line))
+            drain(pending, max_in_flight - 1)
+        drain(pending, 0)
+
+    report = summary.report(time.perf_counter() - started, args.backend, args.workers)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Train and evaluate the local triage classifier against the LLM Planner.
+
+    # 1. Label raw user messages (one per line) with the LLM Planner
+    python scripts/train_triage.py label scripts/triage_seed.txt triage_labels.jsonl
+
+    # 2. Train on the labels, report hold-out agreement, save the model
+    python scripts/train_triage.py train triage_labels.jsonl --out triage_model.npz
+
+    # 3. Re-check an existing model on any labelled set
+    python scripts/train_triage.py evaluate triage_labels.jsonl --model triage_model.npz
+
+Labelled rows are JSONL ``{"text": ..., "plan": {...PlannerOutput...}}``.
+Set TRIAGE_ENABLED=true and TRIAGE_MODEL_PATH to use the model at runtime.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from project.agents.triage import TriageClassifier, HEADS
+
+
+def load_labels(path):
+    texts, plans = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            texts.append(row["text"])
+            plans.append(row["plan"])
+    return texts, plans
+
+
+def label(args):
+    """Ask the LLM Planner for a plan for every input line."""
+    from project.agents.planner import Planner
+
+    planner = Planner()
+    planner.triage = None  # labels must come from the LLM, not from a previous model
+    written = 0
+    with open(args.inputs, "r", encoding="utf-8") as src, open(args.out, "a", encoding="utf-8") as dst:
+        for line in src:
+            text = line.strip()
+            if not text or text.startswith("#"):
+                continue
+            response = planner.client.generate_json(planner._build_prompt(text, "", ""))
+            if not response:
+                print(f"skipped (no LLM response): {text[:60]}", file=sys.stderr)
+                continue
+            dst.write(json.dumps({"text": text, "plan": response}, ensure_ascii=False) + "\n")
+            written += 1
+    print(f"Labelled {written} message(s) into {args.out}")
+
+
+def evaluate_model(model, texts, plans):
+    """Per-head agreement with the LLM plus fast-path coverage and accuracy."""
+    head_agree = {head: 0 for head in HEADS}
+    fast, fast_agree = 0, 0
+    for text, plan in zip(texts, plans):
+        prediction = model.predict(text)
+        for head in HEADS:
+            if prediction[head][0] == str(plan.get(head, "none")):
+                head_agree[head] += 1
+        fast_plan = model.plan(text)
+        if fast_plan is not None:
+            fast += 1
+            if fast_plan["action"] == plan.get("action") and fast_plan["risk_level"] == plan.get("risk_level"):
+                fast_agree += 1
+
+    n = len(texts) or 1
+    return {
+        "samples": len(texts),
+        "head_agreement": {head: round(count / n, 4) for head, count in head_agree.items()},
+        "fast_path_coverage": round(fast / n, 4),
+        "fast_path_agreement": round(fast_agree / fast, 4) if fast else None,
+        "unsafe_fast_path": sum(
+            1 for text, plan in zip(texts, plans)
+            if plan.get("risk_level") != "LOW" and model.plan(text) is not None
+        ),
+    }
+
+
+def train(args):
+    texts, plans = load_labels(args.labels)
+    rows = list(zip(texts, plans))
+    random.Random(args.seed).shuffle(rows)
+    split = int(len(rows) * (1 - args.holdout))
+    train_rows, test_rows = rows[:split], rows[split:]
+
+    model = TriageClassifier.train([t for t, _ in train_rows], [p for _, p in train_rows],
+                                   dim=args.dim, alpha=args.alpha, threshold=args.threshold)
+    if test_rows:
+        report = evaluate_model(model, [t for t, _ in test_rows], [p for _, p in test_rows])
+        print(json.dumps({"holdout": report}, indent=2))
+
+    # Refit on everything before saving
+    model = TriageClassifier.train(texts, plans, dim=args.dim, alpha=args.alpha, threshold=args.threshold)
+    model.save(args.out)
+    print(f"Saved triage model ({len(texts)} samples) to {args.out}")
+
+
+def evaluate(args):
+    model = TriageClassifier.load(args.model, args.threshold)
+    if model is None:
+        sys.exit(1)
+    texts, plans = load_labels(args.labels)
+    print(json.dumps(evaluate_model(model, texts, plans), indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("label", help="label raw messages with the LLM Planner")
+    p.add_argument("inputs")
+    p.add_argument("out")
+    p.set_defaults(func=label)
+
+    p = sub.add_parser("train", help="train a model and report hold-out agreement")
+    p.add_argument("labels")
+    p.add_argument("--out", default="triage_model.npz")
+    p.add_argument("--dim", type=int, default=2 ** 15)
+    p.add_argument("--alpha", type=float, default=0.5)
+    p.add_argument("--threshold", type=float, default=0.85)
+    p.add_argument("--holdout", type=float, default=0.2)
+    p.add_argument("--seed", type=int, default=13)
+    p.set_defaults(func=train)
+
+    p = sub.add_parser("evaluate", help="measure agreement of a saved model with LLM labels")
+    p.add_argument("labels")
+    p.add_argument("--model", default="triage_model.npz")
+    p.add_argument("--threshold", type=float, default=0.85)
+    p.set_defaults(func=evaluate)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
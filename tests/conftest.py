@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Import ``project`` from the repository root without installing it
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
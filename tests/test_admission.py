@@ -0,0 +1,89 @@
+import asyncio
+
+from project.core.admission import AdmissionScheduler, CRISIS, NORMAL, LOW
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_admits_up_to_limit_then_queues():
+    async def scenario():
+        scheduler = AdmissionScheduler(max_concurrent=1)
+        await scheduler.acquire(NORMAL)
+        waiter = asyncio.ensure_future(scheduler.acquire(NORMAL))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        assert scheduler.get_stats()["queue_depth"] == 1
+
+        scheduler.release()
+        await waiter
+        assert scheduler.get_stats()["queue_depth"] == 0
+        assert scheduler.get_stats()["in_flight"] == 1
+        scheduler.release()
+        assert scheduler.get_stats()["in_flight"] == 0
+
+    run(scenario())
+
+
+def test_more_urgent_waiter_goes_first():
+    async def scenario():
+        scheduler = AdmissionScheduler(max_concurrent=1)
+        order = []
+
+        async def turn(priority, name):
+            async with scheduler.admit(priority):
+                order.append(name)
+
+        await scheduler.acquire(NORMAL)
+        tasks = [asyncio.ensure_future(turn(LOW, "low")),
+                 asyncio.ensure_future(turn(NORMAL, "normal")),
+                 asyncio.ensure_future(turn(CRISIS, "crisis"))]
+        await asyncio.sleep(0)
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        assert order == ["crisis", "normal", "low"]
+
+    run(scenario())
+
+
+def test_cancel_while_waiting_clears_depth():
+    async def scenario():
+        scheduler = AdmissionScheduler(max_concurrent=1)
+        await scheduler.acquire(NORMAL)
+        waiter = asyncio.ensure_future(scheduler.acquire(NORMAL))
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert scheduler.get_stats()["queue_depth"] == 0
+
+        scheduler.release()
+        assert scheduler.get_stats()["in_flight"] == 0
+
+    run(scenario())
+
+
+def test_cancel_after_handover_releases_slot_and_depth():
+    async def scenario():
+        scheduler = AdmissionScheduler(max_concurrent=1)
+        await scheduler.acquire(NORMAL)
+        waiter = asyncio.ensure_future(scheduler.acquire(CRISIS))
+        await asyncio.sleep(0)
+
+        # release() hands the slot over, then the cancellation lands before the waiter runs
+        scheduler.release()
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert waiter.cancelled()
+
+        stats = scheduler.get_stats()
+        assert stats["queue_depth"] == 0
+        assert stats["crisis"]["waiting"] == 0
+        assert stats["in_flight"] == 0
+
+        # The freed slot is usable again
+        await asyncio.wait_for(scheduler.acquire(NORMAL), timeout=1)
+        assert scheduler.get_stats()["in_flight"] == 1
+
+    run(scenario())
@@ -0,0 +1,79 @@
+import threading
+
+from project.memory.context_builder import ContextBuilder
+from project.memory.session_memory import SessionMemory
+
+
+class RecordingSummarizer:
+    """Summary = every folded line so far; ``gate`` holds refreshes until it is set."""
+
+    def __init__(self, gate=None):
+        self.gate = gate
+        self.folded = []
+
+    def summarize(self, previous, lines, max_tokens):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.folded.extend(lines)
+        return "; ".join(filter(None, [previous] + lines))
+
+
+def settle(builder):
+    """Let in-flight refreshes finish and start any the finished ones left due."""
+    for _ in range(10):
+        refresh = builder._refresh
+        if refresh is not None:
+            refresh.result(timeout=5)
+        builder.build("")
+        if builder._refresh is refresh:
+            return
+
+
+def converse(builder, memory, turns):
+    for index in range(turns):
+        memory.add_message("user" if index % 2 == 0 else "assistant", f"message {index}")
+        builder.build("")
+
+
+def test_messages_are_summarized_before_eviction():
+    memory = SessionMemory(max_history=4)
+    summarizer = RecordingSummarizer()
+    builder = ContextBuilder(memory, summarizer, budget=10000)
+
+    converse(builder, memory, 20)
+    settle(builder)
+    evicted = [f"USER: message {i}" if i % 2 == 0 else f"ASSISTANT: message {i}"
+               for i in range(memory.messages()[0].seq)]
+    assert [line for line in summarizer.folded if line in evicted] == evicted
+
+
+def test_messages_evicted_during_a_refresh_are_not_lost():
+    gate = threading.Event()
+    memory = SessionMemory(max_history=2)
+    summarizer = RecordingSummarizer(gate)
+    builder = ContextBuilder(memory, summarizer, budget=10000)
+
+    # The first refresh is stuck while more messages arrive and are evicted
+    converse(builder, memory, 12)
+    assert summarizer.folded == []
+    gate.set()
+    settle(builder)
+
+    first_kept = memory.messages()[0].seq
+    assert all(f"message {i}" in builder.summary for i in range(first_kept))
+    assert builder._summarized_to >= first_kept
+    assert memory.evicted() == []
+
+
+def test_reset_drops_held_messages():
+    gate = threading.Event()
+    memory = SessionMemory(max_history=2)
+    builder = ContextBuilder(memory, RecordingSummarizer(gate), budget=10000)
+    converse(builder, memory, 8)
+    assert memory.evicted()
+
+    memory.clear()
+    builder.reset()
+    gate.set()
+    assert memory.evicted() == []
+    assert builder.summary == ""
@@ -0,0 +1,132 @@
+"""Journal-backed LongTermMemory: replay, torn and corrupt tails, compaction and cleanup."""
+import json
+import os
+
+from project.memory.long_term_memory import LongTermMemory
+
+
+def open_memory(tmp_path, name="user.json"):
+    return LongTermMemory(str(tmp_path / name))
+
+
+def test_journal_replays_on_reopen(tmp_path):
+    memory = open_memory(tmp_path)
+    memory.update_preference("technique", "box_breathing")
+    memory.update_preference("tone", "gentle")
+    memory.update_preference("technique", "grounding")
+    memory.close()
+
+    reopened = open_memory(tmp_path)
+    assert reopened.data["preferences"] == {"technique": "grounding", "tone": "gentle"}
+    assert not os.path.exists(reopened.storage_file)  # nothing compacted yet: journal only
+
+
+def test_clear_is_replayed(tmp_path):
+    memory = open_memory(tmp_path)
+    memory.update_preference("technique", "box_breathing")
+    memory.clear()
+    memory.update_preference("tone", "gentle")
+    memory.close()
+
+    assert open_memory(tmp_path).data["preferences"] == {"tone": "gentle"}
+
+
+def test_torn_tail_is_dropped_and_truncated(tmp_path):
+    memory = open_memory(tmp_path)
+    memory.update_preference("technique", "box_breathing")
+    memory.close()
+    with open(memory.journal_file, "a", encoding="utf-8") as f:
+        f.write('{"op": "set", "ns": "preferences", "key": "tone", "val')  # crash mid-append
+    good_size = len(json.dumps({"op": "set", "ns": "preferences", "key": "technique",
+                                "value": "box_breathing"}, ensure_ascii=False)) + 1
+
+    reopened = open_memory(tmp_path)
+    assert reopened.data["preferences"] == {"technique": "box_breathing"}
+    assert os.path.getsize(reopened.journal_file) == good_size
+
+    # The next append starts on a fresh line instead of being glued to the torn record
+    reopened.update_preference("tone", "gentle")
+    reopened.close()
+    assert open_memory(tmp_path).data["preferences"] == {"technique": "box_breathing", "tone": "gentle"}
+
+
+def test_corrupt_record_stops_replay(tmp_path):
+    memory = open_memory(tmp_path)
+    memory.update_preference("technique", "box_breathing")
+    memory.close()
+    with open(memory.journal_file, "a", encoding="utf-8") as f:
+        f.write("not json\n")
+        f.write(json.dumps({"op": "set", "ns": "preferences", "key": "tone", "value": "gentle"}) + "\n")
+
+    assert open_memory(tmp_path).data["preferences"] == {"technique": "box_breathing"}
+
+
+def test_compact_folds_journal_into_snapshot(tmp_path):
+    memory = open_memory(tmp_path)
+    memory.update_preference("technique", "box_breathing")
+    memory.compact()
+    memory.update_preference("tone", "gentle")
+    memory.close()
+
+    with open(memory.storage_file, encoding="utf-8") as f:
+        assert json.load(f)["preferences"] == {"technique": "box_breathing"}
+    assert not os.path.exists(memory.journal_file + ".old")
+    assert open_memory(tmp_path).data["preferences"] == {"technique": "box_breathing", "tone": "gentle"}
+
+
+def test_interrupted_compaction_replays_rotated_journal(tmp_path):
+    memory = open_memory(tmp_path)
+    memory.update_preference("technique", "box_breathing")
+    memory.close()
+    # Crash after rotating the journal but before the new snapshot was written
+    os.replace(memory.journal_file, memory.journal_file + ".old")
+    with open(memory.journal_file, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"op": "set", "ns": "preferences", "key": "tone", "value": "gentle"}) + "\n")
+
+    reopened = open_memory(tmp_path)
+    assert reopened.data["preferences"] == {"technique": "box_breathing", "tone": "gentle"}
+    # The merged view is persisted before the next compaction can rotate again
+    assert not os.path.exists(memory.journal_file + ".old")
+    with open(reopened.storage_file, encoding="utf-8") as f:
+        assert json.load(f)["preferences"] == {"technique": "box_breathing", "tone": "gentle"}
+    assert open_memory(tmp_path).data["preferences"] == {"technique": "box_breathing", "tone": "gentle"}
+
+
+def test_unreadable_snapshot_is_kept_aside(tmp_path):
+    path = tmp_path / "user.json"
+    path.write_text("{broken", encoding="utf-8")
+
+    memory = open_memory(tmp_path)
+    assert memory.data == {"preferences": {}, "facts": {}}
+    assert any(name.startswith("user.json.corrupt-") for name in os.listdir(tmp_path))
+
+
+def test_destroy_removes_every_file(tmp_path):
+    memory = open_memory(tmp_path)
+    memory.update_preference("technique", "box_breathing")
+    memory.compact()
+    memory.update_preference("tone", "gentle")
+    open(memory.journal_file + ".old", "w").close()
+    open(memory.storage_file + ".tmp", "w").close()
+
+    memory.destroy()
+    assert os.listdir(tmp_path) == []
+    assert memory._journal is None
+    assert memory.data["preferences"] == {}
+
+
+def test_concurrent_compactions_do_not_lose_records(tmp_path):
+    import threading
+
+    memory = open_memory(tmp_path)
+    for index in range(50):
+        memory.update_preference(f"key{index}", str(index))
+    threads = [threading.Thread(target=memory.compact) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    memory.close()
+
+    assert len(open_memory(tmp_path).data["preferences"]) == 50
+    assert not os.path.exists(memory.journal_file + ".old")
@@ -0,0 +1,107 @@
+"""Ring-buffer SessionMemory: parity with the list-based class it replaced."""
+import random
+import time
+
+import pytest
+
+from project.memory.session_memory import SessionMemory
+
+
+class LegacySessionMemory:
+    """The list-based SessionMemory the ring buffer replaced."""
+
+    def __init__(self, max_history: int = 10):
+        self.history = []
+        self.max_history = max_history
+
+    def add_message(self, role: str, content: str):
+        self.history.append({"role": role, "content": content, "timestamp": time.time()})
+        if len(self.history) > self.max_history * 2:
+            self.history = self.history[-self.max_history * 2:]
+
+    def get_history_string(self, last_n: int = 5) -> str:
+        recent = self.history[-last_n * 2:]
+        if not recent:
+            return "No prior conversation."
+        formatted = []
+        for msg in recent:
+            content = msg["content"]
+            if len(content) > 200:
+                content = content[:200] + "..."
+            formatted.append(f"{msg['role'].upper()}: {content}")
+        return "\n".join(formatted)
+
+    def get_conversation_summary(self) -> str:
+        if not self.history:
+            return "New conversation"
+        return f"{len([m for m in self.history if m['role'] == 'user'])} messages exchanged"
+
+    def clear(self):
+        self.history = []
+
+    def get_stats(self) -> dict:
+        return {
+            "total_messages": len(self.history),
+            "user_messages": len([m for m in self.history if m["role"] == "user"]),
+            "assistant_messages": len([m for m in self.history if m["role"] == "assistant"]),
+        }
+
+
+def assert_same(memory, legacy):
+    assert [(m["role"], m["content"]) for m in memory.history] == \
+        [(m["role"], m["content"]) for m in legacy.history]
+    assert memory.get_stats() == legacy.get_stats()
+    assert memory.get_conversation_summary() == legacy.get_conversation_summary()
+    for last_n in (-1, 0, 1, 2, 3, 5, 8, 20):
+        assert memory.get_history_string(last_n) == legacy.get_history_string(last_n)
+    assert memory.get_history_string() == legacy.get_history_string()
+
+
+@pytest.mark.parametrize("max_history", [1, 3, 8])
+def test_ring_buffer_matches_legacy_memory(max_history):
+    rng = random.Random(max_history)
+    memory, legacy = SessionMemory(max_history), LegacySessionMemory(max_history)
+    assert_same(memory, legacy)
+    for step in range(120):
+        role = rng.choice(["user", "assistant", "user", "assistant", "system"])
+        content = " ".join(rng.choice(["calm", "tired", "anxious", "ok"]) for _ in range(rng.randint(1, 80)))
+        memory.add_message(role, content)
+        legacy.add_message(role, content)
+        assert_same(memory, legacy)
+        if step == 60:
+            memory.clear()
+            legacy.clear()
+            assert_same(memory, legacy)
+
+
+def test_history_string_cache_follows_new_messages():
+    memory = SessionMemory(max_history=2)
+    memory.add_message("user", "hello")
+    assert memory.get_history_string() == "USER: hello"
+    memory.add_message("assistant", "hi there")
+    assert memory.get_history_string() == "USER: hello\nASSISTANT: hi there"
+
+
+def test_full_and_sequence_numbers():
+    memory = SessionMemory(max_history=1)
+    assert not memory.full
+    memory.add_message("user", "one")
+    memory.add_message("assistant", "two")
+    assert memory.full
+    memory.add_message("user", "three")
+    assert [(m.seq, m.content) for m in memory.messages()] == [(1, "two"), (2, "three")]
+
+
+def test_long_messages_are_capped():
+    memory = SessionMemory(max_history=2, max_message_chars=10)
+    memory.add_message("user", "x" * 50)
+    assert memory.history[0]["content"] == "x" * 10
+
+
+def test_other_roles_are_kept_as_given():
+    memory = SessionMemory(max_history=2)
+    memory.add_message("system", "session started")
+    memory.add_message("user", "hello")
+    assert memory.history[0]["role"] == "system"
+    assert memory.get_history_string(0) == "SYSTEM: session started\nUSER: hello"
+    assert memory.get_stats() == {"total_messages": 2, "user_messages": 1, "assistant_messages": 0}
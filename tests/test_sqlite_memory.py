@@ -0,0 +1,108 @@
+import asyncio
+import itertools
+import time
+from contextlib import contextmanager
+
+from project.memory.sqlite_memory import SQLiteMemoryStore, SQLiteLongTermMemory
+
+
+def make_store(tmp_path, ttl_seconds=0.0):
+    return SQLiteMemoryStore(directory=str(tmp_path), shards=1, pool_size=2, ttl_seconds=ttl_seconds)
+
+
+def test_write_during_load_is_not_lost(tmp_path):
+    store = make_store(tmp_path)
+    store.set("u1", "preferences", "technique", "box_breathing")
+    store._cache.clear()
+
+    shard = store.shards[0]
+    connection = shard.connection
+    fired = []
+
+    @contextmanager
+    def racing_connection():
+        with connection() as conn:
+            yield conn
+        if not fired:
+            # Another turn writes after this load's SELECT but before it caches the record
+            fired.append(True)
+            store.set("u1", "preferences", "tone", "gentle")
+
+    shard.connection = racing_connection
+    assert store.load("u1")["preferences"] == {"technique": "box_breathing", "tone": "gentle"}
+    shard.connection = connection
+    assert store.load("u1")["preferences"] == {"technique": "box_breathing", "tone": "gentle"}
+    assert store._loading == {}
+
+
+def test_set_brings_cache_refresh_forward(tmp_path):
+    store = make_store(tmp_path, ttl_seconds=100)
+    store.load("u1")  # empty record: nothing can expire yet
+    assert store._cache["u1"][1] == float("inf")
+
+    before = time.time()
+    store.set("u1", "preferences", "tone", "gentle")
+    assert before + 100 <= store._cache["u1"][1] <= time.time() + 100
+
+
+def test_expired_entries_are_not_loaded(tmp_path):
+    store = make_store(tmp_path, ttl_seconds=100)
+    store.import_user("u1", {"preferences": {"tone": "gentle"}, "facts": {}}, updated_at=time.time() - 200)
+    assert store.load("u1")["preferences"] == {}
+
+
+def test_async_reads_and_writes(tmp_path):
+    memory = SQLiteLongTermMemory("u1", store=make_store(tmp_path))
+
+    async def scenario():
+        await memory.update_preference_async("technique", "box_breathing")
+        return await memory.get_preferences_string_async()
+
+    assert asyncio.run(scenario()) == "KNOWN USER PREFERENCES:\n- technique: box_breathing"
+
+
+
+class _InjectingLock:
+    """Stands in for the store lock and runs ``action`` just before the ``at``-th acquisition."""
+
+    def __init__(self, lock, at, action):
+        self._lock, self._at, self._action = lock, at, action
+        self.count = 0
+        self.fired = False
+
+    def __enter__(self):
+        self.count += 1
+        if self.count == self._at:
+            self.fired = True
+            self._action()
+        return self._lock.__enter__()
+
+    def __exit__(self, *exc):
+        return self._lock.__exit__(*exc)
+
+
+def test_write_between_load_lock_sections_is_not_lost(tmp_path):
+    # Slip a write in before each lock acquisition a cold load makes in turn; whichever
+    # gap it lands in, the cache must end up holding it
+    for at in itertools.count(1):
+        store = make_store(tmp_path / f"case{at}")
+        store.set("u1", "preferences", "k", "OLD")
+        store._cache.clear()
+
+        lock = store._lock
+
+        def write_new():
+            store._lock = lock
+            try:
+                store.set("u1", "preferences", "k", "NEW")
+            finally:
+                store._lock = injecting
+
+        injecting = _InjectingLock(lock, at, write_new)
+        store._lock = injecting
+        store.load("u1")
+        store._lock = lock
+
+        if not injecting.fired:
+            break
+        assert store.load("u1")["preferences"] == {"k": "NEW"}, at
@@ -0,0 +1,102 @@
+import asyncio
+
+from project.agents.evaluator import StreamGuard
+from project.agents.worker import Worker
+from project.core.circuit_breaker import StreamInterruptedError
+
+PLAN = {"action": "validate_feelings", "instruction": "Acknowledge the user's stress.",
+        "technique_suggestion": "none"}
+
+
+class FlakyStreamClient:
+    """Streams a few chunks and then fails, like a dropped connection mid-response."""
+
+    def __init__(self):
+        self.calls = []
+
+    def stream_response(self, prompt):
+        self.calls.append("stream")
+        yield "That sounds really "
+        yield "hard, and "
+        raise StreamInterruptedError("connection reset")
+
+    async def stream_response_async(self, prompt):
+        self.calls.append("stream")
+        yield "That sounds really "
+        yield "hard, and "
+        raise StreamInterruptedError("connection reset")
+
+    def generate_response(self, prompt, json_mode=False, stream=False):
+        self.calls.append("generate")
+        return "That sounds really hard, and it makes sense you feel drained."
+
+    async def generate_response_async(self, prompt, json_mode=False, stream=False):
+        return self.generate_response(prompt)
+
+
+class PassGuard:
+    def __init__(self):
+        self.text = ""
+        self.violation = None
+
+    def feed(self, text):
+        self.text += text
+        return None
+
+    def finish(self):
+        return None
+
+
+def make_worker():
+    worker = Worker()
+    worker.client = FlakyStreamClient()
+    return worker
+
+
+def test_guarded_draft_is_redrafted_after_interrupted_stream():
+    worker = make_worker()
+    output = worker.work(PLAN, PassGuard)
+    assert output["draft_response"] == "That sounds really hard, and it makes sense you feel drained."
+    assert worker.client.calls == ["stream", "generate"]
+    assert worker.get_guard_stats()["interrupted"] == 1
+
+
+def test_streamed_draft_restarts_after_interrupted_stream():
+    async def collect(guard_factory):
+        worker = make_worker()
+        return [event async for event in worker.work_stream_async(PLAN, guard_factory)]
+
+    for guard_factory in (None, PassGuard):
+        events = asyncio.run(collect(guard_factory))
+        types = [event["type"] for event in events]
+        assert types == ["chunk", "chunk", "restart", "chunk", "done"]
+        assert events[2]["violation"] is None
+        assert events[-1]["output"]["draft_response"].endswith("feel drained.")
+
+
+def feed_words(guard, text):
+    """Feed ``text`` a word at a time; returns the chunk count seen when the guard fired."""
+    for count, word in enumerate(text.split(" "), 1):
+        if guard.feed(word + " "):
+            return count
+    return None
+
+
+def test_stream_guard_waits_for_a_refusal_cue_after_the_match():
+    guard = StreamGuard(None)
+    fired = feed_words(guard, "A diagnosis is something I cannot give you, but I am here to listen.")
+    assert fired is None
+    assert guard.finish() is None
+
+
+def test_stream_guard_flags_an_unnegated_match_when_its_sentence_ends():
+    guard = StreamGuard(None)
+    fired = feed_words(guard, "The diagnosis is clear. Take care.")
+    assert fired == 4   # on "clear.", not on "diagnosis"
+    assert guard.violation == "Medical advice detected"
+
+
+def test_stream_guard_settles_an_unfinished_sentence_at_the_end():
+    guard = StreamGuard(None)
+    assert feed_words(guard, "You need a diagnosis") is None
+    assert guard.finish() == "Medical advice detected"